@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+AI失败分析基准测试 - 用模拟LLM对比逐步分析与批量分析的请求数、token数和耗时
+
+模拟LLM的延迟 = 固定往返开销 + 每个提示token的处理时间，不发出真实请求
+
+用法:
+    python benchmarks/bench_ai_batch.py --failures 30 --pages 2
+"""
+import asyncio
+import json
+import re
+import sys
+import time
+from pathlib import Path
+
+import click
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.ai_assistant import AIAssistant, estimate_tokens
+from src.failure_analyzer import BackgroundFailureAnalyzer, BatchFailureAnalyzer
+from src.models import LearningRecord, ReplayResult
+
+class FakeResponse:
+    def __init__(self, content: str):
+        self.content = content
+
+class FakeLLM:
+    """模拟LLM：批量请求返回每个步骤的JSON分析，单步请求返回文本建议"""
+
+    def __init__(self, round_trip: float, per_token: float):
+        self.round_trip = round_trip
+        self.per_token = per_token
+
+    def invoke(self, messages):
+        prompt = "\n".join(message.content for message in messages)
+        time.sleep(self.round_trip + estimate_tokens(prompt) * self.per_token)
+        if '失败的操作' in prompt:
+            steps = re.findall(r'"step": (\d+)', prompt)
+            return FakeResponse(json.dumps([
+                {"step": int(step), "analysis": "按钮文本在改版后变化", "suggestions": ["改用文本定位"],
+                 "selectors": [{"type": "text", "selector": f"button#submit-{step}"}]}
+                for step in steps
+            ], ensure_ascii=False))
+        return FakeResponse("- 改用文本定位\n- 等待页面加载\ncss: button#submit")
+
+def generate_failures(count: int, pages: int):
+    """生成分布在若干页面上的失败步骤和页面快照"""
+    failures = []
+    for step in range(1, count + 1):
+        page = step % pages
+        record = LearningRecord(
+            type="click", description=f"点击按钮 {step}", url=f"https://shop.example.com/page-{page}",
+            element={"tagName": "BUTTON", "id": f"submit-{step}", "className": "btn btn-primary",
+                     "textContent": "提交订单", "xpath": f"/html/body/form/button[{step}]",
+                     "selector": f"#submit-{step}"},
+            timestamp="2024-01-01T10:00:00Z"
+        )
+        page_info = {'url': record.url, 'title': f"页面 {page}",
+                     'content': f"<html><body><form id='page-{page}'>" + "<div class='row'>商品</div>" * 40}
+        failures.append((step, ReplayResult(record=record, success=False, error_message="元素未找到",
+                                            execution_time=0.0), page_info))
+    return failures
+
+async def run_mode(analyzer_class, failures, llm: FakeLLM, workers: int) -> dict:
+    """用指定的分析器分析所有失败，返回LLM用量"""
+    assistant = AIAssistant(model="fake", llm=llm)
+    analyzer = analyzer_class(assistant, workers=workers, max_pending=len(failures))
+    start_time = time.perf_counter()
+    for step, result, page_info in failures:
+        analyzer.submit(step, result, page_info)
+    stats = await analyzer.drain(timeout=600)
+    return {**assistant.usage, 'wall': time.perf_counter() - start_time, 'completed': stats['completed']}
+
+@click.command()
+@click.option('--failures', '-n', default=30, help='失败步骤数')
+@click.option('--pages', default=2, help='失败分布的页面数')
+@click.option('--workers', default=2, help='分析线程数')
+@click.option('--round-trip', default=0.2, help='模拟LLM每次请求的固定延迟(秒)')
+@click.option('--per-token', default=0.0002, help='模拟LLM每个提示token的处理时间(秒)')
+def main(failures, pages, workers, round_trip, per_token):
+    """运行基准测试"""
+    from loguru import logger
+    logger.remove()
+
+    llm = FakeLLM(round_trip, per_token)
+    data = generate_failures(failures, pages)
+    results = [
+        ("逐步分析 (background)", asyncio.run(run_mode(BackgroundFailureAnalyzer, data, llm, workers))),
+        ("批量分析 (batch)", asyncio.run(run_mode(BatchFailureAnalyzer, data, llm, workers))),
+    ]
+
+    print(f"{'分析方式':<24}{'完成':>6}{'请求数':>8}{'提示tokens':>12}{'输出tokens':>12}{'LLM耗时(s)':>12}{'总耗时(s)':>11}")
+    for label, r in results:
+        print(f"{label:<24}{r['completed']:>6}{r['requests']:>8}{r['prompt_tokens']:>12}"
+              f"{r['completion_tokens']:>12}{r['latency']:>12.2f}{r['wall']:>11.2f}")
+
+    per_step, batched = results[0][1], results[1][1]
+    print(f"\n批量分析: 请求数 {per_step['requests'] / batched['requests']:.1f}x 更少, "
+          f"提示tokens {per_step['prompt_tokens'] / batched['prompt_tokens']:.1f}x 更少, "
+          f"总耗时 {per_step['wall'] / batched['wall']:.1f}x 更快")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+紧凑记录基准测试 - 对比pydantic模型与紧凑记录的加载耗时和内存占用
+
+用法:
+    python benchmarks/bench_compact_records.py --records 200000
+"""
+import gc
+import json
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import click
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.data_loader import LearningDataLoader
+
+def generate_records(count: int, seed: int = 42) -> list:
+    """生成模拟的学习轨迹：少量页面和元素被反复操作"""
+    rng = random.Random(seed)
+    urls = [f"https://shop.example.com/{page}" for page in
+            ("login", "home", "search", "cart", "checkout/address", "checkout/payment")]
+    elements = [
+        {"tagName": tag, "id": f"{tag.lower()}-{i}", "className": f"btn btn-{i % 5} form-control",
+         "xpath": f"/html/body/div[{i}]/{tag.lower()}", "selector": f"#{tag.lower()}-{i}",
+         "type": "text" if tag == "INPUT" else None}
+        for i, tag in enumerate(["BUTTON", "INPUT", "A", "SELECT", "DIV"] * 8)
+    ]
+
+    records = []
+    for i in range(count):
+        element = dict(rng.choice(elements))
+        element["textContent"] = f"文本内容 {rng.randint(0, 999)}"
+        records.append({
+            "type": rng.choice(["click", "input", "change", "submit"]),
+            "description": f"操作 {i}",
+            "url": rng.choice(urls),
+            "element": element,
+            "timestamp": f"2024-01-01T10:{i // 3600 % 60:02d}:{i % 60:02d}.000Z",
+            "position": {"x": rng.randint(0, 1920), "y": rng.randint(0, 1080)},
+            "value": None
+        })
+    return records
+
+def measure(label: str, load) -> dict:
+    """测量加载耗时和加载后常驻的内存"""
+    gc.collect()
+    tracemalloc.start()
+    start_time = time.perf_counter()
+    records = load()
+    elapsed = time.perf_counter() - start_time
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    result = {'label': label, 'records': len(records), 'seconds': elapsed,
+              'retained_mb': current / 1024 / 1024, 'peak_mb': peak / 1024 / 1024}
+    del records
+    return result
+
+@click.command()
+@click.option('--records', '-n', default=100000, help='生成的记录数')
+def main(records):
+    """运行基准测试"""
+    from loguru import logger
+    logger.remove()
+
+    loader = LearningDataLoader(Path(tempfile.gettempdir()))
+    with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False, encoding='utf-8') as f:
+        json.dump(generate_records(records), f, ensure_ascii=False, indent=2)
+        path = Path(f.name)
+
+    try:
+        results = [
+            measure("pydantic (load_from_file)", lambda: loader.load_from_file(path)),
+            measure("compact (load_compact_records)", lambda: loader.load_compact_records(path)),
+        ]
+    finally:
+        path.unlink()
+
+    print(f"{'加载方式':<32}{'记录数':>10}{'耗时(s)':>10}{'常驻(MB)':>12}{'峰值(MB)':>12}")
+    for r in results:
+        print(f"{r['label']:<32}{r['records']:>10}{r['seconds']:>10.2f}{r['retained_mb']:>12.1f}{r['peak_mb']:>12.1f}")
+
+    base, compact = results
+    print(f"\n紧凑记录: 耗时 {base['seconds'] / compact['seconds']:.1f}x 更快, "
+          f"常驻内存 {base['retained_mb'] / compact['retained_mb']:.1f}x 更小")
+
+if __name__ == '__main__':
+    main()
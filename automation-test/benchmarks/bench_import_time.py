@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+启动耗时基准测试 - 用 python -X importtime 测量各命令的导入耗时，防止重量级依赖被重新引入
+
+不需要浏览器的命令（validate、list-files、analyze等）不能导入Playwright和LangChain；
+发现被禁止的模块或导入耗时超出预算时以退出码1结束，可以直接放进CI预检
+
+用法:
+    python benchmarks/bench_import_time.py
+    python benchmarks/bench_import_time.py --command list-files --budget-ms 400
+"""
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import click
+
+PROJECT_DIR = Path(__file__).parent.parent
+
+# 只做数据处理的命令
+LIGHT_COMMANDS = ('validate', 'list-files', 'analyze', 'convert', 'history')
+
+# 这些命令不应该加载的顶层模块
+FORBIDDEN_MODULES = ('playwright', 'langchain', 'langchain_core', 'langchain_openai', 'openai')
+
+def parse_importtime(stderr: str) -> Dict[str, Tuple[int, int, int]]:
+    """解析 -X importtime 的输出，返回 模块名 -> (嵌套深度, 自身耗时us, 累计耗时us)"""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        # 模块名前每两个空格表示一层嵌套导入
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        modules[name.strip()] = (depth, int(self_us), int(cumulative_us))
+    return modules
+
+def measure_command(command: str) -> dict:
+    """以 --help 运行命令：click解析参数前main.py的所有导入都已完成，但不做实际工作"""
+    start_time = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', 'main.py', command, '--help'],
+        cwd=PROJECT_DIR, capture_output=True, text=True
+    )
+    wall = time.perf_counter() - start_time
+    if proc.returncode != 0:
+        raise click.ClickException(f"命令运行失败: {command}\n{proc.stderr[-2000:]}")
+
+    modules = parse_importtime(proc.stderr)
+    # 最外层导入的累计耗时之和即为总导入耗时
+    total_us = sum(cumulative for depth, _, cumulative in modules.values() if depth == 0)
+    forbidden = sorted({name.split('.')[0] for name in modules} & set(FORBIDDEN_MODULES))
+    return {'command': command, 'wall_ms': wall * 1000, 'import_ms': total_us / 1000,
+            'modules': modules, 'forbidden': forbidden}
+
+def top_modules(modules: Dict[str, Tuple[int, int, int]], limit: int) -> List[Tuple[str, int]]:
+    """累计耗时最高的最外层导入"""
+    top_level = [(name, cumulative) for name, (depth, _, cumulative) in modules.items() if depth == 0]
+    return sorted(top_level, key=lambda item: item[1], reverse=True)[:limit]
+
+@click.command()
+@click.option('--command', '-c', 'commands', multiple=True, help='要测量的命令，可多次指定（默认所有轻量命令）')
+@click.option('--budget-ms', default=500.0, help='单个命令导入耗时预算(毫秒)')
+@click.option('--top', default=8, help='显示累计耗时最高的模块数')
+def main(commands, budget_ms, top):
+    """运行基准测试"""
+    failed = False
+    for command in commands or LIGHT_COMMANDS:
+        result = measure_command(command)
+        print(f"{command:<12} 导入 {result['import_ms']:>8.1f} ms   进程总耗时 {result['wall_ms']:>8.1f} ms")
+        for name, cumulative in top_modules(result['modules'], top):
+            print(f"    {name:<32}{cumulative / 1000:>8.1f} ms")
+
+        if result['forbidden']:
+            failed = True
+            print(f"    ✗ 导入了重量级模块: {', '.join(result['forbidden'])}")
+        if result['import_ms'] > budget_ms:
+            failed = True
+            print(f"    ✗ 导入耗时超出预算 {budget_ms:.0f} ms")
+
+    if failed:
+        sys.exit(1)
+    print("\n所有命令均未导入重量级依赖，且导入耗时在预算内")
+
+if __name__ == '__main__':
+    main()
@@ -2,9 +2,10 @@
 自动化测试配置文件
 """
 import os
+from functools import lru_cache
 from pathlib import Path
 from typing import Optional
-from pydantic import BaseSettings
+from pydantic.v1 import BaseSettings
 
 class Settings(BaseSettings):
     """应用配置类"""
@@ -43,8 +44,16 @@ class Settings(BaseSettings):
         env_file = ".env"
         case_sensitive = False
 
-# 全局配置实例
-settings = Settings()
+@lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    """第一次使用时才读取配置并创建数据目录，导入本模块没有副作用"""
+    settings = Settings()
+    # 确保数据目录存在
+    settings.DATA_DIR.mkdir(exist_ok=True)
+    return settings
 
-# 确保数据目录存在
-settings.DATA_DIR.mkdir(exist_ok=True) 
\ No newline at end of file
+def __getattr__(name):
+    # 兼容原来的 `from config.settings import settings`
+    if name == 'settings':
+        return get_settings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}") 
\ No newline at end of file
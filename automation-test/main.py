@@ -4,6 +4,7 @@ AI浏览器自动化测试工具 - 命令行接口
 """
 import os
 import sys
+from datetime import datetime
 from pathlib import Path
 from typing import Optional
 import click
@@ -14,9 +15,12 @@ from rich.table import Table
 # 添加src目录到Python路径
 sys.path.insert(0, str(Path(__file__).parent / "src"))
 
+# 只导入轻量模块；Playwright、LangChain等重量级依赖由需要它们的命令在函数内导入，
+# 让validate、list-files、analyze等命令快速启动
 from src.models import TestConfig
-from src.replay_engine import ReplayEngine
 from src.data_loader import LearningDataLoader
+from src.result_sink import JsonlResultSink
+from src.history_store import HistoryStore
 
 console = Console()
 
@@ -29,45 +33,125 @@ def cli():
     """
     pass
 
-@cli.command()
-@click.argument('file_path', type=click.Path(exists=True))
-@click.option('--browser', '-b', default='chromium', 
-              type=click.Choice(['chromium', 'firefox', 'webkit']),
-              help='浏览器类型')
-@click.option('--headless', is_flag=True, help='无头模式运行')
-@click.option('--slow-mo', default=1000, help='操作间隔时间(毫秒)')
-@click.option('--timeout', default=30000, help='超时时间(毫秒)')
-@click.option('--delay', default=1.0, help='操作间延迟(秒)')
-@click.option('--retry', default=3, help='重试次数')
-@click.option('--start-url', help='起始URL')
-@click.option('--output', '-o', help='输出结果文件')
-@click.option('--openai-key', envvar='OPENAI_API_KEY', help='OpenAI API密钥')
-@click.option('--openai-base-url', envvar='OPENAI_BASE_URL', help='OpenAI兼容接口的base URL')
-@click.option('--openai-model', envvar='OPENAI_MODEL',default='gpt-3.5-turbo', help='AI模型名称')
-@click.option('--max-tokens', envvar='OPENAI_MAX_TOKENS', default=1000, help='AI最大token数')
-def replay(file_path, browser, headless, slow_mo, timeout, delay, retry, start_url, output, 
-           openai_key, openai_base_url, openai_model, max_tokens):
-    """重放学习轨迹文件"""
-    
-    console.print(f"[bold blue]🤖 AI浏览器自动化测试工具[/bold blue]")
-    console.print(f"文件: {file_path}")
-    console.print(f"浏览器: {browser}")
-    console.print(f"无头模式: {'是' if headless else '否'}")
-    console.print()
+REPLAY_OPTIONS = [
+    click.option('--browser', '-b', default='chromium', 
+                 type=click.Choice(['chromium', 'firefox', 'webkit']),
+                 help='浏览器类型'),
+    click.option('--headless', is_flag=True, help='无头模式运行'),
+    click.option('--slow-mo', default=1000, help='操作间隔时间(毫秒)'),
+    click.option('--timeout', default=30000, help='超时时间(毫秒)'),
+    click.option('--delay', default=1.0, help='操作间延迟(秒)'),
+    click.option('--retry', default=3, help='重试次数'),
+    click.option('--wait-strategy', default='fixed', type=click.Choice(['fixed', 'settle']),
+                 help='操作后的等待方式 (fixed: 固定延迟 / settle: 等到页面静止)'),
+    click.option('--settle-quiet-ms', default=300, help='页面无变化多久视为静止(毫秒)'),
+    click.option('--settle-timeout-ms', default=5000, help='等待页面静止的上限(毫秒)'),
+    click.option('--start-url', help='起始URL'),
+    click.option('--output', '-o', help='输出结果文件'),
+    click.option('--openai-key', envvar='OPENAI_API_KEY', help='OpenAI API密钥'),
+    click.option('--openai-base-url', envvar='OPENAI_BASE_URL', help='OpenAI兼容接口的base URL'),
+    click.option('--openai-model', envvar='OPENAI_MODEL',default='gpt-3.5-turbo', help='AI模型名称'),
+    click.option('--max-tokens', envvar='OPENAI_MAX_TOKENS', default=1000, help='AI最大token数'),
+    click.option('--stream', is_flag=True, help='流式加载轨迹文件，边解析边重放'),
+    click.option('--nav-wait-ms', default=1000, help='强制导航前等待进行中导航的时间(毫秒)'),
+    click.option('--spa', is_flag=True, help='同源页面间使用History API切换路由，不重新加载'),
+    click.option('--locate-mode', default='race', type=click.Choice(['race', 'sequential']),
+                 help='元素定位模式'),
+    click.option('--no-selector-cache', is_flag=True, help='不使用跨运行的选择器缓存'),
+    click.option('--no-heal', is_flag=True, help='所有定位策略失败时不按DOM相似度本地修复'),
+    click.option('--heal-threshold', default=0.7, type=click.FloatRange(0, 1),
+                 help='本地修复置信度阈值，低于此值不使用修复结果'),
+    click.option('--ai-heal', is_flag=True, help='本地修复失败时请AI建议选择器，实际执行成功才算修复'),
+    click.option('--ai-heal-timeout', default=15.0, help='重放路径上等待AI建议选择器的最长时间(秒)，超时跳过修复'),
+    click.option('--heal-output', default='copy', type=click.Choice(['copy', 'patch', 'off']),
+                 help='验证通过的修复保存方式 (copy: 补丁文件和修复后的轨迹副本 / patch: 只写补丁文件 / off: 不保存)'),
+    click.option('--patch', 'patch_file', type=click.Path(exists=True), help='重放前应用的修复补丁文件'),
+    click.option('--browser-endpoint', envvar='BROWSER_ENDPOINT', help='浏览器服务的CDP地址'),
+    click.option('--no-browser-server', is_flag=True, help='不连接浏览器服务，总是本地启动浏览器'),
+    click.option('--coalesce-input', is_flag=True, help='合并逐键输入记录为一次填写，去掉输入前的聚焦点击'),
+    click.option('--jsonl', is_flag=True, help='每完成一步就把结果追加到JSONL文件，崩溃时已完成的结果不丢失'),
+    click.option('--retention', default='all', type=click.Choice(['all', 'aggregate']),
+                 help='内存中保留的结果 (all: 所有步骤 / aggregate: 只保留汇总，需配合--jsonl)'),
+    click.option('--fsync-every', default=20, help='JSONL结果每写入多少行落盘一次'),
+    click.option('--no-history', is_flag=True, help='不把本次结果写入历史库'),
+    click.option('--no-llm-cache', is_flag=True, help='不使用AI响应缓存，每次都调用LLM'),
+    click.option('--ai-mode', default='background', type=click.Choice(['background', 'batch']),
+                 help='AI失败分析方式 (background: 每步单独后台分析 / batch: 会话结束时按页面分组批量分析)'),
+    click.option('--ai-workers', default=2, type=click.IntRange(min=1), help='后台AI失败分析的线程数'),
+    click.option('--ai-drain-timeout', default=60.0, help='会话结束时等待未完成AI分析的最长时间(秒)')
+]
+
+def replay_options(command):
+    """重放、套件重放和分片重放共用的选项"""
+    for option in reversed(REPLAY_OPTIONS):
+        command = option(command)
+    return command
+
+def build_config(browser, headless, slow_mo, timeout, delay, retry, wait_strategy,
+                 settle_quiet_ms, settle_timeout_ms, openai_key, openai_base_url, openai_model, max_tokens,
+                 stream, nav_wait_ms, spa, locate_mode, no_selector_cache, no_heal, heal_threshold,
+                 ai_heal, ai_heal_timeout, heal_output, patch_file, browser_endpoint, no_browser_server,
+                 coalesce_input, jsonl, retention, fsync_every, no_history, no_llm_cache,
+                 ai_mode, ai_workers, ai_drain_timeout, **overrides) -> TestConfig:
+    """由共用选项构建重放配置"""
+    if retention == 'aggregate' and not jsonl:
+        console.print("[yellow]⚠️ --retention aggregate 未配合 --jsonl，结果文件中将不包含逐步结果[/yellow]")
     
-    # 配置
-    config = TestConfig(
+    return TestConfig(
         browser_type=browser,
         headless=headless,
         slow_mo=slow_mo,
         timeout=timeout,
         replay_delay=delay,
         retry_count=retry,
+        wait_strategy=wait_strategy,
+        settle_quiet_ms=settle_quiet_ms,
+        settle_timeout_ms=settle_timeout_ms,
         openai_api_key=openai_key,
         openai_base_url=openai_base_url,
         openai_model=openai_model,
-        max_tokens=max_tokens
+        max_tokens=max_tokens,
+        llm_cache=not no_llm_cache,
+        ai_analysis_mode=ai_mode,
+        ai_workers=ai_workers,
+        ai_drain_timeout=ai_drain_timeout,
+        stream_records=stream,
+        coalesce_input=coalesce_input,
+        result_sink=jsonl,
+        result_retention=retention,
+        fsync_every=fsync_every,
+        history=not no_history,
+        nav_wait_ms=nav_wait_ms,
+        spa_navigation=spa,
+        locate_mode=locate_mode,
+        selector_cache=not no_selector_cache,
+        self_heal=not no_heal,
+        heal_threshold=heal_threshold,
+        ai_heal=ai_heal,
+        ai_heal_timeout=ai_heal_timeout,
+        heal_output=heal_output,
+        patch_file=patch_file,
+        browser_endpoint=browser_endpoint,
+        use_browser_server=not no_browser_server,
+        **overrides
     )
+
+@cli.command()
+@click.argument('file_path', type=click.Path(exists=True))
+@replay_options
+@click.option('--from-step', default=1, type=click.IntRange(min=1), help='从第几步开始重放（从1开始）')
+def replay(file_path, start_url, output, from_step, **options):
+    """重放学习轨迹文件"""
+    from src.replay_engine import ReplayEngine
+    
+    console.print(f"[bold blue]🤖 AI浏览器自动化测试工具[/bold blue]")
+    console.print(f"文件: {file_path}")
+    console.print(f"浏览器: {options['browser']}")
+    console.print(f"无头模式: {'是' if options['headless'] else '否'}")
+    console.print()
+    
+    # 配置
+    config = build_config(from_step=from_step, **options)
     
     try:
         # 创建重放引擎
@@ -99,22 +183,132 @@ def replay(file_path, browser, headless, slow_mo, timeout, delay, retry, start_u
         logger.error(f"重放失败: {e}")
         sys.exit(1)
 
+@cli.command('browser-server')
+@click.option('--port', '-p', default=9222, help='CDP调试端口')
+@click.option('--headless', is_flag=True, help='无头模式运行')
+def browser_server(port, headless):
+    """启动常驻浏览器服务，后续重放直接连接以跳过浏览器启动"""
+    import asyncio
+    from playwright.async_api import async_playwright
+    from src.browser_server import serve_browser, ENDPOINT_FILE
+    
+    console.print(f"[bold blue]🌐 浏览器服务[/bold blue]")
+    console.print(f"CDP地址: http://127.0.0.1:{port}")
+    console.print(f"地址文件: {ENDPOINT_FILE}")
+    console.print("按 Ctrl+C 停止服务")
+    console.print()
+    
+    async def serve():
+        async with async_playwright() as playwright:
+            await serve_browser(playwright, TestConfig(headless=headless), port=port)
+    
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        console.print("\n[green]✅ 浏览器服务已停止[/green]")
+    except Exception as e:
+        console.print(f"[red]❌ 浏览器服务启动失败: {e}[/red]")
+        logger.error(f"浏览器服务启动失败: {e}")
+        sys.exit(1)
+
+@cli.command('replay-suite')
+@click.argument('suite_dir', type=click.Path(exists=True, file_okay=False))
+@click.option('--concurrency', '-c', default=4, help='同时重放的轨迹数')
+@replay_options
+def replay_suite(suite_dir, concurrency, start_url, output, **options):
+    """并发重放目录下的所有学习轨迹文件"""
+    from src.suite_runner import SuiteRunner
+    
+    files = SuiteRunner.discover_files(suite_dir)
+    
+    console.print(f"[bold blue]🤖 套件重放[/bold blue]")
+    console.print(f"目录: {suite_dir}")
+    console.print(f"文件数: {len(files)}")
+    console.print(f"并发数: {concurrency}")
+    console.print()
+    
+    if not files:
+        console.print("[yellow]没有找到学习轨迹文件[/yellow]")
+        return
+    
+    config = build_config(**options)
+    
+    try:
+        with SuiteRunner(config, concurrency=concurrency) as runner:
+            runner.run(files, start_url)
+            runner.print_summary()
+            result_file = runner.save_results(output)
+        
+        console.print(f"\n[green]✅ 套件重放完成！结果已保存到: {result_file}[/green]")
+        
+        if runner.report.failed_files:
+            sys.exit(1)
+        
+    except Exception as e:
+        console.print(f"[red]❌ 套件重放失败: {e}[/red]")
+        logger.error(f"套件重放失败: {e}")
+        sys.exit(1)
+
+@cli.command('run-suite')
+@click.argument('suite_dir', type=click.Path(exists=True, file_okay=False))
+@click.option('--workers', '-w', default=os.cpu_count() or 1, help='工作进程数')
+@click.option('--concurrency', '-c', default=1, help='每个工作进程同时重放的轨迹数')
+@replay_options
+def run_suite(suite_dir, workers, concurrency, start_url, output, **options):
+    """把目录下的轨迹文件分片到多个进程并行重放"""
+    from src.suite_runner import SuiteRunner
+    from src.sharded_runner import ShardedSuiteRunner, load_historical_durations
+    
+    files = SuiteRunner.discover_files(suite_dir)
+    
+    console.print(f"[bold blue]🤖 分片套件重放[/bold blue]")
+    console.print(f"目录: {suite_dir}")
+    console.print(f"文件数: {len(files)}")
+    console.print(f"工作进程: {workers} x 并发 {concurrency}")
+    console.print()
+    
+    if not files:
+        console.print("[yellow]没有找到学习轨迹文件[/yellow]")
+        return
+    
+    config = build_config(**options)
+    
+    try:
+        # 按历史耗时均衡分片，没有历史记录的文件按记录数估算
+        durations = load_historical_durations(Path("data"))
+        
+        with ShardedSuiteRunner(config, workers=workers, concurrency=concurrency,
+                                durations=durations) as runner:
+            runner.run(files, start_url)
+            runner.print_summary()
+            result_file = runner.save_results(output)
+        
+        console.print(f"\n[green]✅ 分片套件重放完成！结果已保存到: {result_file}[/green]")
+        
+        if runner.report.failed_files:
+            sys.exit(1)
+        
+    except Exception as e:
+        console.print(f"[red]❌ 分片套件重放失败: {e}[/red]")
+        logger.error(f"分片套件重放失败: {e}")
+        sys.exit(1)
+
 @cli.command()
 @click.argument('file_path', type=click.Path(exists=True))
-def validate(file_path):
-    """验证学习轨迹文件"""
+@click.option('--no-index', is_flag=True, help='不使用轨迹索引，重新解析所有文件')
+def validate(file_path, no_index):
+    """验证学习轨迹文件（传入目录时验证目录下所有轨迹文件）"""
     
+    is_dir = Path(file_path).is_dir()
     console.print(f"[bold blue]🔍 验证学习轨迹文件[/bold blue]")
-    console.print(f"文件: {file_path}")
+    console.print(f"{'目录' if is_dir else '文件'}: {file_path}")
     console.print()
     
     try:
-        # 加载数据
+        # 单遍流式统计：校验和摘要一次完成，记录不驻留内存；未变化的文件直接读取索引
         data_loader = LearningDataLoader(Path("data"))
-        records = data_loader.load_from_file(file_path)
-        
-        # 验证数据
-        validation = data_loader.validate_records(records)
+        stats = data_loader.collect_stats(file_path, use_index=not no_index)
+        validation = stats.validation_result()
         
         # 显示验证结果
         table = Table(title="验证结果")
@@ -122,6 +316,9 @@ def validate(file_path):
         table.add_column("数量", style="magenta")
         table.add_column("状态", style="green")
         
+        if is_dir:
+            table.add_row("文件数", str(validation['files']),
+                         "⚠️" if validation['file_errors'] else "✅")
         table.add_row("总记录数", str(validation['total_records']), "")
         table.add_row("有效记录", str(validation['valid_records']), 
                      "✅" if validation['valid_records'] > 0 else "❌")
@@ -137,20 +334,65 @@ def validate(file_path):
         console.print(table)
         
         # 显示摘要
-        summary = data_loader.get_records_summary(records)
-        show_records_summary(summary)
+        show_records_summary(stats.summary())
+        
+        # 显示无法读取的文件
+        if validation['file_errors']:
+            console.print("\n[red]无法读取的文件:[/red]")
+            for name, error in validation['file_errors'].items():
+                console.print(f"  • {name}: {error}")
         
         # 显示错误详情
         if validation['errors']:
             console.print("\n[red]错误详情:[/red]")
             for error in validation['errors'][:10]:  # 只显示前10个错误
                 console.print(f"  • {error}")
+            if validation['error_count'] > 10:
+                console.print(f"  ... 共 {validation['error_count']} 个错误")
         
     except Exception as e:
         console.print(f"[red]❌ 验证失败: {e}[/red]")
         logger.error(f"验证失败: {e}")
         sys.exit(1)
 
+@cli.command()
+@click.argument('file_path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--output', '-o', help='输出文件（默认与输入同名，扩展名为 .trajbin 或 .json）')
+def convert(file_path, output):
+    """在JSON和紧凑二进制轨迹格式之间转换（方向根据输入文件自动判断）
+
+    输入为 .jsonl 重放结果时，转换为缩进的JSON结果文件
+    """
+    
+    console.print(f"[bold blue]🔄 转换学习轨迹文件[/bold blue]")
+    console.print(f"文件: {file_path}")
+    console.print()
+    
+    try:
+        if Path(file_path).suffix == '.jsonl':
+            output_path = JsonlResultSink.to_json(file_path, output or Path(file_path).with_suffix('.json'))
+        else:
+            data_loader = LearningDataLoader(Path("data"))
+            output_path = data_loader.convert_file(file_path, output)
+        
+        input_size = Path(file_path).stat().st_size
+        output_size = output_path.stat().st_size
+        
+        table = Table(title="转换结果")
+        table.add_column("项目", style="cyan")
+        table.add_column("值", style="magenta")
+        table.add_row("输出文件", str(output_path))
+        table.add_row("原始大小", f"{input_size / 1024:.1f} KB")
+        table.add_row("转换后大小", f"{output_size / 1024:.1f} KB")
+        if output_size:
+            table.add_row("压缩比", f"{input_size / output_size:.1f}x")
+        console.print(table)
+        
+    except Exception as e:
+        console.print(f"[red]❌ 转换失败: {e}[/red]")
+        logger.error(f"转换失败: {e}")
+        sys.exit(1)
+
 @cli.command()
 @click.option('--data-dir', default='data', help='数据目录')
 def list_files(data_dir):
@@ -161,10 +403,11 @@ def list_files(data_dir):
     console.print()
     
     try:
+        # 从轨迹索引读取，只有新增或修改过的文件才会重新解析
         data_loader = LearningDataLoader(Path(data_dir))
-        files = data_loader.list_available_files()
+        entries = data_loader.index_entries()
         
-        if not files:
+        if not entries:
             console.print("[yellow]没有找到JSON文件[/yellow]")
             return
         
@@ -173,33 +416,24 @@ def list_files(data_dir):
         table.add_column("大小", style="magenta")
         table.add_column("修改时间", style="green")
         table.add_column("记录数", style="yellow")
+        table.add_column("校验", style="blue")
         
-        for file_path in files:
-            try:
-                # 获取文件信息
-                stat = file_path.stat()
-                size = stat.st_size
-                mtime = stat.st_mtime
-                
-                # 尝试读取记录数
-                records = data_loader.load_from_file(file_path)
-                record_count = len(records)
-                
-                # 格式化显示
-                size_str = f"{size / 1024:.1f} KB"
-                mtime_str = Path(file_path).stat().st_mtime
-                from datetime import datetime
-                mtime_str = datetime.fromtimestamp(mtime).strftime("%Y-%m-%d %H:%M")
-                
-                table.add_row(
-                    file_path.name,
-                    size_str,
-                    mtime_str,
-                    str(record_count)
-                )
-                
-            except Exception as e:
-                table.add_row(file_path.name, "?", "?", "错误")
+        for entry in entries:
+            size_str = f"{entry['size'] / 1024:.1f} KB"
+            mtime_str = datetime.fromtimestamp(entry['mtime']).strftime("%Y-%m-%d %H:%M")
+            
+            if entry['error']:
+                table.add_row(entry['name'], size_str, mtime_str, "错误", "❌")
+                continue
+            
+            status = "✅" if entry['invalid_records'] == 0 else f"⚠️ {entry['invalid_records']} 条无效"
+            table.add_row(
+                entry['name'],
+                size_str,
+                mtime_str,
+                str(entry['record_count']),
+                status
+            )
         
         console.print(table)
         
@@ -211,30 +445,36 @@ def list_files(data_dir):
 @cli.command()
 @click.argument('file_path', type=click.Path(exists=True))
 @click.option('--type', '-t', multiple=True, help='过滤操作类型')
-@click.option('--url', help='过滤URL模式')
-def analyze(file_path, type, url):
-    """分析学习轨迹文件"""
+@click.option('--url', help='过滤URL模式（子串，或通配符*如 /checkout/*；? 和 [ 按字面匹配）')
+@click.option('--regex', is_flag=True, help='--url按正则表达式匹配')
+@click.option('--no-index', is_flag=True, help='不使用轨迹索引，重新解析所有文件')
+def analyze(file_path, type, url, regex, no_index):
+    """分析学习轨迹文件（传入目录时汇总目录下所有轨迹文件）"""
     
+    is_dir = Path(file_path).is_dir()
     console.print(f"[bold blue]📊 分析学习轨迹文件[/bold blue]")
-    console.print(f"文件: {file_path}")
+    console.print(f"{'目录' if is_dir else '文件'}: {file_path}")
     console.print()
     
     try:
-        # 加载数据
-        data_loader = LearningDataLoader(Path("data"))
-        records = data_loader.load_from_file(file_path)
-        
-        # 过滤记录
         if type:
-            records = data_loader.filter_records_by_type(records, list(type))
             console.print(f"过滤操作类型: {', '.join(type)}")
-        
         if url:
-            records = data_loader.filter_records_by_url(records, url)
             console.print(f"过滤URL模式: {url}")
         
+        # 单遍流式统计：过滤和摘要一次完成，记录不驻留内存；没有过滤条件时读取索引
+        data_loader = LearningDataLoader(Path("data"))
+        stats = data_loader.collect_stats(file_path, list(type), url,
+                                          use_index=not no_index, url_regex=regex)
+        
+        if is_dir:
+            console.print(f"文件数: {stats.files}")
+            # 目录查询URL时列出命中的文件和步骤（统计时已从URL索引查出，不读取其他文件）
+            if stats.url_hits is not None:
+                show_url_hits(stats.url_hits)
+        
         # 获取摘要
-        summary = data_loader.get_records_summary(records)
+        summary = stats.summary()
         show_records_summary(summary)
         
         # 显示操作类型分布
@@ -265,6 +505,132 @@ def analyze(file_path, type, url):
         logger.error(f"分析失败: {e}")
         sys.exit(1)
 
+@cli.command()
+@click.option('--last', '-n', default=20, help='每个轨迹统计最近几次运行')
+@click.option('--file', 'trajectory', help='只统计路径包含该字符串的轨迹')
+@click.option('--top', default=10, help='最慢/最不稳定步骤显示的条数')
+@click.option('--history-file', default='data/history.sqlite', help='历史库文件')
+def history(last, trajectory, top, history_file):
+    """统计历史重放结果：步骤耗时分位数、不稳定步骤和最慢步骤"""
+    
+    console.print(f"[bold blue]📈 历史重放统计[/bold blue]")
+    console.print(f"每个轨迹最近 {last} 次运行")
+    console.print()
+    
+    if not Path(history_file).exists():
+        console.print("[yellow]还没有历史结果，重放后会自动记录[/yellow]")
+        return
+    
+    try:
+        with HistoryStore(history_file) as store:
+            trajectories = store.trajectory_stats(last, trajectory)
+            flaky = store.flaky_steps(last, trajectory, top)
+            slowest = store.slowest_steps(last, trajectory, top)
+        
+        if not trajectories:
+            console.print("[yellow]没有匹配的历史结果[/yellow]")
+            return
+        
+        table = Table(title="轨迹概览")
+        table.add_column("轨迹", style="cyan")
+        table.add_column("运行次数", style="magenta")
+        table.add_column("通过率", style="green")
+        table.add_column("平均耗时", style="yellow")
+        table.add_column("步骤p50", style="blue")
+        table.add_column("步骤p95", style="blue")
+        table.add_column("步骤p99", style="blue")
+        for item in trajectories:
+            table.add_row(
+                Path(item['trajectory']).name,
+                str(item['runs']),
+                f"{item['pass_rate'] * 100:.0f}%",
+                f"{item['avg_duration']:.1f}秒",
+                f"{item['p50']:.2f}秒",
+                f"{item['p95']:.2f}秒",
+                f"{item['p99']:.2f}秒"
+            )
+        console.print(table)
+        
+        if flaky:
+            flaky_table = Table(title="不稳定步骤")
+            flaky_table.add_column("轨迹", style="cyan")
+            flaky_table.add_column("步骤", style="magenta")
+            flaky_table.add_column("操作", style="white")
+            flaky_table.add_column("失败率", style="red")
+            flaky_table.add_column("重试率", style="yellow")
+            flaky_table.add_column("运行次数", style="green")
+            for item in flaky:
+                flaky_table.add_row(
+                    Path(item['trajectory']).name,
+                    str(item['step']),
+                    item['description'] or "",
+                    f"{item['failure_rate'] * 100:.0f}%",
+                    f"{item['retry_rate'] * 100:.0f}%",
+                    str(item['runs'])
+                )
+            console.print(flaky_table)
+        else:
+            console.print("[green]✅ 没有不稳定的步骤[/green]")
+        
+        slow_table = Table(title="最慢步骤")
+        slow_table.add_column("轨迹", style="cyan")
+        slow_table.add_column("步骤", style="magenta")
+        slow_table.add_column("操作", style="white")
+        slow_table.add_column("p50", style="blue")
+        slow_table.add_column("p95", style="blue")
+        slow_table.add_column("累计耗时", style="yellow")
+        for item in slowest:
+            slow_table.add_row(
+                Path(item['trajectory']).name,
+                str(item['step']),
+                item['description'] or "",
+                f"{item['p50']:.2f}秒",
+                f"{item['p95']:.2f}秒",
+                f"{item['total_time']:.1f}秒"
+            )
+        console.print(slow_table)
+        
+    except Exception as e:
+        console.print(f"[red]❌ 统计历史结果失败: {e}[/red]")
+        logger.error(f"统计历史结果失败: {e}")
+        sys.exit(1)
+
+def show_url_hits(hits):
+    """显示URL查询命中的文件和步骤"""
+    if not hits:
+        console.print("[yellow]没有步骤匹配该URL[/yellow]")
+        return
+    
+    steps_by_file = {}
+    for file_path, step in hits:
+        steps_by_file.setdefault(file_path, []).append(step)
+    
+    table = Table(title=f"URL命中的步骤 ({len(hits)}步, {len(steps_by_file)}个文件)")
+    table.add_column("文件名", style="cyan")
+    table.add_column("步骤数", style="magenta")
+    table.add_column("步骤", style="green")
+    
+    for file_path, steps in list(steps_by_file.items())[:20]:  # 只显示前20个文件
+        table.add_row(file_path.name, str(len(steps)), format_steps(steps))
+    
+    console.print(table)
+    if len(steps_by_file) > 20:
+        console.print(f"... 还有 {len(steps_by_file) - 20} 个文件")
+
+def format_steps(steps, limit=8):
+    """把步骤号压缩为区间显示，如 1-5, 9, 12-14"""
+    ranges = []
+    for step in steps:
+        if ranges and step == ranges[-1][1] + 1:
+            ranges[-1][1] = step
+        else:
+            ranges.append([step, step])
+    
+    parts = [f"{a}-{b}" if a != b else str(a) for a, b in ranges[:limit]]
+    if len(ranges) > limit:
+        parts.append("...")
+    return ", ".join(parts)
+
 def show_records_summary(summary):
     """显示记录摘要"""
     table = Table(title="记录摘要")
@@ -11,14 +11,32 @@ from .models import (
     LearningRecord,
     ReplayResult,
     ReplaySession,
+    SuiteReport,
     TestConfig
 )
 
 from .data_loader import LearningDataLoader
-from .element_locator import ElementLocator
-from .action_executor import ActionExecutor
-from .ai_assistant import AIAssistant
-from .replay_engine import ReplayEngine
+from .record_stats import RecordStats
+
+# 依赖Playwright、LangChain的类按需导入，只用数据加载和统计的命令不必加载它们
+_LAZY_IMPORTS = {
+    'ElementLocator': '.element_locator',
+    'ActionExecutor': '.action_executor',
+    'AIAssistant': '.ai_assistant',
+    'AsyncReplayEngine': '.replay_engine',
+    'ReplayEngine': '.replay_engine',
+    'SuiteRunner': '.suite_runner',
+    'ShardedSuiteRunner': '.sharded_runner'
+}
+
+def __getattr__(name):
+    module_name = _LAZY_IMPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    from importlib import import_module
+    value = getattr(import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
 
 __all__ = [
     'ElementInfo',
@@ -26,10 +44,15 @@ __all__ = [
     'LearningRecord',
     'ReplayResult',
     'ReplaySession',
+    'SuiteReport',
     'TestConfig',
     'LearningDataLoader',
+    'RecordStats',
     'ElementLocator',
     'ActionExecutor',
     'AIAssistant',
-    'ReplayEngine'
+    'AsyncReplayEngine',
+    'ReplayEngine',
+    'SuiteRunner',
+    'ShardedSuiteRunner'
 ] 
\ No newline at end of file
@@ -1,55 +1,74 @@
 """
 操作执行器 - 使用Playwright执行各种操作
 """
+import asyncio
 import time
 from typing import Optional, Dict, Any
-from playwright.sync_api import Page, Locator
+from playwright.async_api import Page, Locator
 from loguru import logger
 
-from .models import LearningRecord, ReplayResult
+from .models import ElementState, LearningRecord, ReplayResult
+from .dom_snapshot import extract_snapshot
 from .element_locator import ElementLocator
+from .selector_cache import SelectorCache
+from .settle import wait_for_settle
 
 class ActionExecutor:
     """操作执行器"""
     
-    def __init__(self, page: Page, config: Dict[str, Any] = None):
+    def __init__(self, page: Page, config: Dict[str, Any] = None,
+                 selector_cache: SelectorCache = None):
         self.page = page
         self.config = config or {}
-        self.locator = ElementLocator(page, self.config.get('selector_priority'))
+        self.locator = ElementLocator(
+            page,
+            self.config.get('selector_priority'),
+            locate_mode=self.config.get('locate_mode', 'race'),
+            cache=selector_cache,
+            heal_threshold=self.config.get('heal_threshold')
+        )
         
         # 配置参数
         self.replay_delay = self.config.get('replay_delay', 1.0)
         self.retry_count = self.config.get('retry_count', 3)
         self.wait_for_navigation = self.config.get('wait_for_navigation', True)
+        
+        # fixed: 每步之后固定等待replay_delay; settle: 等到页面静止为止
+        self.wait_strategy = self.config.get('wait_strategy', 'fixed')
+        self.settle_quiet_ms = self.config.get('settle_quiet_ms', 300)
+        self.settle_timeout_ms = self.config.get('settle_timeout_ms', 5000)
     
-    def execute_action(self, record: LearningRecord) -> ReplayResult:
+    async def execute_action(self, record: LearningRecord) -> ReplayResult:
         """执行单个操作"""
         start_time = time.time()
         retry_count = 0
         last_error = None
+        settle_time = 0.0
         
         for attempt in range(self.retry_count + 1):
             try:
                 logger.info(f"执行操作 {attempt + 1}/{self.retry_count + 1}: {record.description}")
                 
                 # 定位元素
-                locator = self.locator.locate_element(record)
+                locator, strategy = await self.locator.locate_element_with_strategy(record)
                 if not locator:
                     raise Exception("无法定位元素")
                 
+                # 一次往返完成状态探测和滚动到元素位置
+                state = await self.locator.probe_element_state(locator)
+                
                 # 验证元素状态
-                if not self.locator.validate_element_state(locator, record):
+                if not self.locator.check_element_state(state, record):
                     raise Exception("元素状态不适合操作")
                 
-                # 滚动到元素位置
-                self.locator.scroll_to_element(locator)
-                
                 # 执行具体操作
-                selector_used = self._execute_specific_action(record, locator)
+                selector_used = await self._execute_specific_action(record, locator, state)
+                # 记录实际命中的定位策略
+                selector_used = strategy or selector_used
+                heal = self.locator.last_heal
                 
                 # 等待操作完成
-                if self.replay_delay > 0:
-                    time.sleep(self.replay_delay)
+                settle_time += await self._wait_after_action()
                 
                 # 计算执行时间
                 execution_time = time.time() - start_time
@@ -59,7 +78,11 @@ class ActionExecutor:
                     success=True,
                     execution_time=execution_time,
                     retry_count=retry_count,
-                    selector_used=selector_used
+                    selector_used=selector_used,
+                    settle_time=settle_time,
+                    # 以本次定位是否实际应用了本地修复为准；缓存命中的"heal"策略不是新的修复
+                    healed_selector=heal['candidates'][0]['selector'] if heal and heal.get('applied') else None,
+                    heal_confidence=heal['confidence'] if heal else None
                 )
                 
             except Exception as e:
@@ -68,36 +91,89 @@ class ActionExecutor:
                 logger.warning(f"操作失败 (尝试 {attempt + 1}): {e}")
                 
                 if attempt < self.retry_count:
-                    time.sleep(1)  # 重试前等待
+                    # 重试前等待
+                    if self.wait_strategy == 'settle':
+                        settle_time += await self._settle()
+                    else:
+                        await asyncio.sleep(1)
                     continue
         
         # 所有重试都失败了
         execution_time = time.time() - start_time
+        heal = self.locator.last_heal
         return ReplayResult(
             record=record,
             success=False,
             error_message=last_error,
             execution_time=execution_time,
-            retry_count=retry_count
+            retry_count=retry_count,
+            settle_time=settle_time,
+            heal_confidence=heal['confidence'] if heal else None
         )
     
-    def _execute_specific_action(self, record: LearningRecord, locator: Locator) -> str:
+    async def execute_with_selector(self, record: LearningRecord, selector: str,
+                                    strategy: str) -> ReplayResult:
+        """用指定的选择器执行一次操作（不重试），用于验证修复的选择器：只有操作成功才算验证通过"""
+        start_time = time.time()
+        try:
+            locator = await self.locator.locate_with_selector(record, selector, strategy)
+            if not locator:
+                raise Exception(f"无法定位元素: {selector}")
+            
+            state = await self.locator.probe_element_state(locator)
+            if not self.locator.check_element_state(state, record):
+                raise Exception("元素状态不适合操作")
+            
+            await self._execute_specific_action(record, locator, state)
+            settle_time = await self._wait_after_action()
+            
+            return ReplayResult(
+                record=record,
+                success=True,
+                execution_time=time.time() - start_time,
+                selector_used=strategy,
+                settle_time=settle_time,
+                healed_selector=selector
+            )
+        except Exception as e:
+            return ReplayResult(
+                record=record,
+                success=False,
+                error_message=str(e),
+                execution_time=time.time() - start_time
+            )
+    
+    async def _wait_after_action(self) -> float:
+        """操作之后等待页面响应，返回等待的秒数"""
+        if self.wait_strategy == 'settle':
+            return await self._settle()
+        
+        if self.replay_delay > 0:
+            await asyncio.sleep(self.replay_delay)
+        return self.replay_delay
+    
+    async def _settle(self) -> float:
+        """等待页面静止"""
+        return await wait_for_settle(self.page, self.settle_quiet_ms, self.settle_timeout_ms)
+    
+    async def _execute_specific_action(self, record: LearningRecord, locator: Locator,
+                                       state: ElementState = None) -> str:
         """执行具体的操作"""
         action_type = record.type
         selector_used = "unknown"
         
         try:
             if action_type == "click":
-                selector_used = self._execute_click(record, locator)
+                selector_used = await self._execute_click(record, locator)
             
             elif action_type == "input":
-                selector_used = self._execute_input(record, locator)
+                selector_used = await self._execute_input(record, locator)
             
             elif action_type == "change":
-                selector_used = self._execute_change(record, locator)
+                selector_used = await self._execute_change(record, locator, state)
             
             elif action_type == "submit":
-                selector_used = self._execute_submit(record, locator)
+                selector_used = await self._execute_submit(record, locator)
             
             else:
                 raise Exception(f"不支持的操作类型: {action_type}")
@@ -108,7 +184,7 @@ class ActionExecutor:
             logger.error(f"执行 {action_type} 操作失败: {e}")
             raise
     
-    def _execute_click(self, record: LearningRecord, locator: Locator) -> str:
+    async def _execute_click(self, record: LearningRecord, locator: Locator) -> str:
         """执行点击操作"""
         # 确定使用的选择器
         selector_used = self._determine_selector_used(record)
@@ -116,73 +192,75 @@ class ActionExecutor:
         # 执行点击
         if record.position:
             # 使用坐标点击
-            locator.click(position={'x': record.position.x, 'y': record.position.y})
+            await locator.click(position={'x': record.position.x, 'y': record.position.y})
         else:
             # 普通点击
-            locator.click()
+            await locator.click()
         
         logger.debug(f"点击操作成功: {record.description}")
         return selector_used
     
-    def _execute_input(self, record: LearningRecord, locator: Locator) -> str:
+    async def _execute_input(self, record: LearningRecord, locator: Locator) -> str:
         """执行输入操作"""
         selector_used = self._determine_selector_used(record)
         
         # 清空现有内容
-        locator.clear()
+        await locator.clear()
         
         # 输入新内容
         if record.value:
-            locator.fill(record.value)
+            await locator.fill(record.value)
         else:
             # 如果没有value，尝试使用textContent作为占位符
             if record.element.textContent:
-                locator.fill(record.element.textContent)
+                await locator.fill(record.element.textContent)
         
         logger.debug(f"输入操作成功: {record.description}")
         return selector_used
     
-    def _execute_change(self, record: LearningRecord, locator: Locator) -> str:
+    async def _execute_change(self, record: LearningRecord, locator: Locator,
+                              state: ElementState = None) -> str:
         """执行选择操作"""
         selector_used = self._determine_selector_used(record)
         
-        # 获取元素类型
-        tag_name = locator.evaluate('el => el.tagName').lower()
+        # 获取元素类型（优先使用已探测的状态，避免额外往返）
+        if state is None:
+            state = await self.locator.probe_element_state(locator, scroll=False)
+        tag_name = state.tag
         
         if tag_name == 'select':
             # 下拉选择框
             if record.value:
-                locator.select_option(value=record.value)
+                await locator.select_option(value=record.value)
             else:
                 # 如果没有value，选择第一个选项
-                locator.select_option(index=0)
+                await locator.select_option(index=0)
         
         elif tag_name == 'input':
             # 输入框类型
-            input_type = locator.get_attribute('type')
+            input_type = state.type
             if input_type in ['checkbox', 'radio']:
                 # 复选框或单选按钮
-                current_state = locator.is_checked()
-                if not current_state:
-                    locator.check()
+                if not state.checked:
+                    await locator.check()
             else:
                 # 普通输入框
-                self._execute_input(record, locator)
+                await self._execute_input(record, locator)
         
         logger.debug(f"选择操作成功: {record.description}")
         return selector_used
     
-    def _execute_submit(self, record: LearningRecord, locator: Locator) -> str:
+    async def _execute_submit(self, record: LearningRecord, locator: Locator) -> str:
         """执行表单提交操作"""
         selector_used = self._determine_selector_used(record)
         
         # 提交表单
-        locator.press("Enter")
+        await locator.press("Enter")
         
-        # 等待页面导航（如果配置了）
-        if self.wait_for_navigation:
+        # 等待页面导航（如果配置了）；settle模式下由操作后的静止检测负责
+        if self.wait_for_navigation and self.wait_strategy != 'settle':
             try:
-                self.page.wait_for_load_state("networkidle", timeout=10000)
+                await self.page.wait_for_load_state("networkidle", timeout=10000)
             except Exception as e:
                 logger.warning(f"等待页面导航超时: {e}")
         
@@ -204,31 +282,33 @@ class ActionExecutor:
         else:
             return "unknown"
     
-    def wait_for_page_load(self, timeout: int = 10000):
+    async def wait_for_page_load(self, timeout: int = 10000):
         """等待页面加载完成"""
         try:
-            self.page.wait_for_load_state("networkidle", timeout=timeout)
+            await self.page.wait_for_load_state("networkidle", timeout=timeout)
         except Exception as e:
             logger.warning(f"等待页面加载超时: {e}")
     
-    def take_screenshot(self, path: str = None) -> str:
+    async def take_screenshot(self, path: str = None) -> str:
         """截图"""
         if not path:
             timestamp = int(time.time())
             path = f"screenshot_{timestamp}.png"
         
-        self.page.screenshot(path=path)
+        await self.page.screenshot(path=path)
         logger.info(f"截图已保存: {path}")
         return path
     
-    def get_page_info(self) -> Dict[str, Any]:
-        """获取页面信息"""
+    async def get_page_info(self, record: Optional[LearningRecord] = None) -> Dict[str, Any]:
+        """获取页面信息；content是录制元素附近可交互元素的紧凑快照，而不是整页HTML"""
         try:
+            snapshot = await extract_snapshot(self.page, record.element.xpath if record else None)
             return {
                 'url': self.page.url,
-                'title': self.page.title(),
+                'title': await self.page.title(),
                 'viewport_size': self.page.viewport_size,
-                'content': self.page.content()[:1000]  # 前1000个字符
+                'content': snapshot.pop('text', ''),
+                'snapshot': snapshot
             }
         except Exception as e:
             logger.warning(f"获取页面信息失败: {e}")
@@ -2,27 +2,159 @@
 AI助手 - 使用LangChain处理复杂决策和错误恢复
 """
 import json
-from typing import List, Dict, Any, Optional
-from langchain_openai import ChatOpenAI
-from langchain.schema import HumanMessage, SystemMessage
-from langchain.prompts import ChatPromptTemplate
+import threading
+import time
+from typing import List, Dict, Any, Optional, Tuple
 from loguru import logger
 
 from .models import LearningRecord, ReplayResult
+from .dom_snapshot import SNAPSHOT_MAX_CHARS
+from .llm_cache import LLMCache, make_key
+
+# 失败分析提示模板
+_FAILURE_ANALYSIS_PROMPT = [
+    ("system", """你是一个网页自动化测试专家。分析操作失败的原因并提供解决方案。
+
+分析要点：
+1. 元素定位问题（选择器失效、页面结构变化）
+2. 元素状态问题（不可见、禁用、被遮挡）
+3. 页面加载问题（异步加载、动态内容）
+4. 时机问题（操作过快、等待不足）
+
+请提供：
+1. 失败原因分析
+2. 建议的解决方案
+3. 替代定位策略
+4. 是否需要等待或重试"""),
+    ("human", """操作记录：
+- 类型: {action_type}
+- 描述: {description}
+- 元素: {element_info}
+- 错误: {error_message}
+
+页面信息：
+- URL: {url}
+- 标题: {title}
+- 失败元素附近的可交互元素（<标签 属性>文本 @ XPath）:
+{content}
+
+请分析失败原因并提供建议。""")
+]
+
+# 替代选择器提示模板
+_ALTERNATIVE_SELECTORS_PROMPT = [
+    ("system", """你是一个网页元素定位专家。根据页面上的可交互元素和录制的元素信息，提供替代的CSS选择器。
+
+要求：
+1. 提供多种选择器策略
+2. 按可靠性排序
+3. 考虑元素的唯一性和稳定性
+4. 避免过于复杂的选择器"""),
+    ("human", """元素信息：
+{element_info}
+
+失败元素附近的可交互元素（<标签 属性>文本 @ XPath）：
+{page_content}
+
+请提供3-5个替代选择器，按可靠性排序。只返回JSON数组，不要包含其他文字：
+[{{"type": "css、xpath或text", "selector": "选择器"}}]""")
+]
+
+# 选择器类型对应的Playwright选择器前缀
+_SELECTOR_PREFIXES = {'xpath': 'xpath=', 'text': 'text='}
+
+# 重试策略提示模板
+_RETRY_STRATEGY_PROMPT = [
+    ("system", """你是一个自动化测试策略专家。根据最近的失败记录，决定是否继续重试以及如何调整策略。
+
+考虑因素：
+1. 失败模式（连续失败、间歇性失败）
+2. 失败原因（定位问题、状态问题、时机问题）
+3. 重试成本（时间、资源）
+4. 成功概率"""),
+    ("human", """最近的失败记录：
+{failure_summary}
+
+当前操作：
+{current_record}
+
+请决定：
+1. 是否继续重试
+2. 重试次数
+3. 策略调整建议
+4. 是否跳过此操作""")
+]
+
+# 页面状态验证提示模板
+_PAGE_STATE_PROMPT = [
+    ("system", """你是一个网页状态验证专家。检查当前页面状态是否符合预期。
+
+验证要点：
+1. 页面标题和URL
+2. 关键元素是否存在
+3. 页面内容是否匹配
+4. 是否有错误信息"""),
+    ("human", """预期元素：
+{expected_elements}
+
+实际页面信息：
+{actual_page_info}
+
+请验证页面状态是否符合预期。""")
+]
+
+# 批量失败分析提示模板：同一页面上的多个失败步骤合并为一次请求，系统提示和页面内容只发送一次
+_BATCH_ANALYSIS_PROMPT = [
+    ("system", """你是一个网页自动化测试专家。同一页面上有多个操作失败，它们往往由同一次页面改版引起。
+请逐个分析失败原因，给出解决建议和替代的CSS选择器。
+
+只返回JSON数组，不要包含其他文字，每个失败步骤一项：
+[{{"step": 步骤号, "analysis": "失败原因分析", "suggestions": ["建议1", "建议2"],
+  "selectors": [{{"type": "策略", "selector": "CSS选择器"}}]}}]"""),
+    ("human", """页面信息：
+- URL: {url}
+- 标题: {title}
+- 失败元素附近的可交互元素（<标签 属性>文本 @ XPath）:
+{content}
+
+失败的操作：
+{failures}
+
+请分析每个失败步骤。""")
+]
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算token数：中文等非ASCII字符约每字一个token，ASCII约每4个字符一个token"""
+    non_ascii = sum(1 for char in text if ord(char) > 127)
+    return non_ascii + (len(text) - non_ascii + 3) // 4
+
+def render_prompt(template: List[tuple], **inputs) -> str:
+    """不依赖LangChain渲染提示文本，用于估算token数"""
+    return "\n".join(text.format(**inputs) for _, text in template)
 
 class AIAssistant:
     """AI助手，用于处理复杂的自动化决策"""
     
     def __init__(self, api_key: str = None, model: str = "gpt-3.5-turbo", 
-                 base_url: str = None, max_tokens: int = 1000):
+                 base_url: str = None, max_tokens: int = 1000,
+                 llm: Any = None, cache: Optional[LLMCache] = None):
         self.api_key = api_key
         self.model = model
         self.base_url = base_url
         self.max_tokens = max_tokens
-        self.llm = None
+        # 可以直接传入任何带 invoke(messages) 方法、返回值有content属性的对象（如本地模拟LLM）
+        self.llm = llm
+        # 响应缓存；为None时每次都调用LLM
+        self.cache = cache
+        # 实际发出的LLM请求的耗时和token数（缓存命中不计），AI分析在多个线程中执行所以加锁
+        self.usage = {'requests': 0, 'prompt_tokens': 0, 'completion_tokens': 0, 'latency': 0.0}
+        self._usage_lock = threading.Lock()
         
-        if api_key:
+        if api_key and llm is None:
             try:
+                # LangChain加载较慢，只在配置了API密钥时导入
+                from langchain_openai import ChatOpenAI
+
                 # 构建ChatOpenAI配置
                 llm_config = {
                     'openai_api_key': api_key,
@@ -46,6 +178,41 @@ class AIAssistant:
         """检查AI助手是否可用"""
         return self.llm is not None
     
+    def close(self):
+        """关闭响应缓存"""
+        if self.cache:
+            self.cache.close()
+    
+    def _invoke(self, template: List[tuple], **inputs) -> str:
+        """渲染提示并调用LLM，返回响应文本；相同模型、模板和输入的响应直接取自缓存"""
+        key = None
+        if self.cache:
+            key = make_key(self.model, template, inputs)
+            cached = self.cache.get(key)
+            if cached is not None:
+                logger.debug(f"LLM缓存命中: {key[:12]}")
+                return cached
+        
+        from langchain.prompts import ChatPromptTemplate
+        messages = ChatPromptTemplate.from_messages(template).format_messages(**inputs)
+        start_time = time.perf_counter()
+        response = self.llm.invoke(messages)
+        latency = time.perf_counter() - start_time
+        content = response.content
+        
+        # 优先使用接口返回的token用量，没有时按文本估算
+        usage = getattr(response, 'usage_metadata', None) or {}
+        with self._usage_lock:
+            self.usage['requests'] += 1
+            self.usage['latency'] += latency
+            self.usage['prompt_tokens'] += usage.get('input_tokens') or estimate_tokens(
+                "\n".join(str(message.content) for message in messages))
+            self.usage['completion_tokens'] += usage.get('output_tokens') or estimate_tokens(content)
+        
+        if self.cache:
+            self.cache.put(key, self.model, content)
+        return content
+    
     def analyze_failure(self, record: LearningRecord, error_message: str, 
                        page_info: Dict[str, Any]) -> Dict[str, Any]:
         """分析操作失败的原因并提供建议"""
@@ -53,47 +220,17 @@ class AIAssistant:
             return self._default_failure_analysis(record, error_message)
         
         try:
-            prompt = ChatPromptTemplate.from_messages([
-                ("system", """你是一个网页自动化测试专家。分析操作失败的原因并提供解决方案。
-
-分析要点：
-1. 元素定位问题（选择器失效、页面结构变化）
-2. 元素状态问题（不可见、禁用、被遮挡）
-3. 页面加载问题（异步加载、动态内容）
-4. 时机问题（操作过快、等待不足）
-
-请提供：
-1. 失败原因分析
-2. 建议的解决方案
-3. 替代定位策略
-4. 是否需要等待或重试"""),
-                ("human", """操作记录：
-- 类型: {action_type}
-- 描述: {description}
-- 元素: {element_info}
-- 错误: {error_message}
-
-页面信息：
-- URL: {url}
-- 标题: {title}
-- 内容片段: {content}
-
-请分析失败原因并提供建议。""")
-            ])
-            
-            messages = prompt.format_messages(
+            analysis = self._invoke(
+                _FAILURE_ANALYSIS_PROMPT,
                 action_type=record.type,
                 description=record.description,
                 element_info=json.dumps(record.element.dict(), ensure_ascii=False),
                 error_message=error_message,
                 url=page_info.get('url', ''),
                 title=page_info.get('title', ''),
-                content=page_info.get('content', '')[:500]
+                content=page_info.get('content', '')[:SNAPSHOT_MAX_CHARS]
             )
             
-            response = self.llm.invoke(messages)
-            analysis = response.content
-            
             return {
                 'analysis': analysis,
                 'suggestions': self._extract_suggestions(analysis),
@@ -111,30 +248,12 @@ class AIAssistant:
             return []
         
         try:
-            prompt = ChatPromptTemplate.from_messages([
-                ("system", """你是一个网页元素定位专家。根据页面内容和元素信息，提供替代的CSS选择器。
-
-要求：
-1. 提供多种选择器策略
-2. 按可靠性排序
-3. 考虑元素的唯一性和稳定性
-4. 避免过于复杂的选择器"""),
-                ("human", """元素信息：
-{element_info}
-
-页面内容片段：
-{page_content}
-
-请提供3-5个替代的CSS选择器，按可靠性排序。""")
-            ])
-            
-            messages = prompt.format_messages(
+            content = self._invoke(
+                _ALTERNATIVE_SELECTORS_PROMPT,
                 element_info=json.dumps(record.element.dict(), ensure_ascii=False),
-                page_content=page_content[:1000]
+                page_content=page_content[:SNAPSHOT_MAX_CHARS]
             )
-            
-            response = self.llm.invoke(messages)
-            suggestions = self._parse_selector_suggestions(response.content)
+            suggestions = self._parse_selector_suggestions(content)
             
             return suggestions
             
@@ -142,6 +261,75 @@ class AIAssistant:
             logger.warning(f"AI选择器建议失败: {e}")
             return []
     
+    def analyze_failures_batch(self, failures: List[Tuple[int, ReplayResult]],
+                               page_info: Dict[str, Any]) -> Dict[int, Dict[str, Any]]:
+        """一次请求分析同一页面上的多个失败步骤，返回 步骤号 -> 分析结果（结构与analyze_failure相同，
+        另含alternative_selectors）"""
+        defaults = {
+            step: {**self._default_failure_analysis(result.record, result.error_message or ''),
+                   'alternative_selectors': []}
+            for step, result in failures
+        }
+        if not self.is_available():
+            return defaults
+        
+        try:
+            content = self._invoke(_BATCH_ANALYSIS_PROMPT, **self._batch_inputs(failures, page_info))
+            analyses = self._parse_batch_analysis(content)
+        except Exception as e:
+            logger.warning(f"AI批量分析失败: {e}")
+            return defaults
+        
+        missing = [step for step in defaults if step not in analyses]
+        if missing:
+            logger.warning(f"AI批量分析缺少步骤 {missing} 的结果，使用默认分析")
+        return {step: analyses.get(step, default) for step, default in defaults.items()}
+    
+    def estimate_batch_tokens(self, failures: List[Tuple[int, ReplayResult]],
+                              page_info: Dict[str, Any]) -> Dict[str, int]:
+        """估算同一组失败批量分析与逐步分析（每步两次请求）的提示token数，不发送请求"""
+        per_step = 0
+        for _, result in failures:
+            element_info = json.dumps(result.record.element.dict(), ensure_ascii=False)
+            per_step += estimate_tokens(render_prompt(
+                _FAILURE_ANALYSIS_PROMPT,
+                action_type=result.record.type,
+                description=result.record.description,
+                element_info=element_info,
+                error_message=result.error_message or '',
+                url=page_info.get('url', ''),
+                title=page_info.get('title', ''),
+                content=page_info.get('content', '')[:SNAPSHOT_MAX_CHARS]
+            ))
+            per_step += estimate_tokens(render_prompt(
+                _ALTERNATIVE_SELECTORS_PROMPT,
+                element_info=element_info,
+                page_content=page_info.get('content', '')[:SNAPSHOT_MAX_CHARS]
+            ))
+        batched = estimate_tokens(render_prompt(_BATCH_ANALYSIS_PROMPT, **self._batch_inputs(failures, page_info)))
+        return {'batched_prompt_tokens': batched, 'per_step_prompt_tokens': per_step,
+                'per_step_requests': len(failures) * 2}
+    
+    def _batch_inputs(self, failures: List[Tuple[int, ReplayResult]],
+                      page_info: Dict[str, Any]) -> Dict[str, str]:
+        """批量分析的提示输入"""
+        steps = [
+            {
+                'step': step,
+                'type': result.record.type,
+                'description': result.record.description,
+                'element': result.record.element.dict(exclude_none=True),
+                'error': result.error_message
+            }
+            for step, result in failures
+        ]
+        return {
+            'url': page_info.get('url', ''),
+            'title': page_info.get('title', ''),
+            'content': page_info.get('content', '')[:SNAPSHOT_MAX_CHARS],
+            'failures': json.dumps(steps, ensure_ascii=False, indent=1)
+        }
+    
     def decide_retry_strategy(self, results: List[ReplayResult], 
                             current_record: LearningRecord) -> Dict[str, Any]:
         """决定重试策略"""
@@ -152,39 +340,17 @@ class AIAssistant:
             # 分析最近的失败记录
             recent_failures = [r for r in results[-5:] if not r.success]
             
-            prompt = ChatPromptTemplate.from_messages([
-                ("system", """你是一个自动化测试策略专家。根据最近的失败记录，决定是否继续重试以及如何调整策略。
-
-考虑因素：
-1. 失败模式（连续失败、间歇性失败）
-2. 失败原因（定位问题、状态问题、时机问题）
-3. 重试成本（时间、资源）
-4. 成功概率"""),
-                ("human", """最近的失败记录：
-{failure_summary}
-
-当前操作：
-{current_record}
-
-请决定：
-1. 是否继续重试
-2. 重试次数
-3. 策略调整建议
-4. 是否跳过此操作""")
-            ])
-            
             failure_summary = "\n".join([
                 f"- {r.record.description}: {r.error_message}"
                 for r in recent_failures
             ])
             
-            messages = prompt.format_messages(
+            content = self._invoke(
+                _RETRY_STRATEGY_PROMPT,
                 failure_summary=failure_summary,
                 current_record=json.dumps(current_record.dict(), ensure_ascii=False)
             )
-            
-            response = self.llm.invoke(messages)
-            strategy = self._parse_retry_strategy(response.content)
+            strategy = self._parse_retry_strategy(content)
             
             return strategy
             
@@ -199,30 +365,12 @@ class AIAssistant:
             return {'valid': True, 'confidence': 0.5}
         
         try:
-            prompt = ChatPromptTemplate.from_messages([
-                ("system", """你是一个网页状态验证专家。检查当前页面状态是否符合预期。
-
-验证要点：
-1. 页面标题和URL
-2. 关键元素是否存在
-3. 页面内容是否匹配
-4. 是否有错误信息"""),
-                ("human", """预期元素：
-{expected_elements}
-
-实际页面信息：
-{actual_page_info}
-
-请验证页面状态是否符合预期。""")
-            ])
-            
-            messages = prompt.format_messages(
+            content = self._invoke(
+                _PAGE_STATE_PROMPT,
                 expected_elements=json.dumps(expected_elements, ensure_ascii=False),
                 actual_page_info=json.dumps(actual_page_info, ensure_ascii=False)
             )
-            
-            response = self.llm.invoke(messages)
-            validation = self._parse_validation_result(response.content)
+            validation = self._parse_validation_result(content)
             
             return validation
             
@@ -257,20 +405,51 @@ class AIAssistant:
         
         return suggestions if suggestions else ['请检查元素状态和页面结构']
     
+    def _parse_batch_analysis(self, content: str) -> Dict[int, Dict[str, Any]]:
+        """解析批量分析响应中的JSON数组，允许前后带有多余文字或代码块标记"""
+        start, end = content.find('['), content.rfind(']')
+        if start < 0 or end < start:
+            raise ValueError("响应中没有JSON数组")
+        
+        analyses = {}
+        for item in json.loads(content[start:end + 1]):
+            try:
+                step = int(item['step'])
+            except (KeyError, TypeError, ValueError):
+                continue
+            analysis = str(item.get('analysis', ''))
+            analyses[step] = {
+                'analysis': analysis,
+                'suggestions': [str(s) for s in item.get('suggestions') or []] or self._extract_suggestions(analysis),
+                'alternative_selectors': [
+                    {'type': str(selector.get('type', 'css')), 'selector': str(selector['selector'])}
+                    for selector in item.get('selectors') or []
+                    if isinstance(selector, dict) and selector.get('selector')
+                ],
+                'confidence': 0.8
+            }
+        return analyses
+    
     def _parse_selector_suggestions(self, content: str) -> List[Dict[str, str]]:
-        """解析选择器建议"""
-        suggestions = []
-        lines = content.split('\n')
+        """解析JSON数组形式的选择器建议（允许包在代码块标记中）；选择器原样保留，
+        可以包含冒号，xpath/text类型补上Playwright前缀；响应不是JSON数组时抛出异常"""
+        content = content.strip()
+        if content.startswith('```'):
+            content = content.split('\n', 1)[-1].rsplit('```', 1)[0]
+        items = json.loads(content)
+        if not isinstance(items, list):
+            raise ValueError("选择器建议不是JSON数组")
         
-        for line in lines:
-            line = line.strip()
-            if ':' in line and ('#' in line or '.' in line or '[' in line):
-                parts = line.split(':', 1)
-                if len(parts) == 2:
-                    suggestions.append({
-                        'type': parts[0].strip(),
-                        'selector': parts[1].strip()
-                    })
+        suggestions = []
+        for item in items:
+            if not isinstance(item, dict) or not isinstance(item.get('selector'), str) or not item['selector'].strip():
+                continue
+            selector_type = str(item.get('type') or 'css').strip().lower()
+            selector = item['selector'].strip()
+            prefix = _SELECTOR_PREFIXES.get(selector_type)
+            if prefix and not selector.startswith(prefix):
+                selector = prefix + selector
+            suggestions.append({'type': selector_type, 'selector': selector})
         
         return suggestions
     
@@ -0,0 +1,200 @@
+"""
+二进制轨迹格式 - 字符串表 + 定长记录，支持mmap随机访问任意一步
+
+文件布局（小端序）:
+    文件头      MAGIC, 版本, 记录数, 字符串数, 各段偏移
+    记录段      record_count 条定长记录，第N条位于 records_offset + N * RECORD_SIZE
+    字符串索引  string_count + 1 个偏移量，第i个字符串为 data[index[i]:index[i+1]]
+    字符串数据  所有去重后的UTF-8字符串（URL、选择器、XPath、文本等）
+"""
+import mmap
+import struct
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterable, Iterator, List, Dict, Any, Optional
+
+from .compact_records import _parse_timestamp
+
+MAGIC = b"TRJB"
+VERSION = 1
+BINARY_SUFFIX = ".trajbin"
+
+# 魔数, 版本, 保留, 记录数, 字符串数, 记录段偏移, 字符串索引偏移, 字符串数据偏移
+_HEADER = struct.Struct("<4sHHIIQQQ")
+
+# 记录中以字符串表编号保存的字段，按顺序排列
+_STRING_FIELDS = ('type', 'description', 'url', 'value')
+_ELEMENT_FIELDS = ('tagName', 'id', 'className', 'textContent', 'placeholder',
+                   'type', 'action', 'xpath', 'selector')
+
+# 字符串编号 × 13, 时间戳, 时间戳是否带时区, 是否有位置, x, y
+_RECORD = struct.Struct("<" + "I" * (len(_STRING_FIELDS) + len(_ELEMENT_FIELDS)) + "dBBii")
+RECORD_SIZE = _RECORD.size
+
+_NONE = 0xFFFFFFFF
+_FLAG_AWARE = 1
+_STRING_INDEX = struct.Struct("<Q")
+
+def is_binary_trajectory(file_path: str | Path) -> bool:
+    """根据魔数判断是否为二进制轨迹文件"""
+    try:
+        with open(file_path, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+def write_binary_trajectory(items: Iterable[Dict[str, Any]], output_path: str | Path) -> int:
+    """把插件导出的原始记录（JSON中的字典）写为二进制轨迹，返回记录数"""
+    strings: Dict[str, int] = {}
+    string_list: List[bytes] = []
+
+    def string_id(value: Any) -> int:
+        if value is None:
+            return _NONE
+        value = str(value)
+        index = strings.get(value)
+        if index is None:
+            index = strings[value] = len(string_list)
+            string_list.append(value.encode('utf-8'))
+        return index
+
+    packed: List[bytes] = []
+    for item in items:
+        element = item.get('element', {})
+        timestamp, aware = _parse_timestamp(item.get('timestamp', ''))
+        position = item.get('position')
+        packed.append(_RECORD.pack(
+            string_id(item.get('type', '')),
+            string_id(item.get('description', '')),
+            string_id(item.get('url', '')),
+            string_id(item.get('value')),
+            string_id(element.get('tagName', '')),
+            string_id(element.get('id')),
+            string_id(element.get('className')),
+            string_id(element.get('textContent')),
+            string_id(element.get('placeholder')),
+            string_id(element.get('type')),
+            string_id(element.get('action')),
+            string_id(element.get('xpath', '')),
+            string_id(element.get('selector', '')),
+            timestamp,
+            _FLAG_AWARE if aware else 0,
+            1 if position else 0,
+            position['x'] if position else 0,
+            position['y'] if position else 0
+        ))
+
+    records_offset = _HEADER.size
+    string_index_offset = records_offset + len(packed) * RECORD_SIZE
+    string_data_offset = string_index_offset + (len(string_list) + 1) * _STRING_INDEX.size
+
+    output_path = Path(output_path)
+    tmp_path = output_path.with_suffix(output_path.suffix + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, 0, len(packed), len(string_list),
+                             records_offset, string_index_offset, string_data_offset))
+        f.writelines(packed)
+        offset = 0
+        for data in string_list:
+            f.write(_STRING_INDEX.pack(offset))
+            offset += len(data)
+        f.write(_STRING_INDEX.pack(offset))
+        f.writelines(string_list)
+    tmp_path.replace(output_path)
+
+    return len(packed)
+
+class BinaryTrajectory:
+    """二进制轨迹读取器 - mmap映射文件，按需解码，跳到第N步无需解析前面的记录"""
+
+    def __init__(self, file_path: str | Path):
+        self.file_path = Path(file_path)
+        self._file = open(self.file_path, 'rb')
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"二进制轨迹文件格式错误: {self.file_path}")
+
+        if len(self._mm) < _HEADER.size:
+            self.close()
+            raise ValueError(f"二进制轨迹文件格式错误: 文件头不完整 {self.file_path}")
+
+        (magic, version, _, self.record_count, self.string_count,
+         self._records_offset, self._string_index_offset,
+         self._string_data_offset) = _HEADER.unpack_from(self._mm, 0)
+
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"不是二进制轨迹文件: {self.file_path}")
+        if version != VERSION:
+            self.close()
+            raise ValueError(f"不支持的二进制轨迹版本: {version}")
+
+        # 同一个字符串在记录中反复出现，解码结果缓存起来
+        self._strings: Dict[int, str] = {}
+
+    def close(self):
+        """关闭文件"""
+        if not self._mm.closed:
+            self._mm.close()
+        self._file.close()
+
+    def __enter__(self) -> "BinaryTrajectory":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __len__(self) -> int:
+        return self.record_count
+
+    def _string(self, index: int) -> Optional[str]:
+        """按编号读取字符串"""
+        if index == _NONE:
+            return None
+        value = self._strings.get(index)
+        if value is None:
+            start, = _STRING_INDEX.unpack_from(self._mm, self._string_index_offset + index * _STRING_INDEX.size)
+            end, = _STRING_INDEX.unpack_from(self._mm, self._string_index_offset + (index + 1) * _STRING_INDEX.size)
+            value = self._mm[self._string_data_offset + start:self._string_data_offset + end].decode('utf-8')
+            self._strings[index] = value
+        return value
+
+    def item(self, index: int) -> Dict[str, Any]:
+        """读取第index条记录（从0开始），返回与插件导出JSON相同结构的字典"""
+        if index < 0:
+            index += self.record_count
+        if not 0 <= index < self.record_count:
+            raise IndexError(f"记录编号超出范围: {index}")
+
+        fields = _RECORD.unpack_from(self._mm, self._records_offset + index * RECORD_SIZE)
+        string_count = len(_STRING_FIELDS)
+        element_ids = fields[string_count:string_count + len(_ELEMENT_FIELDS)]
+        timestamp, flags, has_position, x, y = fields[string_count + len(_ELEMENT_FIELDS):]
+
+        if flags & _FLAG_AWARE:
+            moment = datetime.fromtimestamp(timestamp, timezone.utc)
+        else:
+            moment = datetime.fromtimestamp(timestamp)
+
+        item = {
+            'type': self._string(fields[0]),
+            'description': self._string(fields[1]),
+            'url': self._string(fields[2]),
+            'value': self._string(fields[3]),
+            'element': {
+                name: self._string(string_id)
+                for name, string_id in zip(_ELEMENT_FIELDS, element_ids)
+            },
+            'timestamp': moment.isoformat()
+        }
+        if has_position:
+            item['position'] = {'x': x, 'y': y}
+        return item
+
+    def iter_items(self, start: int = 0, stop: int = None) -> Iterator[Dict[str, Any]]:
+        """按顺序读取 [start, stop) 范围内的记录"""
+        stop = self.record_count if stop is None else min(stop, self.record_count)
+        for index in range(max(start, 0), stop):
+            yield self.item(index)
@@ -0,0 +1,130 @@
+"""
+浏览器服务 - 常驻浏览器进程，重放时通过CDP连接以省去每次启动浏览器的开销
+"""
+import asyncio
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+from playwright.async_api import Browser, Playwright
+from loguru import logger
+
+from .models import TestConfig
+
+# 浏览器服务写入连接地址的文件
+ENDPOINT_FILE = Path("data") / "browser_endpoint.json"
+
+def read_endpoint(endpoint_file: str | Path = ENDPOINT_FILE) -> Optional[Dict[str, Any]]:
+    """读取正在运行的浏览器服务信息（地址、浏览器类型、无头模式），服务已退出时返回None"""
+    endpoint_file = Path(endpoint_file)
+    if not endpoint_file.exists():
+        return None
+
+    try:
+        with open(endpoint_file, 'r', encoding='utf-8') as f:
+            info = json.load(f)
+    except Exception as e:
+        logger.debug(f"读取浏览器服务地址失败: {e}")
+        return None
+
+    # 服务异常退出时文件会残留，检查浏览器进程是否仍然存在
+    try:
+        os.kill(info['pid'], 0)
+    except (KeyError, ProcessLookupError):
+        logger.debug(f"浏览器服务进程已退出: {info}")
+        return None
+    except PermissionError:
+        pass
+
+    return info
+
+def _matches(info: Dict[str, Any], config: TestConfig) -> bool:
+    """自动发现的浏览器服务必须与本次重放的浏览器类型和无头模式一致，否则不复用"""
+    expected = {'browser_type': config.browser_type, 'headless': config.headless}
+    actual = {key: info.get(key) for key in expected}
+    if actual != expected:
+        logger.info(f"浏览器服务配置不一致 ({actual})，本次重放需要 {expected}，改为本地启动")
+        return False
+    return True
+
+async def connect_or_launch(playwright: Playwright, config: TestConfig) -> Tuple[Browser, bool]:
+    """优先连接常驻浏览器服务，不可用时回退到本地启动
+
+    返回 (浏览器, 是否连接到了浏览器服务)
+    """
+    endpoint = config.browser_endpoint
+    if endpoint is None and config.use_browser_server:
+        info = read_endpoint()
+        if info and _matches(info, config):
+            endpoint = info.get('endpoint')
+
+    if endpoint and config.browser_type == "chromium":
+        try:
+            start_time = time.time()
+            browser = await playwright.chromium.connect_over_cdp(
+                endpoint, timeout=config.connect_timeout, slow_mo=_slow_mo(config)
+            )
+            logger.info(f"已连接浏览器服务: {endpoint} ({(time.time() - start_time) * 1000:.0f}ms)")
+            return browser, True
+        except Exception as e:
+            logger.warning(f"连接浏览器服务失败，改为本地启动: {e}")
+    elif endpoint:
+        logger.warning(f"浏览器服务仅支持chromium，{config.browser_type} 将在本地启动")
+
+    browser_type = getattr(playwright, config.browser_type)
+    browser = await browser_type.launch(
+        headless=config.headless,
+        slow_mo=_slow_mo(config)
+    )
+    return browser, False
+
+def _slow_mo(config: TestConfig) -> int:
+    """settle模式下由静止检测控制节奏，不再叠加固定的slow_mo"""
+    return 0 if config.wait_strategy == "settle" else config.slow_mo
+
+async def _browser_pid(browser: Browser) -> int:
+    """通过CDP查询浏览器主进程的pid；查询失败时退回本服务进程的pid"""
+    try:
+        session = await browser.new_browser_cdp_session()
+        info = await session.send("SystemInfo.getProcessInfo")
+        await session.detach()
+        return next(process['id'] for process in info['processInfo'] if process['type'] == "browser")
+    except Exception as e:
+        logger.debug(f"查询浏览器进程pid失败: {e}")
+        return os.getpid()
+
+async def serve_browser(playwright: Playwright, config: TestConfig, port: int = 9222,
+                        endpoint_file: str | Path = ENDPOINT_FILE):
+    """启动常驻浏览器并写入连接地址，直到任务被取消"""
+    endpoint_file = Path(endpoint_file)
+    endpoint = f"http://127.0.0.1:{port}"
+
+    browser = await playwright.chromium.launch(
+        headless=config.headless,
+        args=[f"--remote-debugging-port={port}"]
+    )
+
+    endpoint_file.parent.mkdir(exist_ok=True)
+    with open(endpoint_file, 'w', encoding='utf-8') as f:
+        json.dump({
+            'endpoint': endpoint,
+            'pid': await _browser_pid(browser),
+            'browser_type': "chromium",
+            'headless': config.headless
+        }, f)
+
+    logger.info(f"浏览器服务已启动: {endpoint}")
+
+    try:
+        # 浏览器被意外关闭时服务也随之退出
+        closed = asyncio.Event()
+        browser.on("disconnected", lambda _: closed.set())
+        await closed.wait()
+        logger.warning("浏览器服务的浏览器已断开")
+    finally:
+        if endpoint_file.exists():
+            endpoint_file.unlink()
+        if browser.is_connected():
+            await browser.close()
+        logger.info("浏览器服务已停止")
@@ -0,0 +1,94 @@
+"""
+紧凑记录 - 只读分析场景使用的轻量记录，需要重放时再转换为pydantic模型
+"""
+import sys
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any, Tuple
+
+from .models import ElementInfo, LearningRecord, Position
+
+def _intern(value: Any) -> Optional[str]:
+    """驻留重复出现的字符串（URL、标签名、类名等），相同内容只保留一份"""
+    if value is None:
+        return None
+    return sys.intern(str(value))
+
+def _text(data: Dict[str, Any], name: str, required: bool = False) -> Optional[str]:
+    """按LearningRecord的字段类型取字符串字段：必需字段缺失时为空字符串、不能为null，
+    可选字段可以缺失或为null；类型不对时抛出异常，与pydantic模型的校验一致"""
+    value = data.get(name, '' if required else None)
+    if value is None and not required:
+        return None
+    if not isinstance(value, str):
+        raise TypeError(f"字段 {name} 应为字符串: {value!r}")
+    return value
+
+def _parse_timestamp(value: Any) -> Tuple[float, bool]:
+    """解析时间戳为 (epoch秒数, 是否带时区)，规则与LearningDataLoader.parse_record一致"""
+    if isinstance(value, str):
+        try:
+            parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+            return parsed.timestamp(), parsed.tzinfo is not None
+        except ValueError:
+            pass
+    return datetime.now().timestamp(), False
+
+class CompactElement:
+    """紧凑的元素信息"""
+
+    __slots__ = ('tagName', 'id', 'className', 'textContent', 'placeholder',
+                 'type', 'action', 'xpath', 'selector')
+
+    def __init__(self, data: Dict[str, Any]):
+        self.tagName = _intern(_text(data, 'tagName', required=True))
+        self.id = _text(data, 'id')
+        self.className = _intern(_text(data, 'className'))
+        self.textContent = _text(data, 'textContent')
+        self.placeholder = _text(data, 'placeholder')
+        self.type = _intern(_text(data, 'type'))
+        self.action = _intern(_text(data, 'action'))
+        self.xpath = _intern(_text(data, 'xpath', required=True))
+        self.selector = _intern(_text(data, 'selector', required=True))
+
+    def to_model(self) -> ElementInfo:
+        """转换为ElementInfo模型"""
+        return ElementInfo(**{name: getattr(self, name) for name in self.__slots__})
+
+class CompactRecord:
+    """紧凑的学习记录，字段与LearningRecord一致，可直接用于摘要和过滤"""
+
+    __slots__ = ('type', 'description', 'url', 'element', '_timestamp', '_aware', 'position', 'value')
+
+    def __init__(self, item: Dict[str, Any]):
+        """校验规则与LearningDataLoader.parse_record相同，不能通过校验的记录抛出异常"""
+        self.type = _intern(_text(item, 'type', required=True))
+        self.description = _text(item, 'description', required=True)
+        self.url = _intern(_text(item, 'url', required=True))
+        self.element = CompactElement(item.get('element', {}))
+        self._timestamp, self._aware = _parse_timestamp(item.get('timestamp', ''))
+
+        # 出现position字段时必须带有整数坐标，按Position模型校验
+        self.position: Optional[Tuple[int, int]] = None
+        if 'position' in item:
+            position = Position(x=item['position']['x'], y=item['position']['y'])
+            self.position = (position.x, position.y)
+        self.value = _text(item, 'value')
+
+    @property
+    def timestamp(self) -> datetime:
+        """记录时间"""
+        if self._aware:
+            return datetime.fromtimestamp(self._timestamp, timezone.utc)
+        return datetime.fromtimestamp(self._timestamp)
+
+    def to_model(self) -> LearningRecord:
+        """转换为LearningRecord模型（重放时才需要）"""
+        return LearningRecord(
+            type=self.type,
+            description=self.description,
+            url=self.url,
+            element=self.element.to_model(),
+            timestamp=self.timestamp,
+            position=Position(x=self.position[0], y=self.position[1]) if self.position else None,
+            value=self.value
+        )
@@ -1,13 +1,21 @@
 """
-数据加载器 - 读取插件导出的学习轨迹JSON文件
+数据加载器 - 读取插件导出的学习轨迹文件（JSON或二进制轨迹格式）
 """
+import itertools
 import json
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import Iterable, Iterator, List, Dict, Any, Optional, TextIO, Tuple
 from datetime import datetime
 from loguru import logger
 
 from .models import LearningRecord, ElementInfo, Position
+from .compact_records import CompactRecord
+from .record_stats import RecordStats, missing_fields
+from .url_utils import compile_url_pattern
+from .binary_format import BINARY_SUFFIX, BinaryTrajectory, is_binary_trajectory, write_binary_trajectory
+
+# 重放结果文件前缀，扫描目录时跳过
+RESULT_FILE_PREFIXES = ("replay_results_", "suite_results_")
 
 class LearningDataLoader:
     """学习数据加载器"""
@@ -16,8 +24,8 @@ class LearningDataLoader:
         self.data_dir = Path(data_dir)
         self.data_dir.mkdir(exist_ok=True)
     
-    def load_from_file(self, file_path: str | Path) -> List[LearningRecord]:
-        """从JSON文件加载学习数据"""
+    def load_from_file(self, file_path: str | Path, start: int = 0) -> List[LearningRecord]:
+        """从文件加载学习数据（根据魔数自动识别JSON或二进制格式），start为起始记录编号"""
         file_path = Path(file_path)
         
         if not file_path.exists():
@@ -26,13 +34,18 @@ class LearningDataLoader:
         logger.info(f"正在加载学习数据: {file_path}")
         
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            if is_binary_trajectory(file_path):
+                # 二进制格式直接跳到起始记录，不解码前面的记录
+                with BinaryTrajectory(file_path) as trajectory:
+                    data = list(trajectory.iter_items(start))
+            else:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)[start:]
             
             records = []
             for item in data:
                 try:
-                    record = self._parse_record(item)
+                    record = self.parse_record(item)
                     records.append(record)
                 except Exception as e:
                     logger.warning(f"解析记录失败: {e}, 跳过此记录")
@@ -46,8 +59,237 @@ class LearningDataLoader:
         except Exception as e:
             raise RuntimeError(f"加载文件失败: {e}")
     
-    def _parse_record(self, item: Dict[str, Any]) -> LearningRecord:
-        """解析单条记录"""
+    def iter_records(self, file_path: str | Path, stats: Optional[RecordStats] = None,
+                     start: int = 0, skip_invalid: bool = False) -> Iterator[LearningRecord]:
+        """增量解析轨迹文件，逐条产出记录，内存占用与文件大小无关
+
+        传入stats时，每条记录在产出前顺带完成校验统计；start为起始记录编号；
+        skip_invalid为True时缺少必要字段的记录计入统计但不产出（流式重放不能先执行再校验）
+        """
+        file_path = Path(file_path)
+        
+        if not file_path.exists():
+            raise FileNotFoundError(f"文件不存在: {file_path}")
+        
+        logger.info(f"正在流式加载学习数据: {file_path}")
+        
+        count = 0
+        for item in self.iter_items(file_path, start):
+            try:
+                record = self.parse_record(item)
+            except Exception as e:
+                logger.warning(f"解析记录失败: {e}, 跳过此记录")
+                continue
+            
+            if stats is not None:
+                stats.add(record)
+            if skip_invalid:
+                missing = missing_fields(record)
+                if missing:
+                    logger.warning(f"记录无效（{', '.join(reason for _, reason in missing)}）: "
+                                   f"{record.description}, 跳过此记录")
+                    continue
+            count += 1
+            yield record
+        
+        logger.info(f"成功加载 {count} 条记录")
+    
+    @classmethod
+    def iter_items(cls, file_path: str | Path, start: int = 0) -> Iterator[Dict[str, Any]]:
+        """根据魔数选择格式，逐条读取原始记录（未解析的字典）；二进制格式通过偏移直接跳到start"""
+        if is_binary_trajectory(file_path):
+            with BinaryTrajectory(file_path) as trajectory:
+                yield from trajectory.iter_items(start)
+            return
+        
+        with open(file_path, 'r', encoding='utf-8') as f:
+            yield from itertools.islice(cls._iter_json_array(f), start, None)
+    
+    @staticmethod
+    def _iter_json_array(f: TextIO, chunk_size: int = 64 * 1024) -> Iterator[Any]:
+        """逐个解析顶层JSON数组中的元素"""
+        decoder = json.JSONDecoder()
+        buffer = ''
+        pos = 0
+        eof = False
+        started = False
+        read_size = chunk_size
+        
+        while True:
+            # 跳过空白和分隔符
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                pos += 1
+            
+            if pos >= len(buffer):
+                if eof:
+                    raise ValueError("JSON文件格式错误: 数组未闭合")
+                buffer = f.read(read_size)
+                pos = 0
+                eof = not buffer
+                continue
+            
+            if not started:
+                if buffer[pos] != '[':
+                    raise ValueError("JSON文件格式错误: 顶层应为数组")
+                started = True
+                pos += 1
+                continue
+            
+            if buffer[pos] == ']':
+                return
+            
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError as e:
+                if eof:
+                    raise ValueError(f"JSON文件格式错误: {e}")
+                # 当前元素跨越了缓冲区边界，补充读取后重试；单个元素很大时逐步加大读取量
+                chunk = f.read(read_size)
+                eof = not chunk
+                buffer = buffer[pos:] + chunk
+                pos = 0
+                read_size *= 2
+                continue
+            
+            yield item
+            pos = end
+            read_size = chunk_size
+            # 丢弃已解析的部分，保持缓冲区很小
+            if pos > chunk_size:
+                buffer = buffer[pos:]
+                pos = 0
+    
+    def load_compact_records(self, file_path: str | Path) -> List[CompactRecord]:
+        """加载为紧凑记录，供只读场景使用
+
+        紧凑记录与LearningRecord字段相同，可直接传给validate_records、get_records_summary
+        和各个过滤方法；需要重放时调用to_model()转换
+        """
+        records = list(self.iter_compact_records(file_path))
+        logger.info(f"成功加载 {len(records)} 条记录")
+        return records
+    
+    @classmethod
+    def iter_compact_records(cls, file_path: str | Path) -> Iterator[CompactRecord]:
+        """增量解析为紧凑记录，逐条产出"""
+        for _, record in cls.enumerate_compact_records(file_path):
+            yield record
+    
+    @classmethod
+    def enumerate_compact_records(cls, file_path: str | Path) -> Iterator[Tuple[int, CompactRecord]]:
+        """增量解析为紧凑记录，同时产出记录在文件中的位置（从1开始，与--from-step一致）；
+        无法解析的记录被跳过，但仍占用位置"""
+        file_path = Path(file_path)
+        
+        if not file_path.exists():
+            raise FileNotFoundError(f"文件不存在: {file_path}")
+        
+        for position, item in enumerate(cls.iter_items(file_path), 1):
+            try:
+                yield position, CompactRecord(item)
+            except Exception as e:
+                logger.warning(f"解析第 {position} 条记录失败: {e}, 跳过此记录")
+    
+    def collect_stats(self, path: str | Path, record_types: List[str] = None,
+                      url_pattern: str = None, max_errors: int = 20,
+                      use_index: bool = True, url_regex: bool = False) -> RecordStats:
+        """单遍统计文件或整个目录：校验、类型分布、URL和时间范围一次完成
+
+        统计目录时使用轨迹索引：没有过滤条件时只重新解析新增或修改过的文件；
+        带URL过滤时先用URL索引找出命中的文件和步骤（记入stats.url_hits），只解析这些文件。
+        单个文件和其余情况记录逐条流过统计器，不保留在内存中，也不在文件所在目录创建索引。
+        目录下无法解析的文件记入file_errors
+        """
+        path = Path(path)
+        
+        if not path.exists():
+            raise FileNotFoundError(f"文件不存在: {path}")
+        
+        stats = RecordStats(record_types, url_pattern, max_errors, url_regex)
+        files = None
+        
+        unfiltered = not record_types and not url_pattern
+        index = None
+        if use_index and path.is_dir() and (unfiltered or url_pattern):
+            index = self._open_index(path)
+        if index:
+            with index:
+                index.refresh()
+                if unfiltered:
+                    for entry in sorted(index.entries(), key=lambda e: e['name']):
+                        stats.add_entry(entry['name'], entry)
+                    return stats
+                
+                # URL索引找出命中的文件，其余文件不读取
+                stats.url_hits = index.query_urls(url_pattern, url_regex)
+                files = sorted({file_path for file_path, _ in stats.url_hits})
+        
+        if path.is_file():
+            stats.start_file(None)
+            stats.add_all(self.iter_compact_records(path))
+            return stats
+        
+        if files is None:
+            files = self.discover_trajectory_files(path)
+        
+        for file_path in files:
+            stats.start_file(file_path.name)
+            try:
+                stats.add_all(self.iter_compact_records(file_path))
+            except Exception as e:
+                logger.warning(f"统计文件失败: {file_path}: {e}")
+                stats.add_file_error(file_path.name, str(e))
+        
+        return stats
+    
+    def query_urls(self, pattern: str, directory: str | Path = None,
+                   regex: bool = False) -> List[Tuple[Path, int]]:
+        """在整个目录的轨迹中查询URL，返回 (文件路径, 步骤号) 列表，步骤号从1开始
+
+        pattern支持子串、通配符（/checkout/*、shop.example.com/item/*）和正则（regex=True）；
+        基于轨迹索引，只重新解析新增或修改过的文件
+        """
+        directory = Path(directory) if directory else self.data_dir
+        index = self._open_index(directory)
+        if not index:
+            raise RuntimeError(f"无法打开轨迹索引: {directory}")
+        with index:
+            index.refresh()
+            return index.query_urls(pattern, regex)
+    
+    def index_entries(self, directory: str | Path = None) -> List[Dict[str, Any]]:
+        """增量更新并返回目录的轨迹索引条目（按修改时间倒序）"""
+        directory = Path(directory) if directory else self.data_dir
+        index = self._open_index(directory)
+        if not index:
+            raise RuntimeError(f"无法打开轨迹索引: {directory}")
+        with index:
+            index.refresh()
+            return index.entries()
+    
+    @staticmethod
+    def _open_index(directory: Path):
+        """打开目录的轨迹索引；目录不可写等情况下返回None，调用方退回直接解析"""
+        from .trajectory_index import TrajectoryIndex
+        
+        try:
+            return TrajectoryIndex(directory)
+        except Exception as e:
+            logger.warning(f"无法使用轨迹索引，改为直接解析: {e}")
+            return None
+    
+    @staticmethod
+    def discover_trajectory_files(directory: str | Path) -> List[Path]:
+        """扫描目录下的学习轨迹文件（JSON和二进制格式），跳过重放结果文件"""
+        directory = Path(directory)
+        files = itertools.chain(directory.glob("*.json"), directory.glob(f"*{BINARY_SUFFIX}"))
+        return [
+            f for f in sorted(files)
+            if not f.name.startswith(RESULT_FILE_PREFIXES)
+        ]
+    
+    def parse_record(self, item: Dict[str, Any]) -> LearningRecord:
+        """解析单条原始记录，字段缺失或类型不对时抛出异常"""
         # 解析元素信息
         element_data = item.get('element', {})
         element = ElementInfo(
@@ -89,78 +331,48 @@ class LearningDataLoader:
         )
     
     def list_available_files(self) -> List[Path]:
-        """列出可用的JSON文件"""
-        json_files = list(self.data_dir.glob("*.json"))
-        return sorted(json_files, key=lambda x: x.stat().st_mtime, reverse=True)
+        """列出可用的轨迹文件（JSON和二进制格式）"""
+        files = list(self.data_dir.glob("*.json")) + list(self.data_dir.glob(f"*{BINARY_SUFFIX}"))
+        return sorted(files, key=lambda x: x.stat().st_mtime, reverse=True)
     
-    def validate_records(self, records: List[LearningRecord]) -> Dict[str, Any]:
-        """验证记录数据的完整性"""
-        validation_result = {
-            'total_records': len(records),
-            'valid_records': 0,
-            'invalid_records': 0,
-            'missing_urls': 0,
-            'missing_selectors': 0,
-            'missing_xpath': 0,
-            'errors': []
-        }
-        
-        for i, record in enumerate(records):
-            is_valid = True
-            
-            # 检查必要字段
-            if not record.url:
-                validation_result['missing_urls'] += 1
-                validation_result['errors'].append(f"记录 {i+1}: 缺少URL")
-                is_valid = False
-            
-            if not record.element.selector:
-                validation_result['missing_selectors'] += 1
-                validation_result['errors'].append(f"记录 {i+1}: 缺少CSS选择器")
-                is_valid = False
-            
-            if not record.element.xpath:
-                validation_result['missing_xpath'] += 1
-                validation_result['errors'].append(f"记录 {i+1}: 缺少XPath")
-                is_valid = False
-            
-            if is_valid:
-                validation_result['valid_records'] += 1
-            else:
-                validation_result['invalid_records'] += 1
+    def convert_file(self, file_path: str | Path, output_path: str | Path = None) -> Path:
+        """在JSON和二进制轨迹格式之间转换，方向根据输入文件的魔数决定
+
+        不指定输出路径时与输入文件同名，扩展名换为 .trajbin 或 .json
+        """
+        file_path = Path(file_path)
         
-        return validation_result
+        if not file_path.exists():
+            raise FileNotFoundError(f"文件不存在: {file_path}")
+        
+        if is_binary_trajectory(file_path):
+            output_path = Path(output_path) if output_path else file_path.with_suffix('.json')
+            with BinaryTrajectory(file_path) as trajectory:
+                items = list(trajectory.iter_items())
+            with open(output_path, 'w', encoding='utf-8') as f:
+                json.dump(items, f, ensure_ascii=False, indent=2)
+            count = len(items)
+        else:
+            output_path = Path(output_path) if output_path else file_path.with_suffix(BINARY_SUFFIX)
+            count = write_binary_trajectory(self.iter_items(file_path), output_path)
+        
+        logger.info(f"已转换 {count} 条记录: {file_path} -> {output_path}")
+        return output_path
+    
+    def validate_records(self, records: Iterable[LearningRecord]) -> Dict[str, Any]:
+        """验证记录数据的完整性"""
+        return RecordStats(max_errors=None).add_all(records).validation_result()
     
     def filter_records_by_type(self, records: List[LearningRecord], record_types: List[str]) -> List[LearningRecord]:
         """按类型过滤记录"""
         return [record for record in records if record.type in record_types]
     
-    def filter_records_by_url(self, records: List[LearningRecord], url_pattern: str) -> List[LearningRecord]:
-        """按URL模式过滤记录"""
-        return [record for record in records if url_pattern in record.url]
+    def filter_records_by_url(self, records: List[LearningRecord], url_pattern: str,
+                              regex: bool = False) -> List[LearningRecord]:
+        """按URL模式过滤记录（子串、通配符或正则，见url_utils.compile_url_pattern）"""
+        match = compile_url_pattern(url_pattern, regex)
+        return [record for record in records if match(record.url)]
     
-    def get_records_summary(self, records: List[LearningRecord]) -> Dict[str, Any]:
+    def get_records_summary(self, records: Iterable[LearningRecord]) -> Dict[str, Any]:
         """获取记录摘要信息"""
-        if not records:
-            return {'total': 0, 'types': {}, 'urls': set()}
-        
-        types_count = {}
-        urls = set()
-        
-        for record in records:
-            # 统计操作类型
-            record_type = record.type
-            types_count[record_type] = types_count.get(record_type, 0) + 1
-            
-            # 收集URL
-            urls.add(record.url)
-        
-        return {
-            'total': len(records),
-            'types': types_count,
-            'urls': list(urls),
-            'time_range': {
-                'start': min(record.timestamp for record in records),
-                'end': max(record.timestamp for record in records)
-            }
-        } 
\ No newline at end of file
+        return RecordStats(max_errors=0).add_all(records).summary()
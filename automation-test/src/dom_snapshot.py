@@ -0,0 +1,126 @@
+"""
+页面快照 - 在页面内提取录制元素附近的可交互元素，生成紧凑的文本摘要作为AI分析的页面上下文
+
+page.content() 会把整个HTML传回来（大页面可达数MB），而前1000个字符通常只是<head>里的样板代码；
+快照只返回与失败步骤相关的元素：标签、关键属性、文本和结构路径，大小有上限
+"""
+import time
+from typing import Any, Dict, Optional
+from loguru import logger
+
+# 快照文本的字符数上限，AI提示中的页面上下文也按此截断
+SNAPSHOT_MAX_CHARS = 2000
+SNAPSHOT_MAX_ELEMENTS = 40
+
+_SNAPSHOT_SCRIPT = """
+({xpath, maxElements, maxChars}) => {
+    const normalize = (text) => (text || '').replace(/\\s+/g, ' ').trim();
+    const isVisible = (el) => {
+        const rect = el.getBoundingClientRect();
+        if (!rect.width || !rect.height) return false;
+        return getComputedStyle(el).visibility !== 'hidden';
+    };
+    // 与插件录制的XPath格式一致：/html/body/div[2]/button[1]
+    const xpathOf = (el) => {
+        const segments = [];
+        for (let node = el; node && node.nodeType === 1 && node !== document.documentElement;
+             node = node.parentElement) {
+            const tag = node.tagName.toLowerCase();
+            if (tag === 'body' || tag === 'head') { segments.unshift(tag); continue; }
+            let index = 1;
+            for (let sibling = node.previousElementSibling; sibling; sibling = sibling.previousElementSibling) {
+                if (sibling.tagName === node.tagName) index++;
+            }
+            segments.unshift(`${tag}[${index}]`);
+        }
+        return '/html/' + segments.join('/');
+    };
+    const evaluate = (path) => {
+        try {
+            return document.evaluate(path, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+        } catch (e) {
+            return null;
+        }
+    };
+    // 录制的元素可能已不存在，逐级去掉末尾的路径片段，找到仍然存在的最近祖先作为锚点
+    let anchor = null;
+    if (xpath && xpath.startsWith('/')) {
+        const segments = xpath.split('/');
+        while (!anchor && segments.length > 2) {
+            anchor = evaluate(segments.join('/'));
+            segments.pop();
+        }
+    } else if (xpath) {
+        anchor = evaluate(xpath);
+    }
+    anchor = anchor || document.body;
+
+    const ancestors = (el) => {
+        const chain = [];
+        for (let node = el; node; node = node.parentElement) chain.push(node);
+        return chain;
+    };
+    const anchorChain = ancestors(anchor);
+    const anchorDepth = new Map(anchorChain.map((node, depth) => [node, depth]));
+    // 树上距离：到最近公共祖先的层数之和
+    const distance = (el) => {
+        let up = 0;
+        for (let node = el; node; node = node.parentElement, up++) {
+            if (anchorDepth.has(node)) return up + anchorDepth.get(node);
+        }
+        return Infinity;
+    };
+
+    const selector = 'a, button, input, select, textarea, label, summary, [role], [onclick], ' +
+        '[contenteditable="true"], [tabindex], [aria-label], [placeholder]';
+    const all = Array.from(document.querySelectorAll(selector))
+        .filter((el) => (el.getAttribute('type') || '').toLowerCase() !== 'hidden' && isVisible(el));
+    const nearest = all
+        .map((el) => ({el, distance: distance(el)}))
+        .sort((a, b) => a.distance - b.distance)
+        .slice(0, maxElements);
+
+    const ATTRIBUTES = ['id', 'class', 'name', 'type', 'role', 'placeholder', 'aria-label', 'title', 'href', 'value', 'for'];
+    const lines = [`锚点: ${xpathOf(anchor)}`];
+    let length = lines[0].length;
+    let included = 0;
+    for (const {el} of nearest) {
+        const tag = el.tagName.toLowerCase();
+        const attributes = ATTRIBUTES
+            .map((name) => [name, normalize(el.getAttribute(name)).slice(0, 60)])
+            .filter(([, value]) => value)
+            .map(([name, value]) => `${name}="${value}"`);
+        const text = normalize(el.innerText || el.textContent).slice(0, 60);
+        const line = `<${[tag, ...attributes].join(' ')}>${text} @ ${xpathOf(el)}`;
+        if (length + line.length + 1 > maxChars) break;
+        lines.push(line);
+        length += line.length + 1;
+        included++;
+    }
+    return {
+        text: lines.join('\\n'),
+        elements: included,
+        interactive: all.length,
+        page_chars: document.documentElement.outerHTML.length
+    };
+}
+"""
+
+async def extract_snapshot(page, xpath: Optional[str] = None,
+                           max_elements: int = SNAPSHOT_MAX_ELEMENTS,
+                           max_chars: int = SNAPSHOT_MAX_CHARS) -> Dict[str, Any]:
+    """一次页面内调用提取快照；返回快照文本和传输量统计，失败时返回空字典"""
+    start_time = time.perf_counter()
+    try:
+        result = await page.evaluate(_SNAPSHOT_SCRIPT, {
+            'xpath': xpath or '', 'maxElements': max_elements, 'maxChars': max_chars
+        })
+    except Exception as e:
+        logger.debug(f"提取页面快照失败: {e}")
+        return {}
+    if not result:
+        return {}
+
+    result['snapshot_bytes'] = len(result['text'].encode('utf-8'))
+    result['extract_ms'] = (time.perf_counter() - start_time) * 1000
+    return result
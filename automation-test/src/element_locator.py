@@ -1,69 +1,424 @@
 """
 元素定位器 - 使用多种策略定位页面元素
 """
+import asyncio
 import time
-from typing import Optional, List, Tuple
-from playwright.sync_api import Page, Locator
+from typing import Optional, List, Tuple, Dict, Any
+from playwright.async_api import Page, Locator
 from loguru import logger
 
-from .models import ElementInfo, LearningRecord
+from .models import ElementInfo, ElementState, LearningRecord
+from .selector_cache import SelectorCache
+
+# 在页面内一次性探测所有候选选择器，返回优先级最高且可见的候选下标
+_PROBE_SCRIPT = """
+(candidates) => {
+    const isVisible = (el) => {
+        const rect = el.getBoundingClientRect();
+        if (!rect.width || !rect.height) return false;
+        return getComputedStyle(el).visibility !== 'hidden';
+    };
+    const normalize = (text) => (text || '').replace(/\\s+/g, ' ').trim().toLowerCase();
+    const findAll = (selector) => {
+        if (selector.startsWith('xpath=')) {
+            const result = document.evaluate(selector.slice(6), document, null,
+                XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+            const nodes = [];
+            for (let i = 0; i < result.snapshotLength; i++) nodes.push(result.snapshotItem(i));
+            return nodes;
+        }
+        if (selector.startsWith('text=')) {
+            // 与Playwright的text=引擎一致：忽略大小写的子串匹配，取最内层元素
+            const text = normalize(selector.slice(5));
+            return Array.from(document.body.querySelectorAll('*')).filter((el) =>
+                normalize(el.textContent).includes(text) &&
+                !Array.from(el.children).some((child) => normalize(child.textContent).includes(text)));
+        }
+        return Array.from(document.querySelectorAll(selector));
+    };
+    for (let i = 0; i < candidates.length; i++) {
+        try {
+            if (findAll(candidates[i]).some(isVisible)) return {index: i};
+        } catch (e) {
+            // 页面内无法解析的选择器跳过，由调用方另行检查
+        }
+    }
+    return null;
+}
+"""
+
+# 一次往返获取元素状态，必要时顺带滚动到可视区域
+_STATE_SCRIPT = """
+(el, scroll) => {
+    if (scroll) {
+        const rect = el.getBoundingClientRect();
+        if (rect.bottom < 0 || rect.right < 0 ||
+            rect.top > window.innerHeight || rect.left > window.innerWidth) {
+            el.scrollIntoView({block: 'center', inline: 'center'});
+        }
+    }
+    const rect = el.getBoundingClientRect();
+    const tag = el.tagName.toLowerCase();
+    const formControl = ['button', 'input', 'select', 'textarea', 'option', 'optgroup'].includes(tag);
+    const disabled = el.hasAttribute('disabled');
+    const nativeDisabled = formControl && (el.disabled === true || !!el.closest('fieldset[disabled]'));
+    return {
+        tag,
+        type: el.getAttribute('type'),
+        visible: rect.width > 0 && rect.height > 0 && getComputedStyle(el).visibility !== 'hidden',
+        enabled: !(nativeDisabled || el.getAttribute('aria-disabled') === 'true'),
+        readonly: el.hasAttribute('readonly'),
+        disabled,
+        checked: ('checked' in el && ['checkbox', 'radio'].includes(el.type)) ? el.checked : null,
+        box: {x: rect.x, y: rect.y, width: rect.width, height: rect.height}
+    };
+}
+"""
+
+# 所有策略都失败时，在页面内一次性给所有可交互元素与录制时的元素信息打分，返回得分最高的候选
+_HEAL_SCRIPT = """
+(recorded) => {
+    const WEIGHTS = {tag: 1, id: 3, className: 2, text: 3, placeholder: 2, type: 1, xpath: 2};
+    const normalize = (text) => (text || '').replace(/\\s+/g, ' ').trim().toLowerCase();
+    // 字符二元组的Dice系数，对改名（submit-btn -> submit-button）比精确匹配宽容
+    const bigrams = (text) => {
+        const grams = new Map();
+        for (let i = 0; i < text.length - 1; i++) {
+            const gram = text.slice(i, i + 2);
+            grams.set(gram, (grams.get(gram) || 0) + 1);
+        }
+        return grams;
+    };
+    const dice = (a, b) => {
+        a = normalize(a); b = normalize(b);
+        if (!a || !b) return 0;
+        if (a === b) return 1;
+        if (a.length < 2 || b.length < 2) return 0;
+        const gramsA = bigrams(a), gramsB = bigrams(b);
+        let overlap = 0;
+        for (const [gram, count] of gramsA) overlap += Math.min(count, gramsB.get(gram) || 0);
+        return 2 * overlap / (a.length + b.length - 2);
+    };
+    const classSimilarity = (a, b) => {
+        const setA = new Set(normalize(a).split(' ').filter(Boolean));
+        const setB = new Set(normalize(b).split(' ').filter(Boolean));
+        if (!setA.size || !setB.size) return 0;
+        const common = [...setA].filter((name) => setB.has(name)).length;
+        const jaccard = common / (setA.size + setB.size - common);
+        return Math.max(jaccard, dice([...setA].sort().join(' '), [...setB].sort().join(' ')));
+    };
+    // 与插件录制的XPath格式一致：/html/body/div[2]/button[1]
+    const xpathOf = (el) => {
+        const segments = [];
+        for (let node = el; node && node.nodeType === 1 && node !== document.documentElement;
+             node = node.parentElement) {
+            const tag = node.tagName.toLowerCase();
+            if (tag === 'body' || tag === 'head') { segments.unshift(tag); continue; }
+            let index = 1;
+            for (let sibling = node.previousElementSibling; sibling; sibling = sibling.previousElementSibling) {
+                if (sibling.tagName === node.tagName) index++;
+            }
+            segments.unshift(`${tag}[${index}]`);
+        }
+        return '/html/' + segments.join('/');
+    };
+    // 路径片段的编辑距离；同标签不同下标只算半个差异
+    const xpathSimilarity = (a, b) => {
+        const sa = a.split('/').filter(Boolean), sb = b.split('/').filter(Boolean);
+        const tag = (segment) => segment.replace(/\\[\\d+\\]$/, '');
+        let previous = Array.from({length: sb.length + 1}, (_, j) => j);
+        for (let i = 1; i <= sa.length; i++) {
+            const current = [i];
+            for (let j = 1; j <= sb.length; j++) {
+                const cost = sa[i - 1] === sb[j - 1] ? 0 : (tag(sa[i - 1]) === tag(sb[j - 1]) ? 0.5 : 1);
+                current.push(Math.min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost));
+            }
+            previous = current;
+        }
+        return 1 - previous[sb.length] / Math.max(sa.length, sb.length, 1);
+    };
+    const isVisible = (el) => {
+        const rect = el.getBoundingClientRect();
+        if (!rect.width || !rect.height) return false;
+        return getComputedStyle(el).visibility !== 'hidden';
+    };
+
+    const recordedTag = (recorded.tagName || '').toLowerCase();
+    // 插件对有id的元素记录 //*[@id="..."]，不含结构信息
+    const recordedXpath = (recorded.xpath || '').startsWith('/html') ? recorded.xpath : '';
+    const features = {
+        tag: recordedTag, id: recorded.id, className: recorded.className,
+        text: normalize(recorded.textContent), placeholder: recorded.placeholder,
+        type: recorded.type, xpath: recordedXpath
+    };
+    const totalWeight = Object.keys(WEIGHTS).reduce((sum, name) => sum + (features[name] ? WEIGHTS[name] : 0), 0);
+    if (!totalWeight) return null;
+
+    const selector = 'a, button, input, select, textarea, label, summary, option, [role], [onclick], ' +
+        '[contenteditable="true"], [tabindex]' + (/^[a-z][a-z0-9-]*$/.test(recordedTag) ? `, ${recordedTag}` : '');
+    const elements = Array.from(document.querySelectorAll(selector)).slice(0, 5000);
+    const scored = [];
+    for (const el of elements) {
+        if ((el.getAttribute('type') || '').toLowerCase() === 'hidden' || !isVisible(el)) continue;
+        const tag = el.tagName.toLowerCase();
+        const similarity = {
+            tag: tag === recordedTag ? 1 : 0,
+            id: dice(el.id, features.id),
+            className: classSimilarity(el.getAttribute('class'), features.className),
+            text: dice((el.textContent || '').slice(0, 300), features.text),
+            placeholder: dice(el.getAttribute('placeholder'), features.placeholder),
+            type: normalize(el.getAttribute('type')) === normalize(features.type) ? 1 : 0,
+            xpath: features.xpath ? xpathSimilarity(xpathOf(el), features.xpath) : 0
+        };
+        let score = 0;
+        for (const name of Object.keys(WEIGHTS)) {
+            if (features[name]) score += WEIGHTS[name] * similarity[name];
+        }
+        scored.push({el, score: score / totalWeight, similarity});
+    }
+    if (!scored.length) return null;
+    scored.sort((a, b) => b.score - a.score);
+
+    const describe = ({el, score, similarity}) => {
+        const id = el.id;
+        const unique = id && document.querySelectorAll(`#${CSS.escape(id)}`).length === 1;
+        return {
+            selector: unique ? `#${CSS.escape(id)}` : `xpath=${xpathOf(el)}`,
+            score, similarity,
+            tag: el.tagName.toLowerCase(), id: id || null,
+            className: el.getAttribute('class'),
+            text: normalize(el.textContent).slice(0, 80)
+        };
+    };
+    return {candidates: scored.slice(0, 3).map(describe), scanned: scored.length};
+}
+"""
 
 class ElementLocator:
     """元素定位器"""
     
-    def __init__(self, page: Page, selector_priority: List[str] = None):
+    def __init__(self, page: Page, selector_priority: List[str] = None,
+                 locate_mode: str = "race", cache: SelectorCache = None,
+                 heal_threshold: Optional[float] = None):
         self.page = page
         self.selector_priority = selector_priority or ["id", "css", "xpath", "text"]
+        
+        # race: 所有策略在同一个截止时间内并发探测; sequential: 按优先级逐个等待
+        self.locate_mode = locate_mode
+        
+        # 跨运行的选择器缓存，优先尝试上次成功的选择器
+        self.cache = cache
+        
+        # 所有策略都失败时本地修复的置信度阈值；None表示不修复
+        self.heal_threshold = heal_threshold
+        # 最近一次定位中本地修复的结果（未触发修复时为None）
+        self.last_heal: Optional[Dict[str, Any]] = None
     
-    def locate_element(self, record: LearningRecord, timeout: int = 5000) -> Optional[Locator]:
+    async def locate_element(self, record: LearningRecord, timeout: int = 5000) -> Optional[Locator]:
         """定位元素，使用多种策略"""
-        element = record.element
+        locator, _ = await self.locate_element_with_strategy(record, timeout)
+        return locator
+    
+    async def locate_element_with_strategy(self, record: LearningRecord,
+                                           timeout: int = 5000) -> Tuple[Optional[Locator], Optional[str]]:
+        """定位元素，同时返回成功的策略名称"""
+        cached = self.cache.lookup(record) if self.cache else None
+        self.last_heal = None
+        
+        if self.locate_mode == "race":
+            locator, strategy, selector = await self._locate_race(record, timeout, cached)
+        else:
+            locator, strategy, selector = await self._locate_sequential(record, timeout, cached)
         
-        # 按优先级尝试不同的定位策略
+        if not locator and self.heal_threshold is not None:
+            locator, strategy, selector = await self._locate_heal(record)
+        
+        if self.cache:
+            if locator:
+                self.cache.record_success(
+                    record, strategy, selector,
+                    cached=bool(cached) and selector == cached['selector']
+                )
+            else:
+                self.cache.invalidate(record)
+        
+        if not locator:
+            logger.warning(f"无法定位元素: {record.description}")
+        return locator, strategy
+    
+    def _candidates(self, element: ElementInfo,
+                    cached: Optional[dict]) -> List[Tuple[str, str]]:
+        """按优先级生成 (策略, 选择器) 候选列表，缓存命中的选择器排在最前"""
+        candidates = []
+        if cached:
+            candidates.append((cached['strategy'], cached['selector']))
         for strategy in self.selector_priority:
-            locator = self._try_strategy(strategy, element, record)
-            if locator and self._is_element_visible(locator, timeout):
+            selector = self._strategy_selector(strategy, element)
+            if selector and all(selector != existing for _, existing in candidates):
+                candidates.append((strategy, selector))
+        return candidates
+    
+    async def _locate_sequential(self, record: LearningRecord, timeout: int,
+                                 cached: Optional[dict] = None) -> Tuple[Optional[Locator], Optional[str], Optional[str]]:
+        """按优先级依次尝试各个策略，每个策略单独等待"""
+        element = record.element
+        
+        for index, (strategy, selector) in enumerate(self._candidates(element, cached)):
+            # 缓存的选择器可能已经失效，只给它较短的等待时间
+            wait = min(timeout, 1000) if cached and index == 0 else timeout
+            locator = self.page.locator(selector)
+            if await self._is_element_visible(locator, wait):
                 logger.debug(f"使用 {strategy} 策略成功定位元素: {element.tagName}")
-                return locator
+                return locator, strategy, selector
         
-        logger.warning(f"无法定位元素: {record.description}")
-        return None
+        return None, None, None
+    
+    async def _locate_race(self, record: LearningRecord, timeout: int,
+                           cached: Optional[dict] = None) -> Tuple[Optional[Locator], Optional[str], Optional[str]]:
+        """在同一个截止时间内同时探测所有策略，选择优先级最高的命中策略"""
+        element = record.element
+        candidates = self._candidates(element, cached)
+        
+        if not candidates:
+            return None, None, None
+        
+        try:
+            handle = await self.page.wait_for_function(
+                _PROBE_SCRIPT, arg=[selector for _, selector in candidates], timeout=timeout
+            )
+            probe = await handle.json_value()
+        except Exception as e:
+            logger.debug(f"并发探测未命中: {e}")
+            probe = None
+        
+        if probe:
+            strategy, selector = candidates[probe['index']]
+            logger.debug(f"使用 {strategy} 策略成功定位元素: {element.tagName}")
+            return self.page.locator(selector), strategy, selector
+        
+        # 页面内无法解析的选择器（Playwright扩展语法）交给Playwright做一次即时检查
+        for strategy, selector in candidates:
+            if self._is_native_selector(selector):
+                continue
+            locator = self.page.locator(selector)
+            try:
+                if await locator.first.is_visible():
+                    return locator, strategy, selector
+            except Exception:
+                continue
+        
+        return None, None, None
+    
+    async def locate_with_selector(self, record: LearningRecord, selector: str, strategy: str,
+                                   timeout: int = 2000) -> Optional[Locator]:
+        """用指定的选择器（如AI建议的选择器）定位元素；成功时写入选择器缓存"""
+        locator = None
+        try:
+            if self._is_native_selector(selector):
+                await self.page.wait_for_function(_PROBE_SCRIPT, arg=[selector], timeout=timeout)
+                locator = self.page.locator(selector)
+            else:
+                candidate = self.page.locator(selector)
+                if await self._is_element_visible(candidate.first, timeout):
+                    locator = candidate
+        except Exception as e:
+            logger.debug(f"选择器 {selector} 未命中: {e}")
+        
+        if locator and self.cache:
+            self.cache.record_success(record, strategy, selector, cached=False)
+        return locator
+    
+    async def _locate_heal(self, record: LearningRecord) -> Tuple[Optional[Locator], Optional[str], Optional[str]]:
+        """本地修复：置信度达到阈值时直接使用得分最高的元素"""
+        heal = await self.heal_element(record)
+        if not heal:
+            return None, None, None
+        
+        heal['applied'] = heal['confidence'] >= self.heal_threshold
+        self.last_heal = heal
+        best = heal['candidates'][0]
+        if not heal['applied']:
+            logger.info(f"本地修复置信度不足 ({heal['confidence']:.2f} < {self.heal_threshold:.2f}): "
+                        f"{record.description}")
+            return None, None, None
+        
+        logger.info(f"本地修复定位元素: {record.description} -> {best['selector']} "
+                    f"(置信度 {heal['confidence']:.2f}, 耗时 {heal['elapsed_ms']:.0f}ms)")
+        return self.page.locator(best['selector']), "heal", best['selector']
+    
+    async def heal_element(self, record: LearningRecord) -> Optional[Dict[str, Any]]:
+        """在页面内一次调用给所有可交互元素打分（标签、id、类名、文本、占位符、类型、XPath结构），
+        返回得分最高的几个候选和置信度；页面上没有候选时返回None"""
+        start_time = time.perf_counter()
+        try:
+            result = await self.page.evaluate(_HEAL_SCRIPT, record.element.dict())
+        except Exception as e:
+            logger.debug(f"本地修复失败: {e}")
+            return None
+        if not result or not result.get('candidates'):
+            return None
+        
+        candidates = result['candidates']
+        best = candidates[0]['score']
+        second = candidates[1]['score'] if len(candidates) > 1 else 0.0
+        # 与第二名相差不足0.1时难以区分，按差距扣减置信度
+        confidence = best - max(0.0, 0.1 - (best - second))
+        return {
+            'confidence': round(confidence, 4),
+            'candidates': candidates,
+            'scanned': result.get('scanned', 0),
+            'elapsed_ms': (time.perf_counter() - start_time) * 1000
+        }
+    
+    @staticmethod
+    def _is_native_selector(selector: str) -> bool:
+        """判断选择器能否在页面内直接解析"""
+        if selector.startswith(('xpath=', 'text=')):
+            return True
+        return '>>' not in selector and ':has-text' not in selector and ':text' not in selector
     
     def _try_strategy(self, strategy: str, element: ElementInfo, record: LearningRecord) -> Optional[Locator]:
         """尝试特定的定位策略"""
+        selector = self._strategy_selector(strategy, element)
+        if selector:
+            return self.page.locator(selector)
+        return None
+    
+    def _strategy_selector(self, strategy: str, element: ElementInfo) -> Optional[str]:
+        """生成特定策略对应的Playwright选择器"""
         try:
             if strategy == "id" and element.id:
-                return self.page.locator(f"#{element.id}")
+                return f"#{element.id}"
             
             elif strategy == "css" and element.selector:
                 # 清理和优化CSS选择器
-                selector = self._clean_css_selector(element.selector)
-                return self.page.locator(selector)
+                return self._clean_css_selector(element.selector)
             
             elif strategy == "xpath" and element.xpath:
-                return self.page.locator(f"xpath={element.xpath}")
+                return f"xpath={element.xpath}"
             
             elif strategy == "text" and element.textContent:
                 # 使用文本内容定位
                 text = element.textContent.strip()
                 if text:
-                    return self.page.locator(f"text={text}")
+                    return f"text={text}"
             
             elif strategy == "placeholder" and element.placeholder:
-                return self.page.locator(f"[placeholder='{element.placeholder}']")
+                return f"[placeholder='{element.placeholder}']"
             
             elif strategy == "tag":
                 # 使用标签名和类名组合
                 if element.className:
                     classes = element.className.split()
                     class_selector = ".".join(classes)
-                    return self.page.locator(f"{element.tagName.lower()}.{class_selector}")
+                    return f"{element.tagName.lower()}.{class_selector}"
                 else:
-                    return self.page.locator(element.tagName.lower())
+                    return element.tagName.lower()
         
         except Exception as e:
             logger.debug(f"策略 {strategy} 失败: {e}")
-            return None
+        
+        return None
     
     def _clean_css_selector(self, selector: str) -> str:
         """清理和优化CSS选择器"""
@@ -77,10 +432,10 @@ class ElementLocator:
         
         return selector
     
-    def _is_element_visible(self, locator: Locator, timeout: int = 5000) -> bool:
+    async def _is_element_visible(self, locator: Locator, timeout: int = 5000) -> bool:
         """检查元素是否可见"""
         try:
-            locator.wait_for(state="visible", timeout=timeout)
+            await locator.wait_for(state="visible", timeout=timeout)
             return True
         except Exception:
             return False
@@ -117,70 +472,81 @@ class ElementLocator:
         
         return alternatives
     
-    def wait_for_element(self, record: LearningRecord, timeout: int = 10000) -> Optional[Locator]:
+    async def wait_for_element(self, record: LearningRecord, timeout: int = 10000) -> Optional[Locator]:
         """等待元素出现"""
+        # 并发探测本身就在页面内轮询直到截止时间，无需再外层循环
+        if self.locate_mode == "race":
+            return await self.locate_element(record, timeout=timeout)
+        
         start_time = time.time()
         
         while time.time() - start_time < timeout / 1000:
-            locator = self.locate_element(record, timeout=1000)
+            locator = await self.locate_element(record, timeout=1000)
             if locator:
                 return locator
             
-            time.sleep(0.5)
+            await asyncio.sleep(0.5)
         
         return None
     
-    def scroll_to_element(self, locator: Locator) -> bool:
+    async def scroll_to_element(self, locator: Locator) -> bool:
         """滚动到元素位置"""
         try:
-            locator.scroll_into_view_if_needed()
+            await locator.scroll_into_view_if_needed()
             return True
         except Exception as e:
             logger.warning(f"滚动到元素失败: {e}")
             return False
     
-    def get_element_info(self, locator: Locator) -> dict:
+    async def get_element_info(self, locator: Locator) -> dict:
         """获取元素的详细信息"""
         try:
             element_info = {
-                'tag_name': locator.evaluate('el => el.tagName'),
-                'id': locator.get_attribute('id'),
-                'class': locator.get_attribute('class'),
-                'text': locator.text_content(),
-                'is_visible': locator.is_visible(),
-                'is_enabled': locator.is_enabled(),
-                'bounding_box': locator.bounding_box()
+                'tag_name': await locator.evaluate('el => el.tagName'),
+                'id': await locator.get_attribute('id'),
+                'class': await locator.get_attribute('class'),
+                'text': await locator.text_content(),
+                'is_visible': await locator.is_visible(),
+                'is_enabled': await locator.is_enabled(),
+                'bounding_box': await locator.bounding_box()
             }
             return element_info
         except Exception as e:
             logger.warning(f"获取元素信息失败: {e}")
             return {}
     
-    def validate_element_state(self, locator: Locator, record: LearningRecord) -> bool:
+    async def probe_element_state(self, locator: Locator, scroll: bool = True) -> ElementState:
+        """一次页面内调用获取元素状态（标签、类型、可见、可用、只读、禁用、选中、位置）"""
+        state = await locator.evaluate(_STATE_SCRIPT, scroll)
+        return ElementState(**state)
+    
+    def check_element_state(self, state: ElementState, record: LearningRecord) -> bool:
+        """根据探测到的状态判断元素是否适合操作"""
+        # 检查元素是否可见
+        if not state.visible:
+            logger.warning(f"元素不可见: {record.description}")
+            return False
+        
+        # 检查元素是否启用
+        if not state.enabled:
+            logger.warning(f"元素未启用: {record.description}")
+            return False
+        
+        # 对于输入元素，检查是否可编辑
+        if record.type in ['input', 'change']:
+            if state.tag in ['input', 'textarea', 'select']:
+                if state.readonly or state.disabled:
+                    logger.warning(f"输入元素不可编辑: {record.description}")
+                    return False
+        
+        return True
+    
+    async def validate_element_state(self, locator: Locator, record: LearningRecord) -> bool:
         """验证元素状态是否适合操作"""
         try:
-            # 检查元素是否可见
-            if not locator.is_visible():
-                logger.warning(f"元素不可见: {record.description}")
-                return False
-            
-            # 检查元素是否启用
-            if not locator.is_enabled():
-                logger.warning(f"元素未启用: {record.description}")
-                return False
-            
-            # 对于输入元素，检查是否可编辑
-            if record.type in ['input', 'change']:
-                tag_name = locator.evaluate('el => el.tagName').lower()
-                if tag_name in ['input', 'textarea', 'select']:
-                    readonly = locator.get_attribute('readonly')
-                    disabled = locator.get_attribute('disabled')
-                    if readonly or disabled:
-                        logger.warning(f"输入元素不可编辑: {record.description}")
-                        return False
-            
-            return True
+            state = await self.probe_element_state(locator, scroll=False)
+            return self.check_element_state(state, record)
         
         except Exception as e:
             logger.warning(f"验证元素状态失败: {e}")
-            return False 
\ No newline at end of file
+            return False
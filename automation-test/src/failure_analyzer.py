@@ -0,0 +1,237 @@
+"""
+后台失败分析 - 在有界线程池中调用AI分析失败步骤，重放不必等待LLM响应
+"""
+import asyncio
+import hashlib
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import zip_longest
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from loguru import logger
+
+from .ai_assistant import AIAssistant, estimate_tokens
+from .dom_snapshot import SNAPSHOT_MAX_CHARS
+from .models import LearningRecord, ReplayResult
+
+class BackgroundFailureAnalyzer:
+    """后台失败分析器
+
+    失败时由重放引擎在事件循环中抓取页面快照（一次页面内调用，只传回失败元素附近的可交互元素），
+    两次LLM调用（失败分析、替代选择器）在线程池中执行；完成后在事件循环中回调on_complete，
+    由引擎把分析结果附加到对应的ReplayResult上
+    """
+
+    def __init__(self, ai_assistant: AIAssistant, workers: int = 2, max_pending: int = 50,
+                 on_complete: Callable[[int, ReplayResult, Dict[str, Any]], None] = None):
+        self.ai_assistant = ai_assistant
+        # 排队和执行中的分析数上限，失败过多时不再提交，避免快照堆积占用内存
+        self.max_pending = max_pending
+        self.on_complete = on_complete
+        self.stats = {'submitted': 0, 'completed': 0, 'errors': 0, 'dropped': 0,
+                      'timed_out': 0, 'analysis_time': 0.0, 'drain_time': 0.0,
+                      'snapshot_bytes': 0, 'page_chars': 0, 'context_tokens': 0}
+        # 步骤号 -> 该步骤页面快照的大小，分析完成时附加到分析结果中
+        self._contexts: Dict[int, Dict[str, Any]] = {}
+        self._executor = ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix="ai-analysis")
+        self._pending: List[asyncio.Future] = []
+
+    def submit(self, step: int, result: ReplayResult, page_info: Dict[str, Any]):
+        """提交一个失败步骤的快照，立即返回"""
+        self._pending = [future for future in self._pending if not future.done()]
+        if len(self._pending) >= self.max_pending:
+            self.stats['dropped'] += 1
+            logger.warning(f"AI分析队列已满，跳过第 {step} 步的分析")
+            return
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(
+            self._executor, self._analyze, result.record, result.error_message or '', page_info
+        )
+        future.add_done_callback(lambda done: self._finish(step, result, done))
+        self._pending.append(future)
+        self._track_context(step, page_info)
+
+    def _track_context(self, step: int, page_info: Dict[str, Any]):
+        """记录提交的页面快照：传回的字节数、整页HTML的字符数和进入提示的token数"""
+        snapshot = page_info.get('snapshot', {})
+        context = {
+            'snapshot_bytes': snapshot.get('snapshot_bytes', 0),
+            'page_chars': snapshot.get('page_chars', 0),
+            'elements': snapshot.get('elements', 0),
+            'context_tokens': estimate_tokens(page_info.get('content', ''))
+        }
+        self._contexts[step] = context
+        self.stats['submitted'] += 1
+        for key in ('snapshot_bytes', 'page_chars', 'context_tokens'):
+            self.stats[key] += context[key]
+
+    def _analyze(self, record: LearningRecord, error_message: str,
+                 page_info: Dict[str, Any]) -> Dict[str, Any]:
+        """在工作线程中执行：分析失败原因，有建议时再请求替代选择器"""
+        start_time = time.perf_counter()
+        analysis = self.ai_assistant.analyze_failure(record, error_message, page_info)
+        if analysis.get('suggestions'):
+            analysis['alternative_selectors'] = self.ai_assistant.suggest_alternative_selectors(
+                record, page_info.get('content', '')
+            )
+        analysis['analysis_time'] = time.perf_counter() - start_time
+        return analysis
+
+    def _finish(self, step: int, result: ReplayResult, future: asyncio.Future):
+        """分析完成（在事件循环中执行）"""
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            self.stats['errors'] += 1
+            logger.warning(f"第 {step} 步AI分析失败: {error}")
+            return
+
+        analysis = future.result()
+        self.stats['analysis_time'] += analysis['analysis_time']
+        self._complete(step, result, analysis)
+
+    def _complete(self, step: int, result: ReplayResult, analysis: Dict[str, Any]):
+        """附加页面快照大小并回调on_complete"""
+        self.stats['completed'] += 1
+        analysis['page_context'] = self._contexts.pop(step, {})
+        logger.info(f"第 {step} 步AI分析结果: {analysis['analysis']}")
+        for suggestion in analysis.get('alternative_selectors', []):
+            logger.debug(f"建议选择器: {suggestion}")
+        if self.on_complete:
+            self.on_complete(step, result, analysis)
+
+    async def drain(self, timeout: float) -> Dict[str, Any]:
+        """等待未完成的分析，最多timeout秒；超时的分析放弃，结果不再附加"""
+        pending = [future for future in self._pending if not future.done()]
+        start_time = time.perf_counter()
+        if pending:
+            logger.info(f"等待 {len(pending)} 个AI分析完成（最多 {timeout:.0f} 秒）")
+            _, not_done = await asyncio.wait(pending, timeout=timeout)
+            for future in not_done:
+                future.cancel()
+            self.stats['timed_out'] += len(not_done)
+            if not_done:
+                logger.warning(f"{len(not_done)} 个AI分析超时，已放弃")
+        self.stats['drain_time'] = time.perf_counter() - start_time
+        self.shutdown()
+        return self.stats
+
+    def shutdown(self):
+        """关闭线程池，不等待正在执行的LLM调用"""
+        self._pending = []
+        self._contexts = {}
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+def page_fingerprint(page_info: Dict[str, Any]) -> str:
+    """页面的指纹：URL相同但状态不同（如改版前后、弹窗打开）的页面分开分析。
+    快照内容随失败元素而变，所以只用标题和页面上可交互元素的总数"""
+    text = f"{page_info.get('title', '')}\x1f{page_info.get('snapshot', {}).get('interactive', '')}"
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:12]
+
+def merge_snapshots(page_infos: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """合并同一页面上多个失败的快照：轮流取各快照中最近的元素并去重，
+    每个失败步骤都能带上自己附近的元素，总长度仍不超过单个快照的上限"""
+    if len(page_infos) == 1:
+        return page_infos[0]
+    columns = [page_info.get('content', '').split('\n') for page_info in page_infos]
+    lines, seen, length = [], set(), 0
+    for row in zip_longest(*columns):
+        for line in row:
+            if not line or line in seen:
+                continue
+            if length + len(line) + 1 > SNAPSHOT_MAX_CHARS:
+                return {**page_infos[0], 'content': '\n'.join(lines)}
+            seen.add(line)
+            lines.append(line)
+            length += len(line) + 1
+    return {**page_infos[0], 'content': '\n'.join(lines)}
+
+class BatchFailureAnalyzer(BackgroundFailureAnalyzer):
+    """批量失败分析器
+
+    会话中只收集失败快照；会话结束时按 (URL, 页面指纹) 分组，每组发送一次结构化请求，
+    系统提示和合并后的页面快照只发送一次，响应解析回每个步骤的分析和替代选择器。
+    各组请求在线程池中并行执行
+    """
+
+    def __init__(self, ai_assistant: AIAssistant, workers: int = 2, max_pending: int = 50,
+                 on_complete: Callable[[int, ReplayResult, Dict[str, Any]], None] = None):
+        super().__init__(ai_assistant, workers, max_pending, on_complete)
+        self.stats.update({'groups': 0, 'batched_prompt_tokens': 0,
+                           'per_step_prompt_tokens': 0, 'per_step_requests': 0})
+        self._failures: List[Tuple[int, ReplayResult, Dict[str, Any]]] = []
+
+    def submit(self, step: int, result: ReplayResult, page_info: Dict[str, Any]):
+        """收集失败快照，会话结束时再分析"""
+        if len(self._failures) >= self.max_pending:
+            self.stats['dropped'] += 1
+            logger.warning(f"AI批量分析已收集 {self.max_pending} 个失败，跳过第 {step} 步")
+            return
+        self._failures.append((step, result, page_info))
+        self._track_context(step, page_info)
+
+    def _group(self) -> List[Tuple[Dict[str, Any], List[Tuple[int, ReplayResult]]]]:
+        """按 (URL, 页面指纹) 分组，保持失败发生的顺序，组内的快照合并为一份页面上下文"""
+        groups: Dict[Tuple[str, str], List[Tuple[int, ReplayResult, Dict[str, Any]]]] = defaultdict(list)
+        for failure in self._failures:
+            page_info = failure[2]
+            groups[(page_info.get('url', ''), page_fingerprint(page_info))].append(failure)
+        return [
+            (merge_snapshots([page_info for _, _, page_info in failures]),
+             [(step, result) for step, result, _ in failures])
+            for failures in groups.values()
+        ]
+
+    def _analyze_group(self, page_info: Dict[str, Any],
+                       failures: List[Tuple[int, ReplayResult]]) -> Dict[int, Dict[str, Any]]:
+        """在工作线程中执行：一次请求分析一组失败"""
+        start_time = time.perf_counter()
+        analyses = self.ai_assistant.analyze_failures_batch(failures, page_info)
+        elapsed = time.perf_counter() - start_time
+        for analysis in analyses.values():
+            analysis['analysis_time'] = elapsed
+        return analyses
+
+    async def drain(self, timeout: float) -> Dict[str, Any]:
+        """发送所有分组的请求并等待，最多timeout秒"""
+        start_time = time.perf_counter()
+        groups = self._group()
+        self.stats['groups'] = len(groups)
+        if groups:
+            logger.info(f"AI批量分析 {len(self._failures)} 个失败步骤，共 {len(groups)} 组")
+
+        loop = asyncio.get_running_loop()
+        futures = {}
+        for page_info, failures in groups:
+            estimate = self.ai_assistant.estimate_batch_tokens(failures, page_info)
+            for key, value in estimate.items():
+                self.stats[key] += value
+            future = loop.run_in_executor(self._executor, self._analyze_group, page_info, failures)
+            futures[future] = (page_info, failures)
+
+        if futures:
+            done, not_done = await asyncio.wait(list(futures), timeout=timeout)
+            for future in not_done:
+                future.cancel()
+                self.stats['timed_out'] += len(futures[future][1])
+            if not_done:
+                logger.warning(f"{len(not_done)} 组AI批量分析超时，已放弃")
+
+            for future in done:
+                _, failures = futures[future]
+                error = future.exception()
+                if error is not None:
+                    self.stats['errors'] += len(failures)
+                    logger.warning(f"AI批量分析失败: {error}")
+                    continue
+                analyses = future.result()
+                self.stats['analysis_time'] += analyses[failures[0][0]]['analysis_time']
+                for step, result in failures:
+                    self._complete(step, result, analyses[step])
+
+        self._failures = []
+        self.stats['drain_time'] = time.perf_counter() - start_time
+        self.shutdown()
+        return self.stats
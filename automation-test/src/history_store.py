@@ -0,0 +1,228 @@
+"""
+历史结果库 - 把每次重放的会话和步骤写入SQLite，统计步骤耗时分位数、不稳定步骤和最慢步骤
+"""
+import math
+import sqlite3
+import time
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
+from loguru import logger
+
+from .models import ReplayResult, ReplaySession
+
+DEFAULT_HISTORY_FILE = Path("data") / "history.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    trajectory TEXT NOT NULL,
+    start_time TEXT NOT NULL,
+    end_time TEXT,
+    duration REAL,
+    total_steps INTEGER NOT NULL,
+    successful_steps INTEGER NOT NULL,
+    failed_steps INTEGER NOT NULL,
+    recorded_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_trajectory_time ON sessions (trajectory, start_time);
+CREATE TABLE IF NOT EXISTS steps (
+    session_id TEXT NOT NULL,
+    trajectory TEXT NOT NULL,
+    step INTEGER NOT NULL,
+    type TEXT,
+    description TEXT,
+    selector_used TEXT,
+    retry_count INTEGER NOT NULL,
+    execution_time REAL NOT NULL,
+    success INTEGER NOT NULL,
+    error_message TEXT,
+    source_step INTEGER,
+    PRIMARY KEY (session_id, step)
+);
+"""
+
+def percentile(values: List[float], p: float) -> float:
+    """最近秩法计算分位数，values需已排序"""
+    if not values:
+        return 0.0
+    rank = max(math.ceil(p / 100 * len(values)), 1)
+    return values[rank - 1]
+
+def trajectory_key(source_file: Optional[str]) -> str:
+    """轨迹文件的标识：绝对路径，避免相对路径不同导致同一轨迹被拆开统计"""
+    if not source_file:
+        return ''
+    return str(Path(source_file).resolve())
+
+class HistoryStore:
+    """历史结果库 - 以轨迹文件和原始步骤号为索引，多个进程可以同时写入"""
+
+    def __init__(self, path: str | Path = DEFAULT_HISTORY_FILE):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # 分片运行时多个进程同时写入，等待锁而不是立即失败
+        self.conn = sqlite3.connect(self.path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(_SCHEMA)
+        self._migrate()
+        self.conn.commit()
+
+    def _migrate(self):
+        """旧版本的结果库没有source_step列，补上，旧的步骤行用重放步骤号回填；
+        步骤按 (轨迹, 原始步骤号) 汇总，索引也建在这两列上"""
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(steps)")}
+        if 'source_step' not in columns:
+            self.conn.execute("ALTER TABLE steps ADD COLUMN source_step INTEGER")
+            self.conn.execute("UPDATE steps SET source_step = step")
+        self.conn.execute("DROP INDEX IF EXISTS steps_trajectory_step")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS steps_trajectory_source_step ON steps (trajectory, source_step)")
+
+    def close(self):
+        """关闭数据库"""
+        self.conn.close()
+
+    def __enter__(self) -> "HistoryStore":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    @staticmethod
+    def step_row(step: int, result: ReplayResult, source_step: Optional[int] = None) -> Tuple:
+        """把一步的结果转为紧凑的行，会话结束前只保留这些行；
+        source_step是记录在轨迹文件中的序号，合并逐键输入后step会变化，统计按source_step汇总"""
+        return (
+            step,
+            result.record.type,
+            result.record.description,
+            result.selector_used,
+            result.retry_count,
+            result.execution_time,
+            1 if result.success else 0,
+            result.error_message,
+            source_step if source_step is not None else step
+        )
+
+    def record_session(self, session: ReplaySession, steps: List[Tuple]):
+        """在一个事务中写入会话和所有步骤"""
+        trajectory = trajectory_key(session.source_file)
+        duration = None
+        if session.end_time:
+            duration = (session.end_time - session.start_time).total_seconds()
+
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    session.session_id, trajectory,
+                    session.start_time.isoformat(),
+                    session.end_time.isoformat() if session.end_time else None,
+                    duration, session.total_records,
+                    session.successful_records, session.failed_records,
+                    time.time()
+                )
+            )
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO steps (session_id, trajectory, step, type, description, selector_used, "
+                "retry_count, execution_time, success, error_message, source_step) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(session.session_id, trajectory, *row) for row in steps]
+            )
+        logger.debug(f"历史结果已写入: {self.path} (会话 {session.session_id}, {len(steps)} 步)")
+
+    def _recent_sessions_sql(self, trajectory_filter: Optional[str]) -> Tuple[str, List[Any]]:
+        """每个轨迹最近N次会话的子查询"""
+        sql = """
+            SELECT session_id FROM (
+                SELECT session_id, ROW_NUMBER() OVER (
+                    PARTITION BY trajectory ORDER BY start_time DESC
+                ) AS run
+                FROM sessions WHERE trajectory LIKE ?
+            ) WHERE run <= ?
+        """
+        return sql, [f"%{trajectory_filter or ''}%"]
+
+    def trajectory_stats(self, last_runs: int = 20, trajectory_filter: str = None) -> List[Dict[str, Any]]:
+        """每个轨迹最近N次运行的通过率和步骤耗时分位数"""
+        recent_sql, params = self._recent_sessions_sql(trajectory_filter)
+        sessions: Dict[str, Dict[str, Any]] = {}
+        for trajectory, failed, duration in self.conn.execute(
+            f"SELECT trajectory, failed_steps, duration FROM sessions WHERE session_id IN ({recent_sql})",
+            params + [last_runs]
+        ):
+            entry = sessions.setdefault(trajectory, {'runs': 0, 'passed': 0, 'durations': [], 'latencies': []})
+            entry['runs'] += 1
+            entry['passed'] += 1 if failed == 0 else 0
+            if duration is not None:
+                entry['durations'].append(duration)
+
+        for trajectory, execution_time in self.conn.execute(
+            f"SELECT trajectory, execution_time FROM steps WHERE session_id IN ({recent_sql})",
+            params + [last_runs]
+        ):
+            if trajectory in sessions:
+                sessions[trajectory]['latencies'].append(execution_time)
+
+        stats = []
+        for trajectory, entry in sessions.items():
+            latencies = sorted(entry['latencies'])
+            stats.append({
+                'trajectory': trajectory,
+                'runs': entry['runs'],
+                'pass_rate': entry['passed'] / entry['runs'],
+                'avg_duration': sum(entry['durations']) / len(entry['durations']) if entry['durations'] else 0.0,
+                'steps': len(latencies),
+                'p50': percentile(latencies, 50),
+                'p95': percentile(latencies, 95),
+                'p99': percentile(latencies, 99)
+            })
+        return sorted(stats, key=lambda s: s['trajectory'])
+
+    def step_stats(self, last_runs: int = 20, trajectory_filter: str = None) -> List[Dict[str, Any]]:
+        """按 (轨迹, 原始步骤号) 汇总最近N次运行：耗时分位数、失败率和重试率；
+        步骤号按轨迹文件中的序号计，开关--coalesce-input的运行之间仍对应同一个操作"""
+        recent_sql, params = self._recent_sessions_sql(trajectory_filter)
+        steps: Dict[Tuple[str, int], Dict[str, Any]] = {}
+        for trajectory, step, description, execution_time, success, retry_count in self.conn.execute(
+            f"""
+            SELECT trajectory, source_step, description, execution_time, success, retry_count
+            FROM steps WHERE session_id IN ({recent_sql})
+            """,
+            params + [last_runs]
+        ):
+            entry = steps.setdefault((trajectory, step), {
+                'trajectory': trajectory, 'step': step, 'description': description,
+                'times': [], 'failures': 0, 'retries': 0
+            })
+            entry['times'].append(execution_time)
+            entry['failures'] += 0 if success else 1
+            entry['retries'] += 1 if retry_count else 0
+
+        stats = []
+        for entry in steps.values():
+            times = sorted(entry.pop('times'))
+            runs = len(times)
+            entry.update({
+                'runs': runs,
+                'p50': percentile(times, 50),
+                'p95': percentile(times, 95),
+                'total_time': sum(times),
+                'failure_rate': entry['failures'] / runs,
+                'retry_rate': entry.pop('retries') / runs
+            })
+            # 有时成功有时失败（或需要重试才成功）的步骤视为不稳定
+            entry['flaky'] = 0 < entry['failures'] < runs or entry['retry_rate'] > 0
+            stats.append(entry)
+        return stats
+
+    def slowest_steps(self, last_runs: int = 20, trajectory_filter: str = None,
+                      limit: int = 10) -> List[Dict[str, Any]]:
+        """p95耗时最高的步骤"""
+        stats = self.step_stats(last_runs, trajectory_filter)
+        return sorted(stats, key=lambda s: s['p95'], reverse=True)[:limit]
+
+    def flaky_steps(self, last_runs: int = 20, trajectory_filter: str = None,
+                    limit: int = 10) -> List[Dict[str, Any]]:
+        """不稳定的步骤，按失败率和重试率排序"""
+        stats = [s for s in self.step_stats(last_runs, trajectory_filter) if s['flaky']]
+        return sorted(stats, key=lambda s: (s['failure_rate'], s['retry_rate']), reverse=True)[:limit]
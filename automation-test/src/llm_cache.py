@@ -0,0 +1,116 @@
+"""
+LLM响应缓存 - 以 (模型, 提示模板, 渲染输入) 的哈希为键，把响应持久化到SQLite，TTL + LRU淘汰
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from loguru import logger
+
+DEFAULT_CACHE_FILE = Path("data") / "llm_cache.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    response TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used);
+"""
+
+def make_key(model: str, template: List[Tuple[str, str]], inputs: Dict[str, Any]) -> str:
+    """内容寻址的缓存键：模型、模板或任一输入变化都会得到不同的键"""
+    payload = json.dumps(
+        {'model': model, 'template': template, 'inputs': inputs},
+        ensure_ascii=False, sort_keys=True, default=str
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class LLMCache:
+    """LLM响应缓存 - 多个进程共享同一个文件，AI调用在线程中执行所以读写加锁"""
+
+    def __init__(self, path: str | Path = DEFAULT_CACHE_FILE, max_entries: int = 2000,
+                 ttl_seconds: float = 7 * 24 * 3600):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.stats = {'hits': 0, 'misses': 0, 'stores': 0, 'expired': 0, 'evictions': 0}
+        self._lock = threading.Lock()
+        # 关闭后被放弃的AI线程可能仍会读写缓存，此时读取视为未命中、写入直接忽略
+        self._closed = False
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(_SCHEMA)
+        self.conn.commit()
+
+    def close(self):
+        """关闭数据库"""
+        with self._lock:
+            self._closed = True
+            self.conn.close()
+
+    def __enter__(self) -> "LLMCache":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def get(self, key: str) -> Optional[str]:
+        """查找响应；过期的条目直接删除"""
+        now = time.time()
+        with self._lock:
+            if self._closed:
+                return None
+            row = self.conn.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.stats['misses'] += 1
+                return None
+
+            response, created_at = row
+            if now - created_at > self.ttl_seconds:
+                with self.conn:
+                    self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.stats['expired'] += 1
+                self.stats['misses'] += 1
+                return None
+
+            with self.conn:
+                self.conn.execute(
+                    "UPDATE responses SET last_used = ?, hits = hits + 1 WHERE key = ?", (now, key)
+                )
+            self.stats['hits'] += 1
+            return response
+
+    def put(self, key: str, model: str, response: str):
+        """保存响应，超出容量时淘汰最久未使用的条目；缓存已关闭时不保存"""
+        now = time.time()
+        with self._lock:
+            if self._closed:
+                return
+            with self.conn:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, model, response, created_at, last_used) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (key, model, response, now, now)
+                )
+                self.stats['stores'] += 1
+
+                count, = self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+                if count > self.max_entries:
+                    evicted = self.conn.execute(
+                        "DELETE FROM responses WHERE key IN ("
+                        "SELECT key FROM responses ORDER BY last_used LIMIT ?)",
+                        (count - self.max_entries,)
+                    ).rowcount
+                    self.stats['evictions'] += evicted
+                    logger.debug(f"LLM缓存淘汰 {evicted} 条最久未使用的响应")
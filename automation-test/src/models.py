@@ -22,6 +22,17 @@ class Position(BaseModel):
     x: int
     y: int
 
+class ElementState(BaseModel):
+    """一次页面内探测得到的元素状态"""
+    tag: str
+    type: Optional[str] = None
+    visible: bool
+    enabled: bool
+    readonly: bool = False
+    disabled: bool = False
+    checked: Optional[bool] = None
+    box: Optional[Dict[str, float]] = None  # x, y, width, height
+
 class LearningRecord(BaseModel):
     """学习记录"""
     type: str  # click, input, change, submit
@@ -40,6 +51,10 @@ class ReplayResult(BaseModel):
     execution_time: float
     retry_count: int = 0
     selector_used: Optional[str] = None
+    settle_time: Optional[float] = None  # 操作后等待页面响应的秒数
+    ai_analysis: Optional[Dict[str, Any]] = None  # 后台AI失败分析的结果，完成后才附加
+    healed_selector: Optional[str] = None  # 本地修复找到并成功执行的选择器
+    heal_confidence: Optional[float] = None  # 本地修复得分最高候选的置信度
 
 class ReplaySession(BaseModel):
     """重放会话"""
@@ -51,6 +66,19 @@ class ReplaySession(BaseModel):
     failed_records: int
     results: List[ReplayResult] = []
     summary: Dict[str, Any] = {}
+    source_file: Optional[str] = None
+
+class SuiteReport(BaseModel):
+    """套件重放报告"""
+    suite_id: str
+    start_time: datetime
+    end_time: Optional[datetime] = None
+    total_files: int
+    passed_files: int = 0
+    failed_files: int = 0
+    sessions: List[ReplaySession] = []
+    errors: Dict[str, str] = {}  # 文件路径 -> 无法完成重放的错误信息
+    summary: Dict[str, Any] = {}
 
 class TestConfig(BaseModel):
     """测试配置"""
@@ -61,10 +89,47 @@ class TestConfig(BaseModel):
     replay_delay: float = 1.0
     retry_count: int = 3
     wait_for_navigation: bool = True
+    stream_records: bool = False  # 边解析边重放，不预先加载整个文件
+    from_step: int = 1  # 从第几步开始重放（从1开始计数）
+    coalesce_input: bool = False  # 合并同一元素上连续的逐键输入，去掉输入前的聚焦点击
+    result_sink: bool = False  # 每完成一步就把结果追加到JSONL文件
+    result_retention: str = "all"  # all: 内存中保留所有步骤结果; aggregate: 只保留汇总计数
+    fsync_every: int = 20  # JSONL结果每写入多少行落盘一次
+    history: bool = True  # 把会话和每步结果写入历史库，供history命令统计
+    history_file: str = "data/history.sqlite"
+    wait_strategy: str = "fixed"  # fixed: 固定等待replay_delay; settle: 等到页面静止
+    settle_quiet_ms: int = 300  # 无DOM变化且无请求持续多久视为静止(毫秒)
+    settle_timeout_ms: int = 5000  # 等待静止的上限(毫秒)
+    nav_wait_ms: int = 1000  # 强制导航前等待进行中导航完成的时间(毫秒)
+    spa_navigation: bool = False  # 同源页面间使用History API切换路由而不重新加载
     selector_priority: List[str] = ["id", "css", "xpath", "text"]
+    locate_mode: str = "race"  # race: 所有策略同时探测; sequential: 按优先级逐个等待
+    selector_cache: bool = True  # 跨运行缓存每个元素上次成功的选择器
+    selector_cache_file: str = "data/selector_cache.json"
+    selector_cache_ttl_hours: float = 168  # 超过此时间未验证的缓存条目失效
+    self_heal: bool = True  # 所有定位策略失败时按DOM相似度在页面上寻找最接近的元素
+    heal_threshold: float = 0.7  # 本地修复置信度达到此值时直接使用，低于此值才交给AI分析
+    ai_heal: bool = False  # 本地修复失败时请AI建议选择器并实际执行验证（在重放路径上等待AI）
+    ai_heal_attempts: int = 3  # 最多尝试几个AI建议的选择器
+    ai_heal_timeout: float = 15.0  # 重放路径上等待AI建议选择器的最长时间(秒)
+    heal_output: str = "copy"  # copy: 补丁文件 + 修复后的轨迹副本; patch: 只写补丁文件; off: 不保存
+    patch_file: Optional[str] = None  # 重放前应用的修复补丁文件
+    
+    # 浏览器服务配置
+    browser_endpoint: Optional[str] = None  # 指定浏览器服务的CDP地址
+    use_browser_server: bool = True  # 未指定地址时自动发现正在运行的浏览器服务
+    connect_timeout: int = 3000  # 连接浏览器服务的超时时间(毫秒)
     
     # AI配置
     openai_api_key: Optional[str] = None
     openai_base_url: Optional[str] = None
     openai_model: str = "gpt-3.5-turbo"
-    max_tokens: int = 1000 
\ No newline at end of file
+    max_tokens: int = 1000
+    llm_cache: bool = True  # 相同模型、提示模板和输入的AI响应取自磁盘缓存
+    llm_cache_file: str = "data/llm_cache.sqlite"
+    llm_cache_ttl_hours: float = 168  # 超过此时间的缓存响应失效
+    llm_cache_max_entries: int = 2000  # 超出后淘汰最久未使用的响应
+    ai_analysis_mode: str = "background"  # background: 每个失败步骤单独后台分析; batch: 会话结束时按页面分组批量分析
+    ai_workers: int = 2  # 后台AI失败分析的线程数
+    ai_max_pending: int = 50  # 排队中的AI分析上限，超出后跳过新的失败步骤
+    ai_drain_timeout: float = 60.0  # 会话结束时等待未完成AI分析的最长时间(秒) 
\ No newline at end of file
@@ -0,0 +1,75 @@
+"""
+页面导航器 - 根据页面当前状态决定是否真的需要导航
+"""
+from typing import Dict
+from playwright.async_api import Page
+from loguru import logger
+
+from .url_utils import normalize_url, same_origin
+
+# 通过History API切换单页应用路由，并通知路由库；只有哈希路由变化时直接改location.hash，
+# 浏览器会触发hashchange，哈希路由库据此切换页面
+_HISTORY_NAVIGATE_SCRIPT = """
+(url) => {
+    const target = new URL(url, location.href);
+    if (target.pathname === location.pathname && target.search === location.search && target.hash) {
+        location.hash = target.hash;
+        return;
+    }
+    history.pushState(history.state, '', url);
+    window.dispatchEvent(new PopStateEvent('popstate', {state: history.state}));
+}
+"""
+
+class Navigator:
+    """页面导航器 - 已在目标页面时跳过导航，避免重复加载和丢失单页应用状态"""
+
+    def __init__(self, page: Page, nav_wait_ms: int = 1000, spa_navigation: bool = False):
+        self.page = page
+        # 上一个操作可能已经触发导航，强制导航前最多等待的时间
+        self.nav_wait_ms = nav_wait_ms
+        # 同源页面之间使用History API切换路由，而不是重新加载
+        self.spa_navigation = spa_navigation
+
+        self.stats: Dict[str, int] = {'skipped': 0, 'waited': 0, 'history': 0, 'goto': 0}
+
+    def is_at(self, url: str) -> bool:
+        """页面是否已经在目标URL"""
+        return normalize_url(self.page.url) == normalize_url(url)
+
+    async def navigate(self, url: str, wait_inflight: bool = True) -> str:
+        """导航到目标URL，返回实际采取的方式: skipped/waited/history/goto"""
+        if self.is_at(url):
+            return self._record('skipped', url)
+
+        # 上一个点击或提交可能已经触发了导航，稍等片刻看是否自然到达
+        if wait_inflight and self.nav_wait_ms > 0:
+            target = normalize_url(url)
+            try:
+                await self.page.wait_for_url(
+                    lambda current: normalize_url(current) == target,
+                    timeout=self.nav_wait_ms
+                )
+                return self._record('waited', url)
+            except Exception:
+                pass
+
+        if self.spa_navigation and same_origin(self.page.url, url):
+            try:
+                await self.page.evaluate(_HISTORY_NAVIGATE_SCRIPT, url)
+                if self.is_at(url):
+                    return self._record('history', url)
+            except Exception as e:
+                logger.debug(f"History API导航失败，改为重新加载: {e}")
+
+        await self.page.goto(url)
+        return self._record('goto', url)
+
+    def _record(self, action: str, url: str) -> str:
+        """记录导航方式"""
+        self.stats[action] += 1
+        if action == 'goto':
+            logger.info(f"导航到新页面: {url}")
+        else:
+            logger.debug(f"页面导航({action}): {url}")
+        return action
@@ -0,0 +1,88 @@
+"""
+记录规范化 - 在加载和重放之间合并逐键输入，去掉冗余步骤
+"""
+from typing import Dict, Iterable, Iterator
+from loguru import logger
+
+from .models import LearningRecord
+
+# 会改变元素取值的操作
+VALUE_TYPES = {'input', 'change'}
+
+# 不是文本输入框的input类型，点击它们本身就是操作，不能当作聚焦点击去掉
+NON_TEXT_INPUT_TYPES = {
+    'checkbox', 'radio', 'file', 'range', 'color',
+    'submit', 'button', 'reset', 'image'
+}
+
+def same_element(a: LearningRecord, b: LearningRecord) -> bool:
+    """两条记录是否作用于同一页面上的同一元素"""
+    return (a.url == b.url
+            and a.element.selector == b.element.selector
+            and a.element.xpath == b.element.xpath)
+
+def is_text_entry(record: LearningRecord) -> bool:
+    """记录的目标元素是否为文本输入（输入框、文本域、可编辑区域）"""
+    if (record.element.tagName or '').upper() == 'SELECT':
+        return False
+    return (record.element.type or '').lower() not in NON_TEXT_INPUT_TYPES
+
+class RecordNormalizer:
+    """记录规范化器 - 流式处理，只向后看一条记录
+
+    - 同一元素上连续的input/change记录合并为最后一条（插件每按一个键记录一次，
+      重放时fill()本来就写入完整值，只需最终值）
+    - 紧接在同一文本输入框的input之前的点击只是为了聚焦，直接去掉
+    """
+
+    def __init__(self):
+        self.stats: Dict[str, int] = {
+            'original_steps': 0,
+            'normalized_steps': 0,
+            'merged_inputs': 0,
+            'dropped_focus_clicks': 0
+        }
+        # 最近产出的记录在输入记录流中的序号（从1开始）；合并后步骤号会变化，这个序号不随是否合并而变
+        self.source_step = 0
+
+    @property
+    def eliminated(self) -> int:
+        """去掉的步骤数"""
+        return self.stats['merged_inputs'] + self.stats['dropped_focus_clicks']
+
+    def normalize(self, records: Iterable[LearningRecord]) -> Iterator[LearningRecord]:
+        """规范化记录流，可以是列表，也可以是流式加载的迭代器"""
+        pending = None
+        pending_step = 0
+
+        for record in records:
+            self.stats['original_steps'] += 1
+
+            if pending is not None and same_element(pending, record):
+                if pending.type in VALUE_TYPES and record.type in VALUE_TYPES:
+                    self.stats['merged_inputs'] += 1
+                    pending, pending_step = record, self.stats['original_steps']
+                    continue
+
+                if pending.type == 'click' and record.type == 'input' and is_text_entry(record):
+                    self.stats['dropped_focus_clicks'] += 1
+                    pending, pending_step = record, self.stats['original_steps']
+                    continue
+
+            if pending is not None:
+                yield self._emit(pending, pending_step)
+            pending, pending_step = record, self.stats['original_steps']
+
+        if pending is not None:
+            yield self._emit(pending, pending_step)
+
+        if self.eliminated:
+            logger.info(f"记录规范化: {self.stats['original_steps']} 步 -> "
+                        f"{self.stats['normalized_steps']} 步 (合并输入 {self.stats['merged_inputs']}, "
+                        f"去掉聚焦点击 {self.stats['dropped_focus_clicks']})")
+
+    def _emit(self, record: LearningRecord, source_step: int) -> LearningRecord:
+        """输出一条规范化后的记录"""
+        self.stats['normalized_steps'] += 1
+        self.source_step = source_step
+        return record
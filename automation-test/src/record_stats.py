@@ -0,0 +1,173 @@
+"""
+记录统计 - 单遍流式计算校验结果、类型分布、URL集合和时间范围
+"""
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, List, Dict, Any, Optional, Tuple
+
+from .url_utils import compile_url_pattern
+
+def missing_fields(record) -> List[Tuple[str, str]]:
+    """记录缺少的必要字段，返回 (计数器名, 原因) 列表；为空表示记录有效"""
+    missing = []
+    if not record.url:
+        missing.append(('missing_urls', "缺少URL"))
+    if not record.element.selector:
+        missing.append(('missing_selectors', "缺少CSS选择器"))
+    if not record.element.xpath:
+        missing.append(('missing_xpath', "缺少XPath"))
+    return missing
+
+class RecordStats:
+    """单遍流式统计器
+
+    校验统计覆盖所有记录，摘要统计只覆盖通过过滤条件的记录；
+    错误信息只保留前max_errors条样本，错误总数单独计数。
+    """
+
+    def __init__(self, record_types: Iterable[str] = None, url_pattern: str = None,
+                 max_errors: Optional[int] = 20, url_regex: bool = False):
+        # 过滤条件（URL模式支持子串、通配符和正则，见url_utils.compile_url_pattern）
+        self.record_types = set(record_types) if record_types else None
+        self.url_pattern = url_pattern
+        self._url_match = compile_url_pattern(url_pattern, url_regex) if url_pattern else None
+        self.max_errors = max_errors
+
+        # 校验统计
+        self.files = 0
+        self.total_records = 0
+        self.valid_records = 0
+        self.invalid_records = 0
+        self.missing_urls = 0
+        self.missing_selectors = 0
+        self.missing_xpath = 0
+        self.error_count = 0
+        self.errors: List[str] = []
+        self.file_errors: Dict[str, str] = {}
+        # 目录URL查询命中的 (文件路径, 步骤号)，来自URL索引；未使用索引时为None
+        self.url_hits: Optional[List[Tuple[Path, int]]] = None
+
+        # 摘要统计（过滤后）
+        self.matched_records = 0
+        self.types: Dict[str, int] = {}
+        self.urls: set = set()
+        self.start_time: Optional[datetime] = None
+        self.end_time: Optional[datetime] = None
+
+        self._source: Optional[str] = None
+        self._index = 0
+
+    def start_file(self, source: Optional[str]):
+        """开始统计一个新文件，错误信息中会带上文件名"""
+        self.files += 1
+        self._source = source
+        self._index = 0
+
+    def add_file_error(self, source: str, error: str):
+        """记录无法读取的文件"""
+        self.file_errors[source] = error
+
+    def add_entry(self, source: Optional[str], entry: Dict[str, Any]):
+        """合并轨迹索引中一个文件的统计结果（仅在没有过滤条件时使用）"""
+        self.files += 1
+        if entry.get('error'):
+            self.add_file_error(source, entry['error'])
+            return
+
+        self.total_records += entry['record_count']
+        self.valid_records += entry['valid_records']
+        self.invalid_records += entry['invalid_records']
+        self.missing_urls += entry['missing_urls']
+        self.missing_selectors += entry['missing_selectors']
+        self.missing_xpath += entry['missing_xpath']
+        self.error_count += entry['error_count']
+        for error in entry['errors']:
+            if self.max_errors is not None and len(self.errors) >= self.max_errors:
+                break
+            self.errors.append(f"{source} {error}" if source else error)
+
+        self.matched_records += entry['record_count']
+        for record_type, count in entry['types'].items():
+            self.types[record_type] = self.types.get(record_type, 0) + count
+        self.urls.update(entry['urls'])
+
+        if entry['start_time'] and (self.start_time is None or entry['start_time'] < self.start_time):
+            self.start_time = entry['start_time']
+        if entry['end_time'] and (self.end_time is None or entry['end_time'] > self.end_time):
+            self.end_time = entry['end_time']
+
+    def add(self, record) -> bool:
+        """统计一条记录（LearningRecord或CompactRecord），返回是否通过过滤条件"""
+        index = self._index
+        self._index += 1
+        self._validate(record, index)
+
+        if self.record_types is not None and record.type not in self.record_types:
+            return False
+        if self._url_match and not self._url_match(record.url):
+            return False
+
+        self.matched_records += 1
+        self.types[record.type] = self.types.get(record.type, 0) + 1
+        self.urls.add(record.url)
+
+        timestamp = record.timestamp
+        if self.start_time is None or timestamp < self.start_time:
+            self.start_time = timestamp
+        if self.end_time is None or timestamp > self.end_time:
+            self.end_time = timestamp
+
+        return True
+
+    def add_all(self, records: Iterable) -> "RecordStats":
+        """统计多条记录"""
+        for record in records:
+            self.add(record)
+        return self
+
+    def _validate(self, record, index: int):
+        """校验单条记录"""
+        self.total_records += 1
+        missing = missing_fields(record)
+
+        if not missing:
+            self.valid_records += 1
+            return
+
+        self.invalid_records += 1
+        for counter, reason in missing:
+            setattr(self, counter, getattr(self, counter) + 1)
+            self.error_count += 1
+            if self.max_errors is None or len(self.errors) < self.max_errors:
+                prefix = f"{self._source} " if self._source else ""
+                self.errors.append(f"{prefix}记录 {index+1}: {reason}")
+
+    def validation_result(self) -> Dict[str, Any]:
+        """校验结果，结构与LearningDataLoader.validate_records一致"""
+        return {
+            'total_records': self.total_records,
+            'valid_records': self.valid_records,
+            'invalid_records': self.invalid_records,
+            'missing_urls': self.missing_urls,
+            'missing_selectors': self.missing_selectors,
+            'missing_xpath': self.missing_xpath,
+            'errors': list(self.errors),
+            'error_count': self.error_count,
+            'files': self.files,
+            'file_errors': dict(self.file_errors)
+        }
+
+    def summary(self) -> Dict[str, Any]:
+        """摘要信息，结构与LearningDataLoader.get_records_summary一致"""
+        if not self.matched_records:
+            return {'total': 0, 'types': {}, 'urls': []}
+
+        return {
+            'total': self.matched_records,
+            'types': dict(self.types),
+            'urls': list(self.urls),
+            'time_range': {
+                'start': self.start_time,
+                'end': self.end_time
+            }
+        }
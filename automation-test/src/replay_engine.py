@@ -1,12 +1,14 @@
 """
 重放引擎 - 主要的自动化测试执行器
 """
+import asyncio
+import itertools
 import time
 import uuid
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import Iterable, Iterator, List, Dict, Any, Optional, Tuple
 from pathlib import Path
-from playwright.sync_api import sync_playwright, Browser, Page
+from playwright.async_api import async_playwright, Browser, Page
 from loguru import logger
 from rich.console import Console
 from rich.table import Table
@@ -14,50 +16,125 @@ from rich.progress import Progress, SpinnerColumn, TextColumn
 
 from .models import LearningRecord, ReplayResult, ReplaySession, TestConfig
 from .data_loader import LearningDataLoader
+from .record_stats import RecordStats
 from .element_locator import ElementLocator
 from .action_executor import ActionExecutor
 from .ai_assistant import AIAssistant
+from .browser_server import connect_or_launch
+from .settle import SETTLE_INIT_SCRIPT
+from .navigator import Navigator
+from .selector_cache import SelectorCache
+from .normalizer import RecordNormalizer
+from .result_sink import JsonlResultSink
+from .history_store import HistoryStore
+from .llm_cache import LLMCache
+from .failure_analyzer import BackgroundFailureAnalyzer, BatchFailureAnalyzer
+from .trajectory_healer import TrajectoryHealer, apply_patch, load_patch
 
-class ReplayEngine:
-    """重放引擎 - 执行自动化测试的核心类"""
+def create_selector_cache(config: TestConfig) -> SelectorCache:
+    """根据配置创建选择器缓存"""
+    return SelectorCache(
+        config.selector_cache_file,
+        ttl_seconds=config.selector_cache_ttl_hours * 3600
+    )
+
+def create_ai_assistant(config: TestConfig) -> AIAssistant:
+    """根据配置创建AI助手；只有配置了API密钥且未关闭缓存时才打开LLM响应缓存"""
+    cache = None
+    if config.openai_api_key and config.llm_cache:
+        cache = LLMCache(
+            config.llm_cache_file,
+            max_entries=config.llm_cache_max_entries,
+            ttl_seconds=config.llm_cache_ttl_hours * 3600
+        )
+    return AIAssistant(
+        api_key=config.openai_api_key,
+        model=config.openai_model,
+        base_url=config.openai_base_url,
+        max_tokens=config.max_tokens,
+        cache=cache
+    )
+
+class AsyncReplayEngine:
+    """异步重放引擎 - 执行自动化测试的核心类，基于playwright.async_api"""
     
-    def __init__(self, config: TestConfig = None):
+    def __init__(self, config: TestConfig = None, browser: Browser = None,
+                 quiet: bool = False, selector_cache: SelectorCache = None):
         self.config = config or TestConfig()
-        self.console = Console()
+        self.console = Console(quiet=quiet)
+        self.quiet = quiet
         self.playwright = None
-        self.browser = None
+        self.browser = browser
+        self.context = None
         self.page = None
+        self.navigator: Optional[Navigator] = None
+        self.cache_stats: Dict[str, int] = {}
+        self.llm_cache_stats: Dict[str, int] = {}
+        self.connected_to_server = False
+        # 从中间步骤开始重放时跳过的记录数，用于显示原始步骤编号
+        self.step_offset = 0
+        self.normalizer: Optional[RecordNormalizer] = None
+        
+        # 外部传入的浏览器由调用方管理生命周期，本引擎只负责自己的上下文
+        self._owns_browser = browser is None
+        
+        # 选择器缓存；外部传入时由调用方负责保存
+        self._owns_cache = selector_cache is None
+        if selector_cache is None and self.config.selector_cache:
+            selector_cache = create_selector_cache(self.config)
+        self.selector_cache = selector_cache
         
         # 初始化组件
         self.data_loader = LearningDataLoader(Path("data"))
-        self.ai_assistant = AIAssistant()
+        self.ai_assistant = create_ai_assistant(self.config)
         
         # 会话状态
         self.current_session: Optional[ReplaySession] = None
         self.results: List[ReplayResult] = []
+        # 汇总计数；result_retention为aggregate时results不保留，只靠它生成摘要
+        self.totals = {'steps': 0, 'successful': 0, 'failed': 0, 'healed': 0,
+                       'execution_time': 0.0, 'settle_time': 0.0}
+        self.result_sink: Optional[JsonlResultSink] = None
+        # 本次会话写入历史库的步骤行（紧凑元组，不受result_retention影响）
+        self.history_steps: List[tuple] = []
+        # 后台AI失败分析
+        self.failure_analyzer: Optional[BackgroundFailureAnalyzer] = None
+        self.ai_analysis_stats: Dict[str, Any] = {}
+        self.ai_failures: List[Dict[str, Any]] = []
+        # 本次会话中验证通过的修复选择器
+        self.healer = TrajectoryHealer()
+        self.healing: Dict[str, Any] = {}
         
-    def __enter__(self):
-        """上下文管理器入口"""
-        self.start_browser()
+    async def __aenter__(self):
+        """异步上下文管理器入口"""
+        await self.start_browser()
         return self
     
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        """上下文管理器出口"""
-        self.close_browser()
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """异步上下文管理器出口"""
+        await self.close_browser()
     
-    def start_browser(self):
+    async def start_browser(self):
         """启动浏览器"""
         try:
-            self.playwright = sync_playwright().start()
+            if self._owns_browser:
+                self.playwright = await async_playwright().start()
+                # 浏览器服务可用时直接连接，关闭时只断开连接，浏览器进程继续常驻
+                self.browser, self.connected_to_server = await connect_or_launch(
+                    self.playwright, self.config
+                )
             
-            browser_type = getattr(self.playwright, self.config.browser_type)
-            self.browser = browser_type.launch(
-                headless=self.config.headless,
-                slow_mo=self.config.slow_mo
-            )
-            
-            self.page = self.browser.new_page()
+            # 每次重放使用独立的上下文，共享浏览器时互不影响
+            self.context = await self.browser.new_context()
+            if self.config.wait_strategy == "settle":
+                await self.context.add_init_script(SETTLE_INIT_SCRIPT)
+            self.page = await self.context.new_page()
             self.page.set_default_timeout(self.config.timeout)
+            self.navigator = Navigator(
+                self.page,
+                nav_wait_ms=self.config.nav_wait_ms,
+                spa_navigation=self.config.spa_navigation
+            )
             
             logger.info(f"浏览器启动成功: {self.config.browser_type}")
             
@@ -65,116 +142,312 @@ class ReplayEngine:
             logger.error(f"浏览器启动失败: {e}")
             raise
     
-    def close_browser(self):
+    async def close_browser(self):
         """关闭浏览器"""
         try:
             if self.page:
-                self.page.close()
-            if self.browser:
-                self.browser.close()
-            if self.playwright:
-                self.playwright.stop()
+                await self.page.close()
+            if self.context:
+                await self.context.close()
+            if self._owns_browser:
+                if self.browser:
+                    await self.browser.close()
+                if self.playwright:
+                    await self.playwright.stop()
+            if self._owns_cache and self.selector_cache:
+                self.selector_cache.save()
+            # 先停掉AI分析线程池（排队中的分析取消），再关闭响应缓存；
+            # 已在执行、被放弃的AI调用之后写缓存时会被忽略
+            if self.failure_analyzer:
+                self.failure_analyzer.shutdown()
+                self.failure_analyzer = None
+            self.ai_assistant.close()
             
             logger.info("浏览器已关闭")
             
         except Exception as e:
             logger.warning(f"关闭浏览器时出错: {e}")
     
-    def replay_from_file(self, file_path: str | Path, 
+    def _reset_session_state(self):
+        """清空上一次会话的结果和计数，同一个引擎可以连续重放多个文件"""
+        self.results = []
+        self.totals = {'steps': 0, 'successful': 0, 'failed': 0, 'healed': 0,
+                       'execution_time': 0.0, 'settle_time': 0.0}
+        self.history_steps = []
+        self.ai_analysis_stats = {}
+        self.ai_failures = []
+        self.healer = TrajectoryHealer()
+        self.healing = {}
+    
+    async def replay_from_file(self, file_path: str | Path, 
                         start_url: str = None) -> ReplaySession:
         """从文件重放学习轨迹"""
-        # 加载数据
-        records = self.data_loader.load_from_file(file_path)
+        self._reset_session_state()
         
-        # 验证数据
-        validation = self.data_loader.validate_records(records)
-        self._print_validation_summary(validation)
+        # 从指定步骤开始时，二进制轨迹可以直接跳过前面的记录
+        start = max(self.config.from_step, 1) - 1
+        self.step_offset = start
+        if start:
+            logger.info(f"从第 {start + 1} 步开始重放")
         
-        if validation['valid_records'] == 0:
-            raise ValueError("没有有效的记录可以重放")
+        if self.config.stream_records:
+            # 流式加载：边解析边重放，校验在流中顺带完成，结束后再输出；无效记录跳过，不在浏览器中执行。
+            # 导航前先取到第一条有效记录，没有有效记录时与列表加载一样直接报错
+            stats = RecordStats()
+            stream = self._normalize(self._apply_patch(
+                self.data_loader.iter_records(file_path, stats, start, skip_invalid=True)
+            ))
+            first = next(stream, None)
+            if first is None:
+                self._print_validation_summary(stats.validation_result())
+                raise ValueError("没有有效的记录可以重放")
+            first_record = first[1]
+            records: Iterable[Tuple[int, LearningRecord]] = itertools.chain([first], stream)
+            total = None
+        else:
+            # 加载数据
+            records = self.data_loader.load_from_file(file_path, start)
+            
+            # 验证数据
+            validation = self.data_loader.validate_records(records)
+            self._print_validation_summary(validation)
+            
+            if validation['valid_records'] == 0:
+                raise ValueError("没有有效的记录可以重放")
+            
+            records = list(self._normalize(self._apply_patch(records)))
+            first_record = records[0][1] if records else None
+            total = len(records)
         
         # 开始重放会话
         session_id = str(uuid.uuid4())[:8]
         self.current_session = ReplaySession(
             session_id=session_id,
             start_time=datetime.now(),
-            total_records=len(records),
+            total_records=total or 0,
             successful_records=0,
-            failed_records=0
+            failed_records=0,
+            source_file=str(file_path)
         )
         
-        # 导航到起始页面
-        if start_url:
-            self.page.goto(start_url)
-            logger.info(f"导航到起始页面: {start_url}")
-        elif records:
-            # 使用第一条记录的URL
-            first_url = records[0].url
-            self.page.goto(first_url)
-            logger.info(f"导航到页面: {first_url}")
+        if self.config.result_sink:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            self.result_sink = JsonlResultSink(
+                Path("data") / f"replay_results_{session_id}_{timestamp}.jsonl",
+                fsync_every=self.config.fsync_every
+            )
+            self.result_sink.open(self.current_session)
+        
+        try:
+            # 导航到起始页面
+            if start_url:
+                await self.page.goto(start_url)
+                logger.info(f"导航到起始页面: {start_url}")
+            elif first_record:
+                # 使用第一条记录的URL
+                first_url = first_record.url
+                await self.navigator.navigate(first_url, wait_inflight=False)
+                logger.info(f"导航到页面: {first_url}")
+            
+            # 执行重放
+            await self._execute_replay(records, total)
+        except BaseException:
+            if self.failure_analyzer:
+                self.failure_analyzer.shutdown()
+                self.failure_analyzer = None
+            # 中途失败时已写入的结果保留在JSONL中，没有摘要行
+            if self.result_sink:
+                self.result_sink.close()
+            raise
         
-        # 执行重放
-        self._execute_replay(records)
+        if total is None:
+            validation = stats.validation_result()
+            self.current_session.total_records = self.totals['steps']
+            self._print_validation_summary(validation)
         
         # 完成会话
         self.current_session.end_time = datetime.now()
         self.current_session.results = self.results
-        self.current_session.successful_records = len([r for r in self.results if r.success])
-        self.current_session.failed_records = len([r for r in self.results if not r.success])
+        self.current_session.successful_records = self.totals['successful']
+        self.current_session.failed_records = self.totals['failed']
+        
+        self._save_healed(file_path)
         
         # 生成摘要
         self._generate_session_summary()
         
+        if self.result_sink:
+            self.result_sink.close(self.current_session)
+        self._save_history()
+        
         return self.current_session
     
-    def _execute_replay(self, records: List[LearningRecord]):
-        """执行重放操作"""
+    def _save_history(self):
+        """把本次会话写入历史库；失败只记录警告，不影响重放结果"""
+        if not self.config.history:
+            return
+        try:
+            with HistoryStore(self.config.history_file) as store:
+                store.record_session(self.current_session, self.history_steps)
+        except Exception as e:
+            logger.warning(f"写入历史结果失败: {e}")
+    
+    def _apply_patch(self, records: Iterable[LearningRecord]) -> Iterable[LearningRecord]:
+        """按配置应用修复补丁"""
+        if not self.config.patch_file:
+            return records
+        fixes = load_patch(self.config.patch_file)
+        logger.info(f"应用修复补丁: {self.config.patch_file} ({len(fixes)} 个修复)")
+        return apply_patch(records, fixes)
+    
+    def _save_healed(self, file_path: str | Path):
+        """把验证通过的修复写入补丁文件和修复后的轨迹副本，原始文件不变"""
+        fixes = list(self.healer.fixes.values())
+        if not fixes:
+            return
+        self.healing = {
+            'fixes': len(fixes),
+            'local': sum(1 for fix in fixes if fix['source'] == "heal"),
+            'ai': sum(1 for fix in fixes if fix['source'] == "ai"),
+            'files': {}
+        }
+        if self.config.heal_output == "off":
+            return
+        try:
+            written = self.healer.write(file_path, self.current_session.session_id,
+                                        copy=self.config.heal_output == "copy")
+            self.healing['files'] = {kind: str(path) for kind, path in written.items()}
+        except Exception as e:
+            logger.warning(f"保存修复结果失败: {e}")
+    
+    def _normalize(self, records: Iterable[LearningRecord]) -> Iterator[Tuple[int, LearningRecord]]:
+        """按配置合并逐键输入记录，产出 (原始步骤号, 记录)；原始步骤号是记录在轨迹文件中的序号，
+        不随是否合并而变，历史结果按它汇总同一步骤"""
+        if not self.config.coalesce_input:
+            self.normalizer = None
+            for index, record in enumerate(records, start=self.step_offset + 1):
+                yield index, record
+            return
+        self.normalizer = RecordNormalizer()
+        for record in self.normalizer.normalize(records):
+            yield self.step_offset + self.normalizer.source_step, record
+    
+    async def _execute_replay(self, records: Iterable[Tuple[int, LearningRecord]], total: Optional[int] = None):
+        """执行重放操作；records是 (原始步骤号, 记录)，可以是列表，也可以是流式加载的迭代器（此时total未知）"""
         # 初始化执行器
         executor_config = {
             'replay_delay': self.config.replay_delay,
             'retry_count': self.config.retry_count,
             'wait_for_navigation': self.config.wait_for_navigation,
-            'selector_priority': self.config.selector_priority
+            'selector_priority': self.config.selector_priority,
+            'locate_mode': self.config.locate_mode,
+            'wait_strategy': self.config.wait_strategy,
+            'settle_quiet_ms': self.config.settle_quiet_ms,
+            'settle_timeout_ms': self.config.settle_timeout_ms,
+            'heal_threshold': self.config.heal_threshold if self.config.self_heal else None
         }
         
-        executor = ActionExecutor(self.page, executor_config)
+        executor = ActionExecutor(self.page, executor_config, selector_cache=self.selector_cache)
+        cache_stats_before = dict(self.selector_cache.stats) if self.selector_cache else {}
+        llm_cache = self.ai_assistant.cache
+        llm_cache_stats_before = dict(llm_cache.stats) if llm_cache else {}
+        
+        # AI分析在后台线程池中进行，失败步骤不阻塞后续重放；batch模式在会话结束时按页面分组批量分析
+        ai_usage_before = dict(self.ai_assistant.usage)
+        if self.ai_assistant.is_available():
+            analyzer_class = BatchFailureAnalyzer if self.config.ai_analysis_mode == "batch" else BackgroundFailureAnalyzer
+            self.failure_analyzer = analyzer_class(
+                self.ai_assistant,
+                workers=self.config.ai_workers,
+                max_pending=self.config.ai_max_pending,
+                on_complete=self._attach_analysis
+            )
         
         # 使用进度条显示执行进度
         with Progress(
             SpinnerColumn(),
             TextColumn("[progress.description]{task.description}"),
-            console=self.console
+            console=self.console,
+            disable=self.quiet
         ) as progress:
             
-            task = progress.add_task("执行重放操作...\r\n", total=len(records))
+            task = progress.add_task("执行重放操作...\r\n", total=total)
+            previous_url = None
             
-            for i, record in enumerate(records):
-                progress.update(task, description=f"执行操作 {i+1}/{len(records)}: {record.description}\r\n")
+            for i, (source_step, record) in enumerate(records):
+                step = i + 1 + self.step_offset
+                position = f"{step}/{total + self.step_offset}" if total else f"{step}"
+                progress.update(task, description=f"执行操作 {position}: {record.description}\r\n")
                 
-                # 检查是否需要导航
-                if i > 0 and record.url != records[i-1].url:
+                # 检查是否需要导航（页面已在目标URL时跳过重新加载）
+                if i > 0 and record.url != previous_url:
                     try:
-                        self.page.goto(record.url)
-                        logger.info(f"导航到新页面: {record.url}")
+                        await self.navigator.navigate(record.url)
                     except Exception as e:
                         logger.warning(f"页面导航失败: {e}")
                 
+                previous_url = record.url
+                
                 # 执行操作
-                result = self._execute_single_action(executor, record)
-                self.results.append(result)
+                result = await self._execute_single_action(executor, record)
+                # 失败时只抓取一次页面快照，AI修复和后台分析共用
+                page_info = None
+                heal_with_ai = not result.success and self._should_heal_with_ai(executor)
+                if not result.success and (self.failure_analyzer or heal_with_ai):
+                    page_info = await executor.get_page_info(record)
+                if heal_with_ai:
+                    result = await self._heal_with_ai(executor, result, page_info)
+                self._record_result(step, result, source_step)
                 
                 # 更新进度
                 progress.advance(task)
                 
-                # 如果操作失败且AI可用，尝试分析
-                if not result.success and self.ai_assistant.is_available():
-                    self._handle_failure_with_ai(executor, record, result)
+                # 如果操作失败且AI可用，把页面快照交给后台分析
+                if not result.success and self.failure_analyzer:
+                    self._submit_failure(step, result, page_info)
+        
+        if self.failure_analyzer:
+            stats = await self.failure_analyzer.drain(self.config.ai_drain_timeout)
+            # 本次会话实际发出的LLM请求数、token数和耗时，用于对比逐步分析与批量分析
+            usage = {key: value - ai_usage_before[key] for key, value in self.ai_assistant.usage.items()}
+            self.ai_analysis_stats = {'mode': self.config.ai_analysis_mode, **stats, **usage}
+            self.failure_analyzer = None
+        
+        # 本次会话的选择器缓存命中情况
+        if self.selector_cache:
+            self.cache_stats = {
+                key: value - cache_stats_before.get(key, 0)
+                for key, value in self.selector_cache.stats.items()
+            }
+        if llm_cache:
+            self.llm_cache_stats = {
+                key: value - llm_cache_stats_before.get(key, 0)
+                for key, value in llm_cache.stats.items()
+            }
     
-    def _execute_single_action(self, executor: ActionExecutor, 
+    def _record_result(self, step: int, result: ReplayResult, source_step: int):
+        """累计一步的结果：更新汇总、写入JSONL，按保留策略决定是否留在内存中"""
+        self.totals['steps'] += 1
+        self.totals['successful' if result.success else 'failed'] += 1
+        self.totals['execution_time'] += result.execution_time
+        self.totals['settle_time'] += result.settle_time or 0
+        if result.healed_selector:
+            self.totals['healed'] += 1
+            if result.success:
+                self.healer.add(step, result, source=result.selector_used, confidence=result.heal_confidence)
+        
+        if self.result_sink:
+            self.result_sink.write_result(step, result)
+        if self.config.history:
+            self.history_steps.append(HistoryStore.step_row(step, result, source_step))
+        if self.config.result_retention != "aggregate":
+            self.results.append(result)
+    
+    async def _execute_single_action(self, executor: ActionExecutor, 
                               record: LearningRecord) -> ReplayResult:
         """执行单个操作"""
         try:
-            result = executor.execute_action(record)
+            result = await executor.execute_action(record)
             
             if result.success:
                 logger.info(f"✅ 操作成功: {record.description}")
@@ -193,53 +466,63 @@ class ReplayEngine:
                 retry_count=0
             )
     
-    def _handle_failure_with_ai(self, executor: ActionExecutor, 
-                               record: LearningRecord, result: ReplayResult):
-        """使用AI处理失败情况"""
+    def _should_heal_with_ai(self, executor: ActionExecutor) -> bool:
+        """是否请AI修复：本地修复已经执行过得分最高的元素但操作失败时，AI建议也难以奏效，跳过"""
+        if not (self.config.ai_heal and self.ai_assistant.is_available()):
+            return False
+        heal = executor.locator.last_heal
+        return not (heal and heal.get('applied'))
+    
+    async def _heal_with_ai(self, executor: ActionExecutor, result: ReplayResult,
+                            page_info: Dict[str, Any]) -> ReplayResult:
+        """向AI请求替代选择器并逐个实际执行，操作成功的选择器才算修复；
+        AI请求最多等待ai_heal_timeout秒，超时视为没有建议，重放继续"""
+        record = result.record
         try:
-            # 获取页面信息
-            page_info = executor.get_page_info()
-            
-            # AI分析失败原因
-            analysis = self.ai_assistant.analyze_failure(
-                record, result.error_message, page_info
+            suggestions = await asyncio.wait_for(
+                asyncio.to_thread(
+                    self.ai_assistant.suggest_alternative_selectors,
+                    record, page_info.get('content', '')
+                ),
+                timeout=self.config.ai_heal_timeout
             )
-            
-            logger.info(f"AI分析结果: {analysis['analysis']}")
-            
-            # 如果AI建议重试，尝试使用替代选择器
-            if analysis.get('suggestions'):
-                self._try_alternative_selectors(executor, record, analysis)
-                
+        except asyncio.TimeoutError:
+            logger.warning(f"AI替代选择器请求超过 {self.config.ai_heal_timeout:.0f} 秒，跳过修复: {record.description}")
+            return result
         except Exception as e:
-            logger.warning(f"AI处理失败: {e}")
+            logger.warning(f"获取AI替代选择器失败: {e}")
+            return result
+        
+        for suggestion in suggestions[:self.config.ai_heal_attempts]:
+            healed = await executor.execute_with_selector(record, suggestion['selector'], "ai")
+            if healed.success:
+                logger.info(f"AI修复成功: {record.description} -> {suggestion['selector']}")
+                return healed.model_copy(update={
+                    'execution_time': result.execution_time + healed.execution_time,
+                    'retry_count': result.retry_count,
+                    'heal_confidence': result.heal_confidence
+                })
+            logger.debug(f"AI建议的选择器未通过验证: {suggestion['selector']} - {healed.error_message}")
+        return result
     
-    def _try_alternative_selectors(self, executor: ActionExecutor, 
-                                 record: LearningRecord, analysis: Dict[str, Any]):
-        """尝试使用替代选择器"""
+    def _submit_failure(self, step: int, result: ReplayResult, page_info: Dict[str, Any]):
+        """把失败时的页面快照提交后台分析"""
         try:
-            # 获取页面内容
-            page_content = self.page.content()
-            
-            # AI建议替代选择器
-            suggestions = self.ai_assistant.suggest_alternative_selectors(
-                record, page_content
-            )
-            
-            if suggestions:
-                logger.info(f"尝试 {len(suggestions)} 个替代选择器")
-                
-                for suggestion in suggestions:
-                    try:
-                        # 这里需要修改ElementLocator来支持自定义选择器
-                        # 暂时跳过，可以在后续版本中实现
-                        logger.debug(f"建议选择器: {suggestion}")
-                    except Exception as e:
-                        logger.debug(f"替代选择器失败: {e}")
-                        continue
-                        
+            self.failure_analyzer.submit(step, result, page_info)
         except Exception as e:
-            logger.warning(f"尝试替代选择器失败: {e}")
+            logger.warning(f"提交AI分析失败: {e}")
+    
+    def _attach_analysis(self, step: int, result: ReplayResult, analysis: Dict[str, Any]):
+        """后台分析完成：附加到对应的步骤结果，并写入JSONL和会话摘要"""
+        result.ai_analysis = analysis
+        self.ai_failures.append({
+            'step': step,
+            'description': result.record.description,
+            'suggestions': analysis.get('suggestions', []),
+            'alternative_selectors': analysis.get('alternative_selectors', [])
+        })
+        if self.result_sink:
+            self.result_sink.write_analysis(step, analysis)
     
     def _print_validation_summary(self, validation: Dict[str, Any]):
         """打印验证摘要"""
@@ -272,7 +555,18 @@ class ReplayEngine:
             'session_id': self.current_session.session_id,
             'duration_seconds': duration,
             'success_rate': self.current_session.successful_records / self.current_session.total_records,
-            'average_execution_time': sum(r.execution_time for r in self.results) / len(self.results) if self.results else 0,
+            'average_execution_time': self.totals['execution_time'] / self.totals['steps'] if self.totals['steps'] else 0,
+            'from_step': self.step_offset + 1,
+            'normalization': dict(self.normalizer.stats) if self.normalizer else {},
+            'wait_strategy': self.config.wait_strategy,
+            'total_settle_time': self.totals['settle_time'],
+            'navigations': dict(self.navigator.stats) if self.navigator else {},
+            'selector_cache': self.cache_stats,
+            'healed_steps': self.totals['healed'],
+            'healing': self.healing,
+            'llm_cache': self.llm_cache_stats,
+            'ai_analysis': self.ai_analysis_stats,
+            'ai_failures': sorted(self.ai_failures, key=lambda failure: failure['step']),
             'browser_type': self.config.browser_type,
             'headless': self.config.headless
         }
@@ -293,10 +587,36 @@ class ReplayEngine:
         
         table.add_row("会话ID", self.current_session.session_id)
         table.add_row("总操作数", str(self.current_session.total_records))
+        if self.normalizer and self.normalizer.eliminated:
+            stats = self.normalizer.stats
+            table.add_row("合并步骤", f"{stats['original_steps']} -> {stats['normalized_steps']} "
+                                      f"(减少 {self.normalizer.eliminated} 步)")
         table.add_row("成功操作", str(self.current_session.successful_records))
         table.add_row("失败操作", str(self.current_session.failed_records))
         table.add_row("成功率", f"{self.current_session.successful_records / self.current_session.total_records * 100:.1f}%")
         table.add_row("执行时间", f"{self.current_session.summary['duration_seconds']:.1f}秒")
+        if self.config.wait_strategy == "settle":
+            table.add_row("等待静止", f"{self.current_session.summary['total_settle_time']:.1f}秒")
+        if self.totals['healed']:
+            table.add_row("修复步骤", f"{self.totals['healed']} 步")
+        if self.healing.get('files'):
+            table.add_row("修复结果", ", ".join(self.healing['files'].values()))
+        if self.ai_analysis_stats.get('submitted'):
+            stats = self.ai_analysis_stats
+            table.add_row("AI分析", f"完成 {stats['completed']}/{stats['submitted']} "
+                                   f"(收尾等待 {stats['drain_time']:.1f}秒)")
+            table.add_row("AI请求", f"{stats['requests']} 次, {stats['prompt_tokens'] + stats['completion_tokens']} tokens, "
+                                   f"{stats['latency']:.1f}秒")
+            if stats['mode'] == "batch" and stats['per_step_requests']:
+                table.add_row("逐步分析(估算)", f"{stats['per_step_requests']} 次, "
+                                          f"{stats['per_step_prompt_tokens']} 提示tokens "
+                                          f"(批量 {stats['batched_prompt_tokens']})")
+            if stats['snapshot_bytes']:
+                table.add_row("页面快照", f"{stats['snapshot_bytes'] / 1024:.1f}KB "
+                                        f"(整页HTML {stats['page_chars'] / 1024:.1f}KB, "
+                                        f"约 {stats['context_tokens']} tokens)")
+        if self.llm_cache_stats.get('hits') or self.llm_cache_stats.get('misses'):
+            table.add_row("AI缓存", f"命中 {self.llm_cache_stats['hits']} / 未命中 {self.llm_cache_stats['misses']}")
         table.add_row("浏览器", self.config.browser_type)
         
         self.console.print(table)
@@ -313,6 +633,12 @@ class ReplayEngine:
         output_path = Path("data") / output_file
         output_path.parent.mkdir(exist_ok=True)
         
+        # 结果已实时写入JSONL时从中生成，内存中可能只保留了汇总
+        if self.result_sink:
+            JsonlResultSink.to_json(self.result_sink.path, output_path)
+            logger.info(f"结果已保存到: {output_path}")
+            return str(output_path)
+        
         # 转换为可序列化的格式
         session_data = self.current_session.dict()
         session_data['start_time'] = session_data['start_time'].isoformat()
@@ -336,7 +662,7 @@ class ReplayEngine:
         detailed_results = []
         for i, result in enumerate(self.results):
             detailed_result = {
-                'index': i + 1,
+                'index': i + 1 + self.step_offset,
                 'type': result.record.type,
                 'description': result.record.description,
                 'url': result.record.url,
@@ -349,4 +675,52 @@ class ReplayEngine:
             }
             detailed_results.append(detailed_result)
         
-        return detailed_results 
\ No newline at end of file
+        return detailed_results 
+
+class ReplayEngine:
+    """重放引擎 - AsyncReplayEngine的同步包装，保持原有脚本可用"""
+    
+    def __init__(self, config: TestConfig = None, quiet: bool = False):
+        self._engine = AsyncReplayEngine(config, quiet=quiet)
+        self._loop = asyncio.new_event_loop()
+    
+    def __getattr__(self, name: str):
+        # 其余属性（config、ai_assistant、current_session、results等）直接取自异步引擎
+        return getattr(self._engine, name)
+    
+    def __enter__(self):
+        """上下文管理器入口"""
+        self.start_browser()
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """上下文管理器出口"""
+        self.close_browser()
+    
+    def _run(self, coro):
+        """在引擎私有的事件循环中执行协程"""
+        return self._loop.run_until_complete(coro)
+    
+    def start_browser(self):
+        """启动浏览器"""
+        self._run(self._engine.start_browser())
+    
+    def close_browser(self):
+        """关闭浏览器"""
+        try:
+            self._run(self._engine.close_browser())
+        finally:
+            self._loop.close()
+    
+    def replay_from_file(self, file_path: str | Path, 
+                        start_url: str = None) -> ReplaySession:
+        """从文件重放学习轨迹"""
+        return self._run(self._engine.replay_from_file(file_path, start_url))
+    
+    def save_results(self, output_file: str = None) -> str:
+        """保存结果到文件"""
+        return self._engine.save_results(output_file)
+    
+    def get_detailed_results(self) -> List[Dict[str, Any]]:
+        """获取详细结果"""
+        return self._engine.get_detailed_results()
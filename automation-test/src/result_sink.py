@@ -0,0 +1,131 @@
+"""
+结果写入器 - 每完成一步就向JSONL文件追加一行，进程崩溃也只丢失未落盘的几步
+"""
+import json
+import os
+from pathlib import Path
+from typing import Iterator, Optional, Dict, Any, TextIO
+from loguru import logger
+
+from .models import ReplayResult, ReplaySession
+
+class JsonlResultSink:
+    """JSONL结果写入器
+
+    文件格式（每行一个紧凑JSON对象）:
+        {"kind": "session", ...}   会话开始时写入，包含会话ID、开始时间和轨迹文件
+        {"kind": "result", ...}    每完成一步写入一行ReplayResult，带原始步骤号index
+        {"kind": "analysis", ...}  后台AI分析完成时写入，index对应失败的步骤
+        {"kind": "summary", ...}   会话正常结束时写入，包含计数和摘要
+    没有summary行说明会话中途崩溃，已写入的结果仍然可以读取
+    """
+
+    def __init__(self, path: str | Path, fsync_every: int = 20):
+        self.path = Path(path)
+        # 每写入多少行调用一次fsync；每行都会flush到操作系统，fsync保证断电时也不丢失
+        self.fsync_every = max(fsync_every, 1)
+        self.lines = 0
+        self._unsynced = 0
+        self._file: Optional[TextIO] = None
+
+    def open(self, session: ReplaySession):
+        """创建文件并写入会话开始行"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, 'a', encoding='utf-8')
+        header = session.model_dump(mode='json', exclude={'results', 'summary', 'end_time'})
+        self._write({'kind': 'session', **header}, sync=True)
+        logger.info(f"结果实时写入: {self.path}")
+
+    def write_result(self, index: int, result: ReplayResult):
+        """追加一步的结果"""
+        self._write({'kind': 'result', 'index': index, **result.model_dump(mode='json')})
+
+    def write_analysis(self, index: int, analysis: Dict[str, Any]):
+        """追加一步的AI分析结果"""
+        self._write({'kind': 'analysis', 'index': index, 'ai_analysis': analysis})
+
+    def close(self, session: ReplaySession = None):
+        """写入摘要行（会话正常结束时）并关闭文件"""
+        if self._file is None:
+            return
+        try:
+            if session is not None:
+                summary = session.model_dump(mode='json', exclude={'results'})
+                self._write({'kind': 'summary', **summary}, sync=True)
+            else:
+                self._sync()
+        finally:
+            self._file.close()
+            self._file = None
+
+    def _write(self, data: Dict[str, Any], sync: bool = False):
+        """写入一行"""
+        self._file.write(json.dumps(data, ensure_ascii=False, separators=(',', ':')) + '\n')
+        self._file.flush()
+        self.lines += 1
+        self._unsynced += 1
+        if sync or self._unsynced >= self.fsync_every:
+            self._sync()
+
+    def _sync(self):
+        """落盘"""
+        if self._unsynced:
+            os.fsync(self._file.fileno())
+            self._unsynced = 0
+
+    @staticmethod
+    def iter_lines(path: str | Path) -> Iterator[Dict[str, Any]]:
+        """逐行读取JSONL结果，跳过崩溃时写了一半的最后一行"""
+        with open(path, 'r', encoding='utf-8') as f:
+            for line_number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning(f"跳过不完整的结果行: {path}:{line_number}")
+
+    @classmethod
+    def to_json(cls, path: str | Path, output_path: str | Path) -> Path:
+        """把JSONL结果转换为与save_results相同结构的缩进JSON"""
+        session: Dict[str, Any] = {}
+        results = []
+        by_index: Dict[int, Dict[str, Any]] = {}
+        summary = None
+
+        for line in cls.iter_lines(path):
+            kind = line.pop('kind', None)
+            if kind == 'session':
+                session = line
+            elif kind == 'result':
+                by_index[line.pop('index', None)] = line
+                results.append(line)
+            elif kind == 'analysis':
+                # 分析在步骤之后异步完成，合并回对应的结果
+                result = by_index.get(line['index'])
+                if result is not None:
+                    result['ai_analysis'] = line['ai_analysis']
+            elif kind == 'summary':
+                summary = line
+
+        if summary is not None:
+            session = summary
+        else:
+            # 会话没有正常结束，根据已写入的结果补全计数
+            successful = sum(1 for result in results if result['success'])
+            session.update({
+                'end_time': None,
+                'total_records': len(results),
+                'successful_records': successful,
+                'failed_records': len(results) - successful,
+                'summary': {'incomplete': True}
+            })
+        session['results'] = results
+        # 字段顺序与ReplaySession一致
+        session = {name: session.get(name) for name in ReplaySession.model_fields}
+
+        output_path = Path(output_path)
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(session, f, ensure_ascii=False, indent=2)
+        return output_path
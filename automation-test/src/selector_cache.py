@@ -0,0 +1,161 @@
+"""
+选择器缓存 - 跨运行记住每个元素上次成功的定位策略和选择器
+"""
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Dict, Any
+from loguru import logger
+
+from .models import ElementInfo, LearningRecord
+from .url_utils import url_pattern
+
+DEFAULT_CACHE_FILE = Path("data") / "selector_cache.json"
+
+def element_fingerprint(element: ElementInfo) -> str:
+    """根据录制时的元素信息生成指纹"""
+    parts = [
+        element.tagName or '',
+        element.id or '',
+        element.className or '',
+        (element.textContent or '').strip()[:100],
+        element.placeholder or '',
+        element.type or '',
+        element.xpath or '',
+        element.selector or ''
+    ]
+    return hashlib.sha1("\x1f".join(parts).encode('utf-8')).hexdigest()[:16]
+
+class SelectorCache:
+    """选择器缓存 - 以 (页面URL模式, 元素指纹) 为键，LRU + TTL淘汰，持久化为JSON文件"""
+
+    def __init__(self, path: str | Path = DEFAULT_CACHE_FILE, max_entries: int = 5000,
+                 ttl_seconds: float = 7 * 24 * 3600):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+        # 按最近使用顺序排列，最久未用的在最前面
+        self.entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.stats = {'hits': 0, 'misses': 0, 'stores': 0, 'invalidations': 0}
+        self._dirty = False
+        # 本进程中被删除的键，保存时不从磁盘合并回来
+        self._removed: set = set()
+
+        self.load()
+
+    @staticmethod
+    def make_key(record: LearningRecord) -> str:
+        """生成缓存键"""
+        return f"{url_pattern(record.url)}|{element_fingerprint(record.element)}"
+
+    def load(self):
+        """从磁盘加载缓存"""
+        self.entries = OrderedDict(
+            sorted(self._read_file().items(), key=lambda item: item[1].get('last_used', 0))
+        )
+        self._evict()
+
+    def _read_file(self) -> Dict[str, Dict[str, Any]]:
+        """读取缓存文件"""
+        if not self.path.exists():
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f).get('entries', {})
+        except Exception as e:
+            logger.warning(f"读取选择器缓存失败，将重新建立: {e}")
+            return {}
+
+    def save(self):
+        """写回磁盘；与其他进程写入的条目合并，保留较新的一份"""
+        if not self._dirty:
+            return
+
+        merged = self._read_file()
+        for key, entry in self.entries.items():
+            existing = merged.get(key)
+            if not existing or entry.get('last_used', 0) >= existing.get('last_used', 0):
+                merged[key] = entry
+        for key in self._removed:
+            if key in merged and key not in self.entries:
+                del merged[key]
+
+        self.entries = OrderedDict(sorted(merged.items(), key=lambda item: item[1].get('last_used', 0)))
+        self._evict()
+
+        self.path.parent.mkdir(exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': 1, 'entries': self.entries}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+        self._dirty = False
+        self._removed.clear()
+        logger.debug(f"选择器缓存已保存: {self.path} ({len(self.entries)} 条)")
+
+    def lookup(self, record: LearningRecord) -> Optional[Dict[str, Any]]:
+        """查找上次成功的策略和选择器"""
+        key = self.make_key(record)
+        entry = self.entries.get(key)
+        if not entry:
+            return None
+
+        if time.time() - entry.get('last_verified', 0) > self.ttl_seconds:
+            self._remove(key)
+            return None
+
+        entry['last_used'] = time.time()
+        self.entries.move_to_end(key)
+        self._dirty = True
+        return entry
+
+    def record_success(self, record: LearningRecord, strategy: str, selector: str, cached: bool):
+        """记录定位成功；cached表示命中的正是缓存中的选择器"""
+        key = self.make_key(record)
+        now = time.time()
+        entry = self.entries.get(key)
+
+        if cached and entry:
+            self.stats['hits'] += 1
+            entry['hits'] = entry.get('hits', 0) + 1
+        else:
+            self.stats['misses'] += 1
+            self.stats['stores'] += 1
+            previous = entry or {}
+            entry = {
+                'strategy': strategy,
+                'selector': selector,
+                'hits': 0,
+                'misses': previous.get('misses', 0) + (1 if previous else 0)
+            }
+            self.entries[key] = entry
+
+        entry['last_verified'] = now
+        entry['last_used'] = now
+        self.entries.move_to_end(key)
+        self._removed.discard(key)
+        self._dirty = True
+        self._evict()
+
+    def invalidate(self, record: LearningRecord):
+        """所有策略都失败时移除缓存条目"""
+        key = self.make_key(record)
+        self.stats['misses'] += 1
+        if key in self.entries:
+            self.stats['invalidations'] += 1
+            self._remove(key)
+
+    def _remove(self, key: str):
+        """删除条目"""
+        self.entries.pop(key, None)
+        self._removed.add(key)
+        self._dirty = True
+
+    def _evict(self):
+        """按LRU淘汰超出容量的条目"""
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
@@ -0,0 +1,74 @@
+"""
+页面稳定检测 - 等待页面真正静止（无DOM变化、无进行中的请求、无待完成的导航）后再继续
+"""
+import time
+from playwright.async_api import Page
+from loguru import logger
+
+# 注入到每个页面的跟踪脚本：记录最后一次DOM变化时间和进行中的fetch/XHR数量
+SETTLE_INIT_SCRIPT = """
+(() => {
+    if (window.__replaySettle) return;
+    const state = window.__replaySettle = {lastMutation: performance.now(), pending: 0};
+    const touch = () => { state.lastMutation = performance.now(); };
+    const start = () => { state.pending++; touch(); };
+    const done = () => { state.pending = Math.max(0, state.pending - 1); touch(); };
+
+    const observe = () => new MutationObserver(touch).observe(document, {
+        subtree: true, childList: true, attributes: true, characterData: true
+    });
+    if (document.documentElement) observe();
+    else document.addEventListener('DOMContentLoaded', observe, {once: true});
+
+    const originalFetch = window.fetch;
+    if (originalFetch) {
+        window.fetch = function (...args) {
+            start();
+            return originalFetch.apply(this, args).finally(done);
+        };
+    }
+
+    const originalSend = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function (...args) {
+        start();
+        this.addEventListener('loadend', done, {once: true});
+        return originalSend.apply(this, args);
+    };
+})();
+"""
+
+# 页面静止的判定条件
+_SETTLED_PREDICATE = """
+(quietMs) => {
+    if (document.readyState !== 'complete') return false;
+    const state = window.__replaySettle;
+    if (!state) return true;
+    return state.pending === 0 && performance.now() - state.lastMutation >= quietMs;
+}
+"""
+
+async def wait_for_settle(page: Page, quiet_ms: int = 300, timeout_ms: int = 5000) -> float:
+    """等待页面静止，返回实际等待的秒数；超过上限时不报错，直接返回"""
+    start_time = time.time()
+    deadline = start_time + timeout_ms / 1000
+
+    while True:
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            logger.debug(f"页面在 {timeout_ms}ms 内未静止，继续执行")
+            break
+
+        try:
+            await page.wait_for_function(
+                _SETTLED_PREDICATE, arg=quiet_ms,
+                timeout=remaining * 1000, polling=50
+            )
+            break
+        except Exception as e:
+            # 等待期间发生导航会销毁执行上下文，在新页面上继续等待
+            if "context was destroyed" in str(e) or "navigation" in str(e).lower():
+                continue
+            logger.debug(f"页面在 {timeout_ms}ms 内未静止，继续执行")
+            break
+
+    return time.time() - start_time
@@ -0,0 +1,207 @@
+"""
+分片套件运行器 - 把轨迹文件分配到多个工作进程并行重放，再合并结果
+"""
+import heapq
+import json
+import multiprocessing
+import queue
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+from loguru import logger
+
+from .models import ReplaySession, SuiteReport, TestConfig
+from .suite_runner import SuiteRunner
+from .data_loader import LearningDataLoader
+from .trajectory_index import INDEX_FILE_NAME, TrajectoryIndex
+
+def load_historical_durations(results_dir: str | Path, max_files: int = 5) -> Dict[str, float]:
+    """从最近的套件结果文件中读取每个轨迹的历史耗时"""
+    results_dir = Path(results_dir)
+    result_files = sorted(
+        results_dir.glob("suite_results_*.json"),
+        key=lambda x: x.stat().st_mtime, reverse=True
+    )[:max_files]
+
+    durations: Dict[str, float] = {}
+    # 从旧到新读取，新结果覆盖旧结果
+    for result_file in reversed(result_files):
+        try:
+            with open(result_file, 'r', encoding='utf-8') as f:
+                summary = json.load(f).get('summary', {})
+            durations.update(summary.get('file_durations', {}))
+        except Exception as e:
+            logger.debug(f"读取历史结果失败 {result_file}: {e}")
+
+    return durations
+
+def count_records(file_path: str | Path) -> int:
+    """统计轨迹文件的记录数，用作没有历史耗时时的分片权重
+
+    文件所在目录已有轨迹索引时读取索引（文件未变化时不重新解析），否则直接流式计数；
+    不在轨迹目录中创建索引文件
+    """
+    file_path = Path(file_path)
+    try:
+        if (file_path.parent / INDEX_FILE_NAME).exists():
+            with TrajectoryIndex(file_path.parent) as index:
+                entry = index.entry(file_path)
+            if not entry or entry['error']:
+                return 1
+            return max(entry['record_count'], 1)
+        return max(sum(1 for _ in LearningDataLoader.iter_compact_records(file_path)), 1)
+    except Exception:
+        return 1
+
+def plan_shards(files: List[Path], workers: int,
+                durations: Dict[str, float] = None) -> List[List[Path]]:
+    """按权重把文件分配到各个分片（最长处理时间优先的贪心算法）"""
+    durations = durations or {}
+    workers = max(1, min(workers, len(files)))
+
+    # 有历史耗时的文件用耗时作权重；其余文件按记录数折算为耗时，
+    # 折算比例来自有历史耗时的文件，只在两类文件都存在时才需要统计它们的记录数
+    known = [f for f in files if str(f) in durations]
+    unknown = [f for f in files if str(f) not in durations]
+    counts = {f: count_records(f) for f in (files if known and unknown else unknown)}
+    seconds_per_record = 1.0
+    if known and unknown:
+        seconds_per_record = sum(durations[str(f)] for f in known) / max(sum(counts[f] for f in known), 1)
+
+    weights = {
+        f: durations[str(f)] if str(f) in durations else counts[f] * seconds_per_record
+        for f in files
+    }
+
+    shards: List[List[Path]] = [[] for _ in range(workers)]
+    heap = [(0.0, i) for i in range(workers)]
+    for file_path in sorted(files, key=lambda f: weights[f], reverse=True):
+        load, index = heapq.heappop(heap)
+        shards[index].append(file_path)
+        heapq.heappush(heap, (load + weights[file_path], index))
+
+    return [shard for shard in shards if shard]
+
+def _shard_worker(shard_id: int, files: List[str], config_data: Dict[str, Any],
+                  concurrency: int, start_url: Optional[str],
+                  result_queue: "multiprocessing.Queue"):
+    """工作进程入口 - 拥有独立的Playwright实例，完成一个文件就回传一个会话"""
+    config = TestConfig(**config_data)
+
+    def send_session(session: ReplaySession):
+        result_queue.put(('session', shard_id, session.model_dump_json()))
+
+    def send_error(file_path: str, error: str):
+        result_queue.put(('error', shard_id, json.dumps([file_path, error], ensure_ascii=False)))
+
+    failure = None
+    try:
+        with SuiteRunner(config, concurrency=concurrency, quiet=True,
+                         on_session=send_session, on_error=send_error) as runner:
+            runner.run(files, start_url)
+    except Exception as e:
+        logger.error(f"分片 {shard_id} 运行失败: {e}")
+        failure = f"分片运行失败: {e}"
+    finally:
+        # done消息携带失败原因，父进程据此标记未完成的文件
+        result_queue.put(('done', shard_id, failure))
+
+class ShardedSuiteRunner(SuiteRunner):
+    """分片套件运行器 - 每个工作进程运行一个SuiteRunner，父进程只负责合并结果"""
+
+    def __init__(self, config: TestConfig = None, workers: int = 2, concurrency: int = 1,
+                 durations: Dict[str, float] = None):
+        super().__init__(config, concurrency=concurrency)
+        self.workers = max(1, workers)
+        self.durations = durations or {}
+        self.shards: List[List[Path]] = []
+
+    def _init_runtime(self):
+        """父进程不重放，事件循环和选择器缓存由各工作进程自行创建"""
+        pass
+
+    def start_browser(self):
+        """父进程不启动浏览器，由各工作进程自行启动"""
+        pass
+
+    def close_browser(self):
+        """父进程没有浏览器需要关闭"""
+        pass
+
+    def run(self, files: List[str | Path], start_url: str = None) -> SuiteReport:
+        """分片并行重放多个轨迹文件"""
+        files = [Path(f) for f in files]
+        self.report = SuiteReport(
+            suite_id=str(uuid.uuid4())[:8],
+            start_time=datetime.now(),
+            total_files=len(files)
+        )
+
+        self.shards = plan_shards(files, self.workers, self.durations)
+        logger.info(f"共 {len(files)} 个文件分配到 {len(self.shards)} 个工作进程")
+
+        # spawn方式启动，避免fork后继承父进程中的事件循环和线程
+        mp_context = multiprocessing.get_context("spawn")
+        result_queue = mp_context.Queue()
+        config_data = self.config.model_dump()
+
+        processes = {}
+        outstanding: Dict[int, set] = {}
+        for shard_id, shard in enumerate(self.shards):
+            process = mp_context.Process(
+                target=_shard_worker,
+                args=(shard_id, [str(f) for f in shard], config_data,
+                      self.concurrency, start_url, result_queue),
+                name=f"suite-shard-{shard_id}"
+            )
+            process.start()
+            processes[shard_id] = process
+            outstanding[shard_id] = {str(f) for f in shard}
+
+        running = set(processes)
+        exited = set()
+        while running:
+            try:
+                kind, shard_id, payload = result_queue.get(timeout=1.0)
+            except queue.Empty:
+                # 工作进程异常退出时不会发送done消息，需要主动检测；
+                # 连续两次轮询都已退出才判定，保证管道中残留的消息已被读完
+                for shard_id in list(running):
+                    if processes[shard_id].is_alive():
+                        continue
+                    if shard_id in exited:
+                        self._finish_shard(shard_id, outstanding, running,
+                                           f"工作进程异常退出 (exitcode={processes[shard_id].exitcode})")
+                    exited.add(shard_id)
+                continue
+
+            if kind == 'session':
+                session = ReplaySession.model_validate_json(payload)
+                outstanding[shard_id].discard(session.source_file)
+                self._record_session(session)
+            elif kind == 'error':
+                file_path, error = json.loads(payload)
+                outstanding[shard_id].discard(file_path)
+                self._record_error(Path(file_path), error)
+            elif kind == 'done':
+                self._finish_shard(shard_id, outstanding, running, payload or "工作进程未返回结果")
+
+        for process in processes.values():
+            process.join()
+
+        self.report.end_time = datetime.now()
+        order = {str(f): i for i, f in enumerate(files)}
+        self.report.sessions.sort(key=lambda s: order.get(s.source_file, len(order)))
+        self._generate_suite_summary()
+        self.report.summary['workers'] = len(self.shards)
+
+        return self.report
+
+    def _finish_shard(self, shard_id: int, outstanding: Dict[int, set],
+                      running: set, reason: str):
+        """结束一个分片，未返回结果的文件记为错误"""
+        running.discard(shard_id)
+        for file_path in sorted(outstanding[shard_id]):
+            self._record_error(Path(file_path), reason)
+        outstanding[shard_id].clear()
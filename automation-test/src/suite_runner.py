@@ -0,0 +1,228 @@
+"""
+套件运行器 - 在同一个浏览器中并发重放多个学习轨迹文件
+"""
+import asyncio
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, List, Dict, Any, Optional
+from playwright.async_api import async_playwright, Browser
+from loguru import logger
+from rich.console import Console
+from rich.table import Table
+
+from .models import ReplaySession, SuiteReport, TestConfig
+from .replay_engine import AsyncReplayEngine, create_selector_cache
+from .browser_server import connect_or_launch
+from .data_loader import LearningDataLoader
+
+class SuiteRunner:
+    """套件运行器 - 浏览器只启动一次，每个轨迹使用独立的BrowserContext"""
+
+    def __init__(self, config: TestConfig = None, concurrency: int = 1, quiet: bool = False,
+                 on_session: Callable[[ReplaySession], None] = None,
+                 on_error: Callable[[str, str], None] = None):
+        self.config = config or TestConfig()
+        self.concurrency = max(1, concurrency)
+        self.console = Console(quiet=quiet)
+        
+        # 每个文件完成时的回调，分片运行时用于把结果实时传回父进程
+        self.on_session = on_session
+        self.on_error = on_error
+
+        self.playwright = None
+        self.browser: Optional[Browser] = None
+
+        self.report: Optional[SuiteReport] = None
+        self._init_runtime()
+
+    def _init_runtime(self):
+        """创建在本进程中重放所需的事件循环和选择器缓存"""
+        self._loop = asyncio.new_event_loop()
+        
+        # 所有轨迹共用一个选择器缓存，结束时统一保存
+        self.selector_cache = create_selector_cache(self.config) if self.config.selector_cache else None
+
+    def __enter__(self):
+        """上下文管理器入口"""
+        self.start_browser()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """上下文管理器出口"""
+        self.close_browser()
+
+    @staticmethod
+    def discover_files(suite_dir: str | Path) -> List[Path]:
+        """扫描目录下的学习轨迹文件"""
+        return LearningDataLoader.discover_trajectory_files(suite_dir)
+
+    def start_browser(self):
+        """启动共享浏览器"""
+        self._loop.run_until_complete(self.start_browser_async())
+
+    def close_browser(self):
+        """关闭共享浏览器"""
+        try:
+            self._loop.run_until_complete(self.close_browser_async())
+        finally:
+            self._loop.close()
+
+    def run(self, files: List[str | Path], start_url: str = None) -> SuiteReport:
+        """并发重放多个轨迹文件"""
+        return self._loop.run_until_complete(self.run_async(files, start_url))
+
+    async def start_browser_async(self):
+        """启动共享浏览器（异步）"""
+        self.playwright = await async_playwright().start()
+        self.browser, _ = await connect_or_launch(self.playwright, self.config)
+        logger.info(f"共享浏览器启动成功: {self.config.browser_type} (并发数: {self.concurrency})")
+
+    async def close_browser_async(self):
+        """关闭共享浏览器（异步）"""
+        try:
+            if self.browser:
+                await self.browser.close()
+            if self.playwright:
+                await self.playwright.stop()
+            if self.selector_cache:
+                self.selector_cache.save()
+            logger.info("共享浏览器已关闭")
+        except Exception as e:
+            logger.warning(f"关闭共享浏览器时出错: {e}")
+
+    async def run_async(self, files: List[str | Path], start_url: str = None) -> SuiteReport:
+        """并发重放多个轨迹文件（异步）"""
+        if not self.browser:
+            raise RuntimeError("浏览器尚未启动")
+
+        self.report = SuiteReport(
+            suite_id=str(uuid.uuid4())[:8],
+            start_time=datetime.now(),
+            total_files=len(files)
+        )
+
+        # 同一个事件循环驱动所有页面，信号量限制同时打开的上下文数量
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def replay_with_limit(file_path: Path):
+            async with semaphore:
+                session = await self._replay_file(file_path, start_url)
+                if session:
+                    self._record_session(session)
+
+        await asyncio.gather(*(replay_with_limit(Path(f)) for f in files))
+
+        self.report.end_time = datetime.now()
+        # 按输入顺序排列会话，便于对比
+        order = {str(Path(f)): i for i, f in enumerate(files)}
+        self.report.sessions.sort(key=lambda s: order.get(s.source_file, len(order)))
+        self._generate_suite_summary()
+
+        return self.report
+
+    async def _replay_file(self, file_path: Path,
+                           start_url: Optional[str]) -> Optional[ReplaySession]:
+        """在独立的上下文中重放单个文件"""
+        logger.info(f"开始重放: {file_path}")
+        try:
+            async with AsyncReplayEngine(self.config, browser=self.browser, quiet=True,
+                                         selector_cache=self.selector_cache) as engine:
+                return await engine.replay_from_file(file_path, start_url)
+        except Exception as e:
+            logger.error(f"重放文件失败 {file_path}: {e}")
+            self._record_error(file_path, str(e))
+            return None
+
+    def _record_session(self, session: ReplaySession):
+        """记录单个文件的重放会话"""
+        if self.on_session:
+            self.on_session(session)
+        self.report.sessions.append(session)
+        if session.failed_records == 0:
+            self.report.passed_files += 1
+        else:
+            self.report.failed_files += 1
+
+        status = "✅" if session.failed_records == 0 else "❌"
+        self.console.print(
+            f"{status} {Path(session.source_file).name}: "
+            f"{session.successful_records}/{session.total_records}"
+        )
+
+    def _record_error(self, file_path: Path, error: str):
+        """记录无法完成的文件"""
+        if self.on_error:
+            self.on_error(str(file_path), error)
+        self.report.errors[str(file_path)] = error
+        self.report.failed_files += 1
+        self.console.print(f"[red]💥 {file_path.name}: {error}[/red]")
+
+    def _generate_suite_summary(self):
+        """生成套件摘要"""
+        report = self.report
+        duration = (report.end_time - report.start_time).total_seconds()
+        total_records = sum(s.total_records for s in report.sessions)
+        successful_records = sum(s.successful_records for s in report.sessions)
+
+        report.summary = {
+            'suite_id': report.suite_id,
+            'duration_seconds': duration,
+            'concurrency': self.concurrency,
+            'total_records': total_records,
+            'successful_records': successful_records,
+            'failed_records': total_records - successful_records,
+            'success_rate': successful_records / total_records if total_records else 0,
+            'file_durations': {
+                s.source_file: s.summary.get('duration_seconds', 0) for s in report.sessions
+            },
+            'browser_type': self.config.browser_type,
+            'headless': self.config.headless
+        }
+
+    def print_summary(self):
+        """打印套件摘要"""
+        if not self.report:
+            return
+
+        report = self.report
+        table = Table(title="套件重放摘要")
+        table.add_column("文件", style="cyan")
+        table.add_column("成功/总数", style="magenta")
+        table.add_column("耗时", style="green")
+        table.add_column("状态", style="yellow")
+
+        for session in report.sessions:
+            table.add_row(
+                Path(session.source_file).name,
+                f"{session.successful_records}/{session.total_records}",
+                f"{session.summary.get('duration_seconds', 0):.1f}秒",
+                "✅" if session.failed_records == 0 else "❌"
+            )
+        for file_path, error in report.errors.items():
+            table.add_row(Path(file_path).name, "-", "-", f"💥 {error[:40]}")
+
+        self.console.print(table)
+        self.console.print(
+            f"文件: {report.passed_files} 通过 / {report.failed_files} 失败 / {report.total_files} 总数, "
+            f"操作成功率: {report.summary['success_rate'] * 100:.1f}%, "
+            f"总耗时: {report.summary['duration_seconds']:.1f}秒"
+        )
+
+    def save_results(self, output_file: str = None) -> str:
+        """保存套件结果到文件"""
+        if not self.report:
+            raise ValueError("没有可保存的套件结果")
+
+        if not output_file:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            output_file = f"suite_results_{self.report.suite_id}_{timestamp}.json"
+
+        output_path = Path("data") / output_file
+        output_path.parent.mkdir(exist_ok=True)
+
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write(self.report.model_dump_json(indent=2))
+
+        logger.info(f"套件结果已保存到: {output_path}")
+        return str(output_path)
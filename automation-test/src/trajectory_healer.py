@@ -0,0 +1,138 @@
+"""
+轨迹修复 - 收集重放中验证通过的修复选择器，写成补丁文件和修复后的轨迹副本，原始文件保持不变
+"""
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from loguru import logger
+
+from .binary_format import is_binary_trajectory, write_binary_trajectory
+from .data_loader import LearningDataLoader
+from .models import LearningRecord, ReplayResult
+from .selector_cache import SelectorCache
+
+# 修复结果写入原始文件所在目录下的子目录；套件只扫描目录本层，不会把副本当作新的轨迹
+HEALED_DIR = "healed"
+PATCH_SUFFIX = ".patch.json"
+
+def healed_paths(source_file: str | Path) -> Dict[str, Path]:
+    """轨迹文件对应的修复副本和补丁文件路径"""
+    source_file = Path(source_file)
+    directory = source_file.parent / HEALED_DIR
+    return {
+        'copy': directory / source_file.name,
+        'patch': directory / f"{source_file.stem}{PATCH_SUFFIX}"
+    }
+
+def load_patch(patch_file: str | Path) -> Dict[str, Dict[str, Any]]:
+    """读取补丁文件，返回 记录键 -> 修复条目"""
+    with open(patch_file, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return {fix['key']: fix for fix in data.get('fixes', [])}
+
+def apply_fix(element: Dict[str, Any], fix: Dict[str, Any]):
+    """把修复写入元素信息中与选择器策略对应的字段：xpath=/文本选择器写入xpath/textContent，
+    其余写入CSS选择器；录制的id已经失效，去掉它，避免按优先级先等待失效的id"""
+    selector = fix['selector']
+    if selector.startswith('xpath='):
+        element['xpath'] = selector[len('xpath='):]
+    elif selector.startswith('//'):
+        element['xpath'] = selector
+    elif selector.startswith('text='):
+        element['textContent'] = selector[len('text='):]
+    else:
+        element['selector'] = selector
+    if element.get('id') and selector != f"#{element['id']}":
+        element['id'] = None
+
+def apply_patch(records: Iterable[LearningRecord],
+                fixes: Dict[str, Dict[str, Any]]) -> Iterator[LearningRecord]:
+    """加载时应用补丁；records可以是列表，也可以是流式加载的迭代器"""
+    for record in records:
+        fix = fixes.get(SelectorCache.make_key(record))
+        if fix:
+            element = record.element.model_dump()
+            apply_fix(element, fix)
+            record = record.model_copy(update={'element': record.element.model_copy(update=element)})
+        yield record
+
+class TrajectoryHealer:
+    """轨迹修复器 - 以 (页面URL模式, 元素指纹) 识别记录，与选择器缓存的键一致；
+    合并逐键输入后步骤号会变化，按键匹配仍能找到原始文件中的每一条对应记录"""
+
+    def __init__(self):
+        self.fixes: Dict[str, Dict[str, Any]] = {}
+
+    def add(self, step: int, result: ReplayResult, source: str, confidence: Optional[float] = None):
+        """记录一个验证通过（操作已成功执行）的修复"""
+        record = result.record
+        key = SelectorCache.make_key(record)
+        if key in self.fixes:
+            return
+        self.fixes[key] = {
+            'key': key,
+            'step': step,
+            'description': record.description,
+            'url': record.url,
+            'source': source,
+            'confidence': confidence,
+            'original': {
+                'id': record.element.id,
+                'selector': record.element.selector,
+                'xpath': record.element.xpath
+            },
+            'selector': result.healed_selector
+        }
+
+    def write(self, source_file: str | Path, session_id: str, copy: bool = True) -> Dict[str, Path]:
+        """写补丁文件，copy为True时同时写修复后的轨迹副本（与原文件同格式）"""
+        paths = healed_paths(source_file)
+        paths['patch'].parent.mkdir(exist_ok=True)
+
+        # 与已有补丁合并，多次运行逐步积累修复
+        fixes = load_patch(paths['patch']) if paths['patch'].exists() else {}
+        fixes.update(self.fixes)
+        _write_json({
+            'source_file': str(source_file),
+            'session_id': session_id,
+            'updated_at': datetime.now().isoformat(),
+            'fixes': list(fixes.values())
+        }, paths['patch'])
+        written = {'patch': paths['patch']}
+
+        if copy:
+            self._write_copy(Path(source_file), paths['copy'], fixes)
+            written['copy'] = paths['copy']
+
+        logger.info(f"已保存 {len(self.fixes)} 个验证通过的修复: {', '.join(str(p) for p in written.values())}")
+        return written
+
+    @staticmethod
+    def _write_copy(source_file: Path, output_path: Path, fixes: Dict[str, Dict[str, Any]]):
+        """复制原始轨迹并应用修复；无法解析的记录原样保留"""
+        loader = LearningDataLoader(source_file.parent)
+        items: List[Dict[str, Any]] = []
+        for index, item in enumerate(loader.iter_items(source_file), start=1):
+            try:
+                fix = fixes.get(SelectorCache.make_key(loader.parse_record(item)))
+            except Exception as e:
+                logger.warning(f"第 {index} 条记录无法解析，原样写入修复副本: {e}")
+                fix = None
+            if fix:
+                item = dict(item, element=dict(item.get('element', {})))
+                apply_fix(item['element'], fix)
+            items.append(item)
+
+        if is_binary_trajectory(source_file):
+            write_binary_trajectory(items, output_path)
+        else:
+            _write_json(items, output_path)
+
+def _write_json(data: Any, output_path: Path):
+    """先写临时文件再替换，写入中途失败不会留下半个文件"""
+    tmp_path = output_path.with_suffix(output_path.suffix + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, output_path)
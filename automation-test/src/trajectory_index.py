@@ -0,0 +1,237 @@
+"""
+轨迹索引 - 在数据目录中维护SQLite元数据索引，文件未变化时无需重新解析
+"""
+import json
+import sqlite3
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, List, Dict, Any, Optional, Tuple
+from loguru import logger
+
+from .data_loader import LearningDataLoader
+from .record_stats import RecordStats
+from .url_utils import compile_url_pattern, split_host_path, url_pattern_prefix
+
+INDEX_FILE_NAME = ".trajectory_index.sqlite"
+
+# 表结构或步骤编号规则变化时递增，旧索引会被清空重建
+SCHEMA_VERSION = 3
+
+# 索引中保留的错误样本数
+MAX_INDEXED_ERRORS = 20
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    name TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    record_count INTEGER NOT NULL DEFAULT 0,
+    valid_records INTEGER NOT NULL DEFAULT 0,
+    invalid_records INTEGER NOT NULL DEFAULT 0,
+    missing_urls INTEGER NOT NULL DEFAULT 0,
+    missing_selectors INTEGER NOT NULL DEFAULT 0,
+    missing_xpath INTEGER NOT NULL DEFAULT 0,
+    error_count INTEGER NOT NULL DEFAULT 0,
+    errors TEXT NOT NULL DEFAULT '[]',
+    types TEXT NOT NULL DEFAULT '{}',
+    urls TEXT NOT NULL DEFAULT '[]',
+    start_time TEXT,
+    end_time TEXT,
+    error TEXT,
+    indexed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS url_steps (
+    name TEXT NOT NULL,
+    url TEXT NOT NULL,
+    host TEXT NOT NULL,
+    path TEXT NOT NULL,
+    steps TEXT NOT NULL,
+    PRIMARY KEY (name, url)
+);
+CREATE INDEX IF NOT EXISTS url_steps_host_path ON url_steps (host, path);
+CREATE INDEX IF NOT EXISTS url_steps_path ON url_steps (path);
+"""
+
+def _format_time(value: Optional[datetime]) -> Optional[str]:
+    """时间转为ISO字符串（保留时区信息）"""
+    return value.isoformat() if value else None
+
+def _parse_time(value: Optional[str]) -> Optional[datetime]:
+    """ISO字符串转为时间"""
+    return datetime.fromisoformat(value) if value else None
+
+class TrajectoryIndex:
+    """轨迹索引 - 以 (文件名, 大小, 修改时间) 判断文件是否变化，只重新解析新增或修改过的文件
+
+    每个文件保存记录数、类型分布、URL集合、时间范围和校验结果；
+    url_steps表是URL倒排索引，按 (主机, 路径) 排序存放每个URL出现在哪些文件的哪些步骤。
+    索引文件默认放在被索引的目录中（.trajectory_index.sqlite）
+    """
+
+    def __init__(self, directory: str | Path, index_path: str | Path = None):
+        self.directory = Path(directory)
+        self.index_path = Path(index_path) if index_path else self.directory / INDEX_FILE_NAME
+        self.conn = self._connect()
+
+    def _connect(self) -> sqlite3.Connection:
+        """打开索引，损坏或版本过旧时删除重建"""
+        try:
+            return self._open()
+        except sqlite3.DatabaseError as e:
+            logger.warning(f"轨迹索引损坏，将重新建立: {e}")
+            self.index_path.unlink(missing_ok=True)
+            return self._open()
+
+    def _open(self) -> sqlite3.Connection:
+        """打开数据库并建表"""
+        conn = sqlite3.connect(self.index_path)
+        conn.row_factory = sqlite3.Row
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version != SCHEMA_VERSION:
+            conn.executescript("DROP TABLE IF EXISTS files; DROP TABLE IF EXISTS url_steps;")
+        conn.executescript(_SCHEMA)
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        conn.commit()
+        return conn
+
+    def close(self):
+        """关闭索引"""
+        self.conn.close()
+
+    def __enter__(self) -> "TrajectoryIndex":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def refresh(self, files: Iterable[Path] = None) -> Dict[str, int]:
+        """增量更新索引：只解析新增或修改过的文件，删除已不存在的文件
+
+        不传files时扫描整个目录的轨迹文件
+        """
+        if files is None:
+            files = LearningDataLoader.discover_trajectory_files(self.directory)
+        files = list(files)
+
+        result = {'scanned': len(files), 'updated': 0, 'removed': 0}
+        known = {
+            name: (size, mtime_ns)
+            for name, size, mtime_ns in self.conn.execute("SELECT name, size, mtime_ns FROM files")
+        }
+
+        for file_path in files:
+            stat = file_path.stat()
+            if known.get(file_path.name) != (stat.st_size, stat.st_mtime_ns):
+                self._index_file(file_path, stat)
+                result['updated'] += 1
+
+        current = {f.name for f in files}
+        for name in known:
+            if name not in current and not (self.directory / name).exists():
+                self.conn.execute("DELETE FROM files WHERE name = ?", (name,))
+                self.conn.execute("DELETE FROM url_steps WHERE name = ?", (name,))
+                result['removed'] += 1
+
+        self.conn.commit()
+        if result['updated'] or result['removed']:
+            logger.info(f"轨迹索引已更新: 重新解析 {result['updated']} 个文件, "
+                        f"移除 {result['removed']} 个文件")
+        return result
+
+    def _index_file(self, file_path: Path, stat):
+        """解析单个文件并写入索引"""
+        stats = RecordStats(max_errors=MAX_INDEXED_ERRORS)
+        url_steps: Dict[str, List[int]] = {}
+        error = None
+        try:
+            # 步骤号是记录在文件中的原始位置，跳过的坏记录也占位，与--from-step一致
+            for step, record in LearningDataLoader.enumerate_compact_records(file_path):
+                stats.add(record)
+                url_steps.setdefault(record.url, []).append(step)
+        except Exception as e:
+            logger.warning(f"索引文件失败: {file_path}: {e}")
+            error = str(e)
+
+        self.conn.execute("DELETE FROM url_steps WHERE name = ?", (file_path.name,))
+        self.conn.executemany(
+            "INSERT INTO url_steps VALUES (?, ?, ?, ?, ?)",
+            [
+                (file_path.name, url, *split_host_path(url), json.dumps(steps))
+                for url, steps in url_steps.items()
+            ]
+        )
+
+        self.conn.execute(
+            "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                file_path.name, stat.st_size, stat.st_mtime_ns,
+                stats.total_records, stats.valid_records, stats.invalid_records,
+                stats.missing_urls, stats.missing_selectors, stats.missing_xpath,
+                stats.error_count, json.dumps(stats.errors, ensure_ascii=False),
+                json.dumps(stats.types, ensure_ascii=False),
+                json.dumps(sorted(stats.urls), ensure_ascii=False),
+                _format_time(stats.start_time), _format_time(stats.end_time),
+                error, time.time()
+            )
+        )
+
+    def entry(self, file_path: str | Path) -> Optional[Dict[str, Any]]:
+        """查询单个文件的索引条目，文件变化时先重新索引"""
+        file_path = Path(file_path)
+        if not file_path.exists():
+            return None
+        self.refresh_file(file_path)
+        row = self.conn.execute("SELECT * FROM files WHERE name = ?", (file_path.name,)).fetchone()
+        return self._row_to_entry(row) if row else None
+
+    def refresh_file(self, file_path: Path):
+        """只检查并更新单个文件"""
+        stat = file_path.stat()
+        row = self.conn.execute(
+            "SELECT size, mtime_ns FROM files WHERE name = ?", (file_path.name,)
+        ).fetchone()
+        if row is None or tuple(row) != (stat.st_size, stat.st_mtime_ns):
+            self._index_file(file_path, stat)
+            self.conn.commit()
+
+    def entries(self) -> List[Dict[str, Any]]:
+        """所有索引条目，按修改时间倒序"""
+        rows = self.conn.execute("SELECT * FROM files ORDER BY mtime_ns DESC").fetchall()
+        return [self._row_to_entry(row) for row in rows]
+
+    def query_urls(self, pattern: str, regex: bool = False) -> List[Tuple[Path, int]]:
+        """查询URL匹配的所有步骤，返回 (文件路径, 步骤号) 列表，步骤号从1开始（与--from-step一致）
+
+        通配符模式的字面前缀（主机、路径前缀）先在索引上做范围查找，只对候选URL做匹配；
+        不读取任何轨迹文件。调用前应先refresh()
+        """
+        match = compile_url_pattern(pattern, regex)
+        host, path_prefix = url_pattern_prefix(pattern, regex)
+
+        sql = "SELECT name, url, steps FROM url_steps WHERE 1 = 1"
+        params: List[Any] = []
+        if host is not None:
+            sql += " AND host = ?"
+            params.append(host)
+        if path_prefix:
+            sql += " AND path >= ? AND path < ?"
+            params.extend([path_prefix, path_prefix + '\uffff'])
+
+        hits: List[Tuple[Path, int]] = []
+        for name, url, steps in self.conn.execute(sql, params):
+            if match(url):
+                hits.extend((self.directory / name, step) for step in json.loads(steps))
+        return sorted(hits)
+
+    def _row_to_entry(self, row: sqlite3.Row) -> Dict[str, Any]:
+        """数据库行转为条目字典"""
+        entry = dict(row)
+        entry['path'] = self.directory / entry['name']
+        entry['mtime'] = entry.pop('mtime_ns') / 1e9
+        entry['errors'] = json.loads(entry['errors'])
+        entry['types'] = json.loads(entry['types'])
+        entry['urls'] = json.loads(entry['urls'])
+        entry['start_time'] = _parse_time(entry['start_time'])
+        entry['end_time'] = _parse_time(entry['end_time'])
+        return entry
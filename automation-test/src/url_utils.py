@@ -0,0 +1,154 @@
+"""
+URL工具 - 规范化URL以便比较
+"""
+import re
+from typing import Callable, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# 不影响页面内容的跟踪参数
+TRACKING_PARAMS = {
+    'gclid', 'fbclid', 'msclkid', 'yclid', 'dclid', '_ga', '_gl', 'mc_cid', 'mc_eid', 'spm'
+}
+
+_DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+def _is_tracking_param(name: str) -> bool:
+    """判断是否为跟踪参数"""
+    name = name.lower()
+    return name.startswith('utm_') or name in TRACKING_PARAMS
+
+def normalize_url(url: str) -> str:
+    """规范化URL：忽略大小写的协议和主机、默认端口、末尾斜杠和跟踪参数；
+    片段只保留哈希路由（#/、#!开头），页内锚点忽略"""
+    if not url:
+        return ''
+
+    try:
+        parts = urlsplit(url.strip())
+    except ValueError:
+        return url.strip()
+
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if parts.port and parts.port != _DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+
+    path = parts.path or '/'
+    if len(path) > 1:
+        path = path.rstrip('/')
+
+    query = [
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not _is_tracking_param(key)
+    ]
+    query.sort()
+
+    return urlunsplit((scheme, host, path, urlencode(query), route_fragment(parts.fragment)))
+
+def route_fragment(fragment: str) -> str:
+    """哈希路由片段（#/cart、#!/cart）决定单页应用显示哪个页面，保留；普通锚点片段忽略"""
+    return fragment if fragment.startswith(('/', '!')) else ''
+
+def same_origin(url_a: str, url_b: str) -> bool:
+    """判断两个URL是否同源"""
+    try:
+        a, b = urlsplit(url_a), urlsplit(url_b)
+    except ValueError:
+        return False
+    return (a.scheme.lower(), (a.hostname or '').lower(), a.port) == \
+           (b.scheme.lower(), (b.hostname or '').lower(), b.port)
+
+# 路径中可变的片段（数字ID、UUID、长十六进制串）
+_VARIABLE_SEGMENT = re.compile(
+    r'^(\d+|[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}|[0-9a-f]{16,})$',
+    re.IGNORECASE
+)
+
+def url_pattern(url: str) -> str:
+    """把URL归纳为页面模式：去掉查询参数，路径和哈希路由中的ID类片段替换为*"""
+    normalized = normalize_url(url)
+    if not normalized:
+        return ''
+
+    parts = urlsplit(normalized)
+
+    def generalize(path: str) -> str:
+        return '/'.join('*' if _VARIABLE_SEGMENT.match(segment) else segment for segment in path.split('/'))
+
+    return urlunsplit((parts.scheme, parts.netloc, generalize(parts.path) or '/', '',
+                       generalize(parts.fragment.split('?', 1)[0])))
+
+# 只有*是通配符；?和[按字面匹配，含查询参数的子串模式（如 search?q=shoes）保持原来的行为
+_WILDCARD = '*'
+
+def split_host_path(url: str) -> Tuple[str, str]:
+    """拆分出主机（含端口，小写）和路径，用于URL索引"""
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return '', url
+    return parts.netloc.lower(), parts.path or '/'
+
+def _glob_target(pattern: str) -> Callable[[str], str]:
+    """通配符模式匹配的对象：以/开头匹配路径，含://匹配完整URL，否则匹配 主机+路径；
+    模式中含?时路径后带上查询参数"""
+    with_query = '?' in pattern
+
+    def path_of(url: str) -> str:
+        path = split_host_path(url)[1]
+        if with_query:
+            query = urlsplit(url).query if '?' in url else ''
+            path = f"{path}?{query}" if query else path
+        return path
+
+    if pattern.startswith('/'):
+        return path_of
+    if '://' in pattern:
+        return lambda url: url
+    return lambda url: split_host_path(url)[0] + path_of(url)
+
+def _translate_glob(pattern: str) -> re.Pattern:
+    """把只含*的通配符模式转为正则：*匹配任意字符，其余字符按字面匹配；
+    以/*结尾时也匹配不带斜杠的前缀本身（/checkout/* 匹配 /checkout）"""
+    tail = ''
+    if pattern.endswith('/*'):
+        pattern, tail = pattern[:-2], '(?:/.*)?'
+    body = '.*'.join(re.escape(part) for part in pattern.split(_WILDCARD))
+    return re.compile(f"{body}{tail}", re.DOTALL)
+
+def compile_url_pattern(pattern: str, regex: bool = False) -> Callable[[str], bool]:
+    """编译URL查询模式
+
+    - regex=True时按正则表达式在完整URL中搜索
+    - 含通配符*时按glob匹配，如 /checkout/*、shop.example.com/item/*；?和[按字面匹配
+    - 否则按子串匹配（与原来的--url过滤一致）
+    """
+    if regex:
+        compiled = re.compile(pattern)
+        return lambda url: bool(compiled.search(url or ''))
+
+    if _WILDCARD not in pattern:
+        return lambda url: pattern in (url or '')
+
+    target = _glob_target(pattern)
+    compiled = _translate_glob(pattern)
+    return lambda url: bool(compiled.fullmatch(target(url or '')))
+
+def _literal_prefix(text: str) -> str:
+    """通配符之前的字面路径前缀；/*结尾的模式也匹配前缀本身，所以去掉末尾的斜杠"""
+    prefix = text.split(_WILDCARD, 1)[0].split('?', 1)[0]
+    return prefix[:-1] if len(prefix) > 1 and prefix.endswith('/') else prefix
+
+def url_pattern_prefix(pattern: str, regex: bool = False) -> Tuple[Optional[str], str]:
+    """从查询模式中提取可用于索引的 (主机, 路径前缀)；无法确定时主机为None、前缀为空"""
+    if regex or _WILDCARD not in pattern:
+        return None, ''
+
+    if pattern.startswith('/'):
+        return None, _literal_prefix(pattern)
+
+    rest = pattern.split('://', 1)[1] if '://' in pattern else pattern
+    host, slash, path = rest.partition('/')
+    if not slash or _WILDCARD in host:
+        return None, ''
+    return host.lower(), _literal_prefix('/' + path)
@@ -0,0 +1,9 @@
+"""
+测试公共设置
+"""
+import pytest
+
+@pytest.fixture(autouse=True)
+def isolated_cwd(tmp_path, monkeypatch):
+    """在临时目录中运行，引擎和加载器按相对路径创建的 data/ 不落在仓库里"""
+    monkeypatch.chdir(tmp_path)
@@ -0,0 +1,119 @@
+"""
+测试用的Playwright替身 - 只实现重放引擎、执行器和定位器用到的异步接口，不启动浏览器
+"""
+from typing import Any, List, Optional, Set
+
+class FakeHandle:
+    def __init__(self, value: Any):
+        self.value = value
+
+    async def json_value(self) -> Any:
+        return self.value
+
+class FakeLocator:
+    """记录调用的定位器；页面上不存在的选择器等待时超时"""
+
+    def __init__(self, page: "FakePage", selector: str):
+        self.page = page
+        self.selector = selector
+        self.first = self
+
+    def __getattr__(self, name: str):
+        async def call(*args, **kwargs):
+            self.page.calls.append((name, self.selector))
+            if name == 'wait_for' and not self.page.has(self.selector):
+                raise TimeoutError(self.selector)
+            if name in ('is_visible', 'is_enabled'):
+                return self.page.has(self.selector)
+            if name == 'evaluate':
+                return {'tag': 'button', 'type': None, 'visible': True, 'enabled': True, 'readonly': False,
+                        'disabled': False, 'checked': None, 'box': {'x': 0, 'y': 0, 'width': 5, 'height': 5}}
+            return None
+        return call
+
+class FakePage:
+    """页面替身：present是页面上存在的选择器，wait_for_function探测时返回其中第一个命中的"""
+
+    def __init__(self, present: Optional[Set[str]] = None):
+        self.url = 'about:blank'
+        self.viewport_size = {'width': 1280, 'height': 720}
+        self.present = present or set()
+        self.calls: List[tuple] = []
+        self.evaluate_result: Any = None
+
+    def has(self, selector: str) -> bool:
+        return selector in self.present
+
+    def set_default_timeout(self, timeout: float):
+        pass
+
+    def on(self, event: str, handler: Any):
+        pass
+
+    def locator(self, selector: str) -> FakeLocator:
+        return FakeLocator(self, selector)
+
+    def clicks(self) -> List[str]:
+        return [selector for name, selector in self.calls if name == 'click']
+
+    async def wait_for_function(self, script: str, arg: Any = None, **kwargs) -> FakeHandle:
+        if isinstance(arg, list):
+            for index, selector in enumerate(arg):
+                if self.has(selector):
+                    return FakeHandle({'index': index})
+            raise TimeoutError('probe')
+        return FakeHandle(True)
+
+    async def evaluate(self, script: str, arg: Any = None) -> Any:
+        return self.evaluate_result
+
+    async def wait_for_load_state(self, *args, **kwargs):
+        pass
+
+    async def title(self) -> str:
+        return '测试页面'
+
+    async def goto(self, url: str, **kwargs):
+        self.calls.append(('goto', url))
+        self.url = url
+
+    async def wait_for_url(self, *args, **kwargs):
+        raise TimeoutError('wait_for_url')
+
+    async def close(self):
+        pass
+
+class FakeContext:
+    def __init__(self, present: Optional[Set[str]] = None):
+        self.present = present
+        self.pages: List[FakePage] = []
+
+    async def new_page(self) -> FakePage:
+        page = FakePage(self.present)
+        self.pages.append(page)
+        return page
+
+    async def add_init_script(self, *args, **kwargs):
+        pass
+
+    async def close(self):
+        pass
+
+class FakeBrowser:
+    """浏览器替身：作为外部浏览器传给重放引擎，新页面上存在present中的选择器"""
+
+    def __init__(self, present: Optional[Set[str]] = None):
+        self.present = present
+        self.contexts: List[FakeContext] = []
+
+    @property
+    def pages(self) -> List[FakePage]:
+        return [page for context in self.contexts for page in context.pages]
+
+    async def new_context(self, **kwargs) -> FakeContext:
+        context = FakeContext(self.present)
+        self.contexts.append(context)
+        return context
+
+    async def close(self):
+        pass
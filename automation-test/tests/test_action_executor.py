@@ -0,0 +1,52 @@
+"""
+ActionExecutor 测试 - 本地修复结果写入选择器缓存后的重放
+"""
+import asyncio
+
+from src.action_executor import ActionExecutor
+from src.models import LearningRecord
+from src.selector_cache import SelectorCache
+
+from tests.fake_page import FakePage
+
+CONFIG = {'retry_count': 2, 'replay_delay': 0, 'wait_for_navigation': False, 'heal_threshold': 0.7}
+
+def make_record() -> LearningRecord:
+    return LearningRecord(
+        type="click", description="点击提交", url="https://shop.example.com/checkout",
+        element={"tagName": "BUTTON", "id": "submit", "xpath": "/html/body/form/button[1]",
+                 "selector": "#submit"},
+        timestamp="2024-01-01T10:00:00Z"
+    )
+
+def test_cached_heal_selector_replays_without_new_heal(tmp_path):
+    """上次本地修复的选择器以"heal"策略缓存；这次从缓存命中，没有发生新的修复"""
+    record = make_record()
+    cache = SelectorCache(tmp_path / "selector_cache.json")
+    cache.record_success(record, "heal", "#new", cached=False)
+    page = FakePage(present={"#new"})
+
+    result = asyncio.run(ActionExecutor(page, CONFIG, selector_cache=cache).execute_action(record))
+
+    assert result.success, result.error_message
+    assert result.selector_used == "heal"
+    assert result.healed_selector is None
+    assert result.retry_count == 0
+    assert page.clicks() == ["#new"]
+
+def test_local_heal_reports_healed_selector(tmp_path):
+    """所有策略都失败、本地修复达到阈值时，结果记录修复的选择器和置信度"""
+    record = make_record()
+    cache = SelectorCache(tmp_path / "selector_cache.json")
+    page = FakePage(present={"#submit-order"})
+    page.evaluate_result = {'scanned': 3, 'candidates': [
+        {'selector': '#submit-order', 'score': 0.92},
+        {'selector': '#cancel', 'score': 0.40}
+    ]}
+
+    result = asyncio.run(ActionExecutor(page, CONFIG, selector_cache=cache).execute_action(record))
+
+    assert result.success, result.error_message
+    assert result.healed_selector == "#submit-order"
+    assert result.heal_confidence == 0.92
+    assert cache.lookup(record)['strategy'] == "heal"
@@ -0,0 +1,64 @@
+"""
+浏览器服务发现测试 - 只复用浏览器类型和无头模式一致的服务，残留的地址文件被忽略
+"""
+import asyncio
+import json
+import os
+
+from src import models
+from src.browser_server import ENDPOINT_FILE, connect_or_launch, read_endpoint
+
+ENDPOINT = "http://127.0.0.1:9222"
+
+class FakeBrowserType:
+    """记录是连接浏览器服务还是本地启动"""
+
+    def __init__(self, calls: list):
+        self.calls = calls
+
+    async def connect_over_cdp(self, endpoint, **kwargs):
+        self.calls.append(('connect', endpoint))
+        return "remote"
+
+    async def launch(self, headless, **kwargs):
+        self.calls.append(('launch', headless))
+        return "local"
+
+class FakePlaywright:
+    def __init__(self):
+        self.calls = []
+        self.chromium = FakeBrowserType(self.calls)
+
+def write_endpoint(pid: int = None, headless: bool = True, browser_type: str = "chromium"):
+    ENDPOINT_FILE.parent.mkdir(exist_ok=True)
+    ENDPOINT_FILE.write_text(json.dumps({
+        'endpoint': ENDPOINT, 'pid': pid or os.getpid(), 'browser_type': browser_type, 'headless': headless
+    }), encoding='utf-8')
+
+def connect(**overrides):
+    playwright = FakePlaywright()
+    browser, connected = asyncio.run(connect_or_launch(playwright, models.TestConfig(**overrides)))
+    return playwright.calls, connected
+
+def test_reuses_matching_server():
+    write_endpoint(headless=True)
+    calls, connected = connect(headless=True)
+    assert calls == [('connect', ENDPOINT)]
+    assert connected
+
+def test_headed_replay_does_not_attach_to_headless_server():
+    write_endpoint(headless=True)
+    calls, connected = connect(headless=False)
+    assert calls == [('launch', False)]
+    assert not connected
+
+def test_server_without_recorded_mode_is_not_reused():
+    ENDPOINT_FILE.parent.mkdir(exist_ok=True)
+    ENDPOINT_FILE.write_text(json.dumps({'endpoint': ENDPOINT, 'pid': os.getpid()}), encoding='utf-8')
+    calls, _ = connect(headless=False)
+    assert calls == [('launch', False)]
+
+def test_stale_endpoint_file_is_ignored():
+    # pid上限之外的进程号不可能存在
+    write_endpoint(pid=2 ** 22 + 1)
+    assert read_endpoint() is None
@@ -0,0 +1,58 @@
+"""
+命令行测试 - 套件命令与 replay 共用同一组重放选项，选项都传到配置中
+"""
+import pytest
+from click.testing import CliRunner
+
+import main
+from src import sharded_runner, suite_runner
+
+OPTIONS = ['--headless', '--openai-key', 'test-key', '--openai-model', 'gpt-test', '--locate-mode', 'sequential',
+           '--no-heal', '--stream', '--coalesce-input', '--jsonl', '--retention', 'aggregate',
+           '--browser-endpoint', 'http://127.0.0.1:9333', '--no-history']
+
+class RecordingRunner:
+    """套件运行器替身：只记录收到的配置"""
+    configs = []
+
+    discover_files = staticmethod(suite_runner.SuiteRunner.discover_files)
+
+    def __init__(self, config, **kwargs):
+        self.configs.append(config)
+        self.report = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def run(self, files, start_url=None):
+        self.report = type('Report', (), {'failed_files': []})()
+
+    def print_summary(self):
+        pass
+
+    def save_results(self, output=None):
+        return output
+
+@pytest.mark.parametrize("command", ['replay-suite', 'run-suite'])
+def test_suite_command_passes_replay_options(tmp_path, monkeypatch, command):
+    (tmp_path / "suite").mkdir()
+    (tmp_path / "suite" / "login.json").write_text("[]", encoding="utf-8")
+    RecordingRunner.configs.clear()
+    monkeypatch.setattr(suite_runner, 'SuiteRunner', RecordingRunner)
+    monkeypatch.setattr(sharded_runner, 'ShardedSuiteRunner', RecordingRunner)
+
+    result = CliRunner().invoke(main.cli, [command, str(tmp_path / "suite"), *OPTIONS])
+
+    assert result.exit_code == 0, result.output
+    config, = RecordingRunner.configs
+    assert config.headless
+    assert (config.openai_api_key, config.openai_model) == ("test-key", "gpt-test")
+    assert config.locate_mode == "sequential"
+    assert not config.self_heal
+    assert config.stream_records and config.coalesce_input
+    assert (config.result_sink, config.result_retention) == (True, "aggregate")
+    assert config.browser_endpoint == "http://127.0.0.1:9333"
+    assert not config.history
@@ -0,0 +1,78 @@
+"""
+LearningDataLoader 测试 - 轨迹索引只用于目录输入，紧凑记录与完整解析的校验一致
+"""
+import json
+
+import pytest
+
+from src.data_loader import LearningDataLoader
+from src.sharded_runner import count_records
+from src.trajectory_index import INDEX_FILE_NAME
+
+RECORDS = [
+    {"type": "click", "description": "点击登录", "url": "https://shop.example.com/login",
+     "element": {"tagName": "BUTTON", "id": "login", "xpath": "/html/body/button[1]", "selector": "#login"},
+     "timestamp": "2024-01-01T10:00:00Z"},
+    {"type": "click", "description": "去结算", "url": "https://shop.example.com/checkout",
+     "element": {"tagName": "A", "xpath": "/html/body/a[1]", "selector": "a.pay"},
+     "timestamp": "2024-01-01T10:00:01Z"},
+]
+
+def write_trajectory(path):
+    path.write_text(json.dumps(RECORDS, ensure_ascii=False), encoding='utf-8')
+    return path
+
+def test_single_file_does_not_create_index(tmp_path):
+    file_path = write_trajectory(tmp_path / "session.json")
+    loader = LearningDataLoader(tmp_path)
+
+    stats = loader.collect_stats(file_path)
+    filtered = loader.collect_stats(file_path, url_pattern='/checkout/*')
+
+    assert stats.valid_records == 2
+    assert filtered.matched_records == 1
+    assert filtered.url_hits is None
+    assert count_records(file_path) == 2
+    assert not (tmp_path / INDEX_FILE_NAME).exists()
+
+def test_directory_url_query_reports_hits(tmp_path):
+    write_trajectory(tmp_path / "a.json")
+    write_trajectory(tmp_path / "b.json")
+    loader = LearningDataLoader(tmp_path)
+
+    stats = loader.collect_stats(tmp_path, url_pattern='/checkout/*')
+
+    assert stats.matched_records == 2
+    assert stats.url_hits == [(tmp_path / "a.json", 2), (tmp_path / "b.json", 2)]
+    assert (tmp_path / INDEX_FILE_NAME).exists()
+
+def test_url_hits_use_position_in_file(tmp_path):
+    # 第1条记录无法解析，命中的步骤号仍是记录在文件中的位置，可以直接用于--from-step
+    (tmp_path / "a.json").write_text(json.dumps([{"type": "click", "url": None}, *RECORDS], ensure_ascii=False),
+                                     encoding='utf-8')
+    loader = LearningDataLoader(tmp_path)
+
+    stats = loader.collect_stats(tmp_path, url_pattern='/checkout/*')
+
+    assert stats.url_hits == [(tmp_path / "a.json", 3)]
+    assert next(loader.iter_items(tmp_path / "a.json", start=3 - 1))['url'] == "https://shop.example.com/checkout"
+
+@pytest.mark.parametrize("change", [
+    {"position": {}},
+    {"position": None},
+    {"position": {"x": 1.5, "y": 2}},
+    {"value": 42},
+    {"description": ["点击"]},
+    {"url": None},
+    {"element": {"tagName": "A", "xpath": 3, "selector": "a.pay"}},
+])
+def test_compact_records_reject_what_parse_record_rejects(tmp_path, change):
+    file_path = tmp_path / "session.json"
+    file_path.write_text(json.dumps([RECORDS[0], {**RECORDS[1], **change}], ensure_ascii=False), encoding='utf-8')
+    loader = LearningDataLoader(tmp_path)
+
+    full = loader.load_from_file(file_path)
+    compact = loader.load_compact_records(file_path)
+
+    assert len(full) == len(compact) == 1
+    assert compact[0].to_model() == full[0]
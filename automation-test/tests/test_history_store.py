@@ -0,0 +1,89 @@
+"""
+HistoryStore 测试 - 开关逐键输入合并的运行之间，步骤统计仍对应同一个操作
+"""
+import sqlite3
+from datetime import datetime, timedelta
+
+from src.history_store import HistoryStore
+from src.models import LearningRecord, ReplayResult, ReplaySession
+from src.normalizer import RecordNormalizer
+
+def make_record(index: int, type: str = "click", selector: str = None) -> LearningRecord:
+    return LearningRecord(
+        type=type, description=f"步骤 {index}", url="https://shop.example.com/login",
+        element={"tagName": "INPUT" if type == "input" else "BUTTON",
+                 "xpath": f"/html/body/*[{selector or index}]", "selector": selector or f"#el-{index}"},
+        timestamp="2024-01-01T10:00:00Z", value="a" * index if type == "input" else None
+    )
+
+# 第2~4步是同一个输入框上的逐键输入，合并后只剩第4步
+RECORDS = [
+    make_record(1),
+    make_record(2, "input", "#user"),
+    make_record(3, "input", "#user"),
+    make_record(4, "input", "#user"),
+    make_record(5),
+]
+
+def replay(store: HistoryStore, session_id: str, coalesce: bool, started: datetime, slow_step: int):
+    """模拟一次重放：source_step为slow_step的操作耗时10秒，其余0.1秒"""
+    if coalesce:
+        normalizer = RecordNormalizer()
+        numbered = [(normalizer.source_step, record) for record in normalizer.normalize(RECORDS)]
+    else:
+        numbered = list(enumerate(RECORDS, start=1))
+
+    rows = [
+        HistoryStore.step_row(step, ReplayResult(
+            record=record, success=True, execution_time=10.0 if source_step == slow_step else 0.1
+        ), source_step)
+        for step, (source_step, record) in enumerate(numbered, start=1)
+    ]
+    session = ReplaySession(session_id=session_id, start_time=started, end_time=started,
+                            total_records=len(rows), successful_records=len(rows), failed_records=0,
+                            source_file="/data/login.json")
+    store.record_session(session, rows)
+
+def test_normalizer_reports_source_step():
+    normalizer = RecordNormalizer()
+    numbered = [(normalizer.source_step, record.description) for record in normalizer.normalize(RECORDS)]
+    assert numbered == [(1, "步骤 1"), (4, "步骤 4"), (5, "步骤 5")]
+
+def test_step_stats_group_by_source_step_across_coalescing(tmp_path):
+    started = datetime(2024, 1, 1, 10, 0)
+    with HistoryStore(tmp_path / "history.sqlite") as store:
+        replay(store, "plain", coalesce=False, started=started, slow_step=5)
+        replay(store, "merged", coalesce=True, started=started + timedelta(minutes=1), slow_step=5)
+
+        stats = {s['step']: s for s in store.step_stats()}
+        slowest = store.slowest_steps(limit=1)[0]
+
+    assert set(stats) == {1, 2, 3, 4, 5}
+    assert stats[5]['runs'] == 2
+    assert stats[5]['p50'] == 10.0
+    assert stats[4]['runs'] == 2
+    assert stats[2]['runs'] == 1
+    assert (slowest['step'], slowest['description']) == (5, "步骤 5")
+
+def test_migrate_backfills_source_step_and_indexes_it(tmp_path):
+    path = tmp_path / "history.sqlite"
+    with sqlite3.connect(path) as conn:
+        # 没有source_step列的旧版本结果库
+        conn.executescript("""
+            CREATE TABLE steps (session_id TEXT NOT NULL, trajectory TEXT NOT NULL, step INTEGER NOT NULL,
+                                type TEXT, description TEXT, selector_used TEXT, retry_count INTEGER NOT NULL,
+                                execution_time REAL NOT NULL, success INTEGER NOT NULL, error_message TEXT,
+                                PRIMARY KEY (session_id, step));
+            CREATE INDEX steps_trajectory_step ON steps (trajectory, step);
+            INSERT INTO steps VALUES ('old', '/data/login.json', 3, 'click', '步骤 3', 'id', 0, 2.0, 1, NULL);
+        """)
+    conn.close()
+
+    with HistoryStore(path) as store:
+        rows = store.conn.execute("SELECT step, source_step FROM steps").fetchall()
+        indexes = {row[1]: row for row in store.conn.execute("PRAGMA index_list(steps)")}
+        columns = [row[2] for row in store.conn.execute("PRAGMA index_info(steps_trajectory_source_step)")]
+
+    assert rows == [(3, 3)]
+    assert 'steps_trajectory_step' not in indexes
+    assert columns == ['trajectory', 'source_step']
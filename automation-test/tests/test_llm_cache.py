@@ -0,0 +1,112 @@
+"""
+LLM响应缓存测试 - 通过llm=注入模拟LLM，统计实际调用次数
+"""
+import threading
+
+from src import llm_cache, models
+from src.ai_assistant import AIAssistant, _ALTERNATIVE_SELECTORS_PROMPT, _FAILURE_ANALYSIS_PROMPT
+from src.llm_cache import LLMCache
+from src.replay_engine import create_ai_assistant
+
+INPUTS = {'element_info': '{"tagName": "BUTTON", "id": "submit"}', 'page_content': '<button id="submit">提交'}
+
+class FakeResponse:
+    def __init__(self, content: str):
+        self.content = content
+
+class FakeLLM:
+    """模拟LLM：记录调用次数，每次返回不同的响应"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def invoke(self, messages):
+        self.calls += 1
+        return FakeResponse(f"css: #submit-{self.calls}")
+
+def make_assistant(tmp_path, model: str = "gpt-test", ttl_seconds: float = 3600):
+    llm = FakeLLM()
+    cache = LLMCache(tmp_path / "llm_cache.sqlite", ttl_seconds=ttl_seconds)
+    return AIAssistant(model=model, llm=llm, cache=cache), llm
+
+def test_miss_then_hit(tmp_path):
+    assistant, llm = make_assistant(tmp_path)
+
+    first = assistant._invoke(_ALTERNATIVE_SELECTORS_PROMPT, **INPUTS)
+    second = assistant._invoke(_ALTERNATIVE_SELECTORS_PROMPT, **INPUTS)
+
+    assert first == second
+    assert llm.calls == 1
+    assert assistant.cache.stats['misses'] == 1
+    assert assistant.cache.stats['hits'] == 1
+    assert assistant.usage['requests'] == 1
+
+def test_expired_entry_calls_llm_again(tmp_path, monkeypatch):
+    assistant, llm = make_assistant(tmp_path, ttl_seconds=60)
+    now = llm_cache.time.time()
+    assistant._invoke(_ALTERNATIVE_SELECTORS_PROMPT, **INPUTS)
+
+    monkeypatch.setattr(llm_cache.time, 'time', lambda: now + 120)
+    assistant._invoke(_ALTERNATIVE_SELECTORS_PROMPT, **INPUTS)
+
+    assert llm.calls == 2
+    assert assistant.cache.stats['expired'] == 1
+
+def test_changed_template_or_model_misses(tmp_path):
+    assistant, llm = make_assistant(tmp_path)
+    assistant._invoke(_ALTERNATIVE_SELECTORS_PROMPT, **INPUTS)
+
+    assistant._invoke([_ALTERNATIVE_SELECTORS_PROMPT[0], ("human", "{element_info}\n{page_content}")], **INPUTS)
+    assert llm.calls == 2
+
+    # 另一个模型共用同一个缓存文件
+    other = AIAssistant(model="gpt-other", llm=llm, cache=assistant.cache)
+    other._invoke(_ALTERNATIVE_SELECTORS_PROMPT, **INPUTS)
+    assert llm.calls == 3
+    assert assistant.cache.stats['hits'] == 0
+
+def test_changed_input_misses(tmp_path):
+    assistant, llm = make_assistant(tmp_path)
+    assistant._invoke(_ALTERNATIVE_SELECTORS_PROMPT, **INPUTS)
+    assistant._invoke(_ALTERNATIVE_SELECTORS_PROMPT, **{**INPUTS, 'page_content': '<button id="pay">支付'})
+    assert llm.calls == 2
+
+def test_no_llm_cache_bypasses_cache(tmp_path):
+    config = models.TestConfig(openai_api_key="test-key", llm_cache=False,
+                               llm_cache_file=str(tmp_path / "llm_cache.sqlite"))
+    assistant = create_ai_assistant(config)
+    llm = FakeLLM()
+    assistant.llm = llm
+
+    inputs = {'action_type': 'click', 'description': '点击提交', 'element_info': '{}', 'error_message': '元素未找到',
+              'url': 'https://shop.example.com', 'title': '结算', 'content': ''}
+    assistant._invoke(_FAILURE_ANALYSIS_PROMPT, **inputs)
+    assistant._invoke(_FAILURE_ANALYSIS_PROMPT, **inputs)
+
+    assert assistant.cache is None
+    assert llm.calls == 2
+    assert not (tmp_path / "llm_cache.sqlite").exists()
+
+def test_abandoned_call_after_close_does_not_write(tmp_path):
+    """AI调用在缓存关闭后才返回（重放引擎放弃等待的线程）：响应照常返回，不写缓存"""
+    release = threading.Event()
+
+    class SlowLLM(FakeLLM):
+        def invoke(self, messages):
+            release.wait(5)
+            return super().invoke(messages)
+
+    cache = LLMCache(tmp_path / "llm_cache.sqlite")
+    assistant = AIAssistant(model="gpt-test", llm=SlowLLM(), cache=cache)
+    responses = []
+    thread = threading.Thread(target=lambda: responses.append(
+        assistant._invoke(_ALTERNATIVE_SELECTORS_PROMPT, **INPUTS)))
+    thread.start()
+
+    assistant.close()
+    release.set()
+    thread.join(5)
+
+    assert responses == ["css: #submit-1"]
+    assert cache.stats['stores'] == 0
+    assert cache.get("any") is None
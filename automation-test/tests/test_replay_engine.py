@@ -0,0 +1,63 @@
+"""
+AsyncReplayEngine 测试 - 流式加载的无效文件和同一引擎的连续重放
+"""
+import asyncio
+import json
+
+import pytest
+
+from src import models
+from src.replay_engine import AsyncReplayEngine
+
+from tests.fake_page import FakeBrowser
+
+def write_trajectory(path, with_url: bool = True, invalid_steps=()):
+    records = [
+        {"type": "click", "description": f"点击按钮 {i}",
+         "url": "https://shop.example.com/login" if with_url and i not in invalid_steps else "",
+         "element": {"tagName": "BUTTON", "id": f"b{i}", "xpath": f"/html/body/button[{i}]",
+                     "selector": f"#b{i}"},
+         "timestamp": "2024-01-01T10:00:00Z"}
+        for i in range(1, 4)
+    ]
+    path.write_text(json.dumps(records, ensure_ascii=False), encoding='utf-8')
+    return path
+
+def make_config(tmp_path, **overrides) -> models.TestConfig:
+    return models.TestConfig(replay_delay=0, retry_count=0, selector_cache=False, nav_wait_ms=0,
+                             history_file=str(tmp_path / "history.sqlite"), **overrides)
+
+async def replay(config: models.TestConfig, *files, browser: FakeBrowser = None):
+    browser = browser or FakeBrowser({"#b1", "#b2", "#b3"})
+    async with AsyncReplayEngine(config, browser=browser, quiet=True) as engine:
+        return [await engine.replay_from_file(f) for f in files]
+
+def test_stream_without_valid_records_raises_before_navigating(tmp_path):
+    file_path = write_trajectory(tmp_path / "no_urls.json", with_url=False)
+    browser = FakeBrowser({"#b1", "#b2", "#b3"})
+    with pytest.raises(ValueError, match="没有有效的记录"):
+        asyncio.run(replay(make_config(tmp_path, stream_records=True), file_path, browser=browser))
+
+    assert all(not page.calls for page in browser.pages)
+
+def test_stream_skips_invalid_records(tmp_path):
+    file_path = write_trajectory(tmp_path / "partly_invalid.json", invalid_steps=(2,))
+    browser = FakeBrowser({"#b1", "#b2", "#b3"})
+
+    session, = asyncio.run(replay(make_config(tmp_path, stream_records=True), file_path, browser=browser))
+
+    assert session.total_records == 2
+    assert session.successful_records == 2
+    assert browser.pages[0].clicks() == ["#b1", "#b3"]
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_consecutive_replays_reset_counters(tmp_path, stream):
+    first = write_trajectory(tmp_path / "first.json")
+    second = write_trajectory(tmp_path / "second.json")
+
+    sessions = asyncio.run(replay(make_config(tmp_path, stream_records=stream), first, second))
+
+    for session in sessions:
+        assert session.total_records == 3
+        assert session.successful_records == 3
+        assert len(session.results) == 3
@@ -0,0 +1,23 @@
+"""
+分片运行器测试 - 父进程不创建事件循环和选择器缓存，分片规划时每个文件只统计一次记录数
+"""
+from pathlib import Path
+
+from src import models, sharded_runner
+from src.sharded_runner import ShardedSuiteRunner, plan_shards
+
+def test_parent_does_not_build_replay_runtime():
+    with ShardedSuiteRunner(models.TestConfig(), workers=2) as runner:
+        assert not hasattr(runner, '_loop')
+        assert not hasattr(runner, 'selector_cache')
+    assert not Path("data").exists()
+
+def test_plan_shards_counts_each_file_once(monkeypatch):
+    counted = []
+    monkeypatch.setattr(sharded_runner, 'count_records', lambda f: counted.append(f) or 10)
+    files = [Path(f"{name}.json") for name in "abcd"]
+
+    shards = plan_shards(files, workers=2, durations={"a.json": 20.0, "b.json": 5.0})
+
+    assert sorted(counted) == sorted(files)
+    assert sorted(f for shard in shards for f in shard) == sorted(files)
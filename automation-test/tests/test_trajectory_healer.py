@@ -0,0 +1,82 @@
+"""
+轨迹修复测试 - 修复写入与选择器策略对应的字段，副本原子写入且保留无法解析的记录，AI建议按JSON解析
+"""
+import json
+from pathlib import Path
+
+from src.ai_assistant import AIAssistant
+from src.binary_format import is_binary_trajectory, write_binary_trajectory
+from src.data_loader import LearningDataLoader
+from src.selector_cache import SelectorCache
+from src.trajectory_healer import TrajectoryHealer, apply_fix, healed_paths
+
+ITEMS = [
+    {"type": "click", "description": "点击登录", "url": "https://shop.example.com/login",
+     "element": {"tagName": "BUTTON", "id": "login", "xpath": "/html/body/button[1]", "selector": "#login"},
+     "timestamp": "2024-01-01T10:00:00Z"},
+    {"type": "click", "description": "损坏的记录", "element": "not-a-dict"},
+]
+
+def parse(item):
+    return LearningDataLoader(Path(".")).parse_record(item)
+
+def fix_for(selector: str):
+    return {'key': SelectorCache.make_key(parse(ITEMS[0])), 'selector': selector}
+
+def test_apply_fix_writes_field_matching_strategy():
+    css, xpath, text = (dict(ITEMS[0]['element']) for _ in range(3))
+    apply_fix(css, {'selector': "button.primary:nth-child(2)"})
+    apply_fix(xpath, {'selector': "xpath=/html/body/div[2]/button[1]"})
+    apply_fix(text, {'selector': "text=登录"})
+
+    assert css['selector'] == "button.primary:nth-child(2)"
+    assert (xpath['xpath'], xpath['selector']) == ("/html/body/div[2]/button[1]", "#login")
+    assert (text['textContent'], text['selector']) == ("登录", "#login")
+    assert css['id'] is None and xpath['id'] is None
+
+def test_copy_keeps_unparseable_items(tmp_path):
+    source = tmp_path / "login.json"
+    source.write_text(json.dumps(ITEMS, ensure_ascii=False), encoding="utf-8")
+    fix = fix_for("xpath=/html/body/div[2]/button[1]")
+
+    TrajectoryHealer._write_copy(source, tmp_path / "copy.json", {fix['key']: fix})
+
+    copy = json.loads((tmp_path / "copy.json").read_text(encoding="utf-8"))
+    assert copy[0]['element']['xpath'] == "/html/body/div[2]/button[1]"
+    assert copy[1] == ITEMS[1]
+    assert not list(tmp_path.glob("*.tmp"))
+
+def test_copy_format_follows_magic_bytes(tmp_path):
+    # 二进制轨迹使用.json扩展名，按魔数而不是扩展名判断格式
+    source = tmp_path / "login.json"
+    write_binary_trajectory(ITEMS[:1], source)
+    healer = TrajectoryHealer()
+    fix = fix_for("#sign-in")
+    healer.fixes = {fix['key']: fix}
+
+    paths = healer.write(source, "session-1")
+
+    assert is_binary_trajectory(paths['copy'])
+    record, = LearningDataLoader(tmp_path).load_from_file(paths['copy'])
+    assert record.element.selector == "#sign-in"
+    assert paths == healed_paths(source)
+
+class FakeLLM:
+    def __init__(self, content: str):
+        self.content = content
+
+    def invoke(self, messages):
+        return self
+
+def test_selector_suggestions_parsed_as_json():
+    content = '```json\n[{"type": "CSS", "selector": "ul > li:nth-child(2) a"}, {"type": "xpath", "selector": "//a[1]"}, ' \
+              '{"type": "text", "selector": "登录"}, {"type": "css"}]\n```'
+    assistant = AIAssistant(llm=FakeLLM(content))
+    record = parse(ITEMS[0])
+
+    assert assistant.suggest_alternative_selectors(record, "") == [
+        {'type': "css", 'selector': "ul > li:nth-child(2) a"},
+        {'type': "xpath", 'selector': "xpath=//a[1]"},
+        {'type': "text", 'selector': "text=登录"},
+    ]
+    assert AIAssistant(llm=FakeLLM("CSS: a:nth-child(2)")).suggest_alternative_selectors(record, "") == []
@@ -0,0 +1,47 @@
+"""
+URL工具测试 - 查询模式的子串、通配符和索引前缀，规范化时保留哈希路由
+"""
+import asyncio
+
+from src.navigator import Navigator
+from src.url_utils import compile_url_pattern, normalize_url, url_pattern, url_pattern_prefix
+from tests.fake_page import FakePage
+
+def test_substring_pattern_keeps_literal_query_characters():
+    assert compile_url_pattern('search?q=shoes')('https://shop.example.com/search?q=shoes')
+    assert compile_url_pattern('/list[1]')('https://shop.example.com/list[1]/a')
+    assert not compile_url_pattern('search?q=shoes')('https://shop.example.com/search?q=boots')
+
+def test_trailing_wildcard_matches_bare_prefix():
+    match = compile_url_pattern('/checkout/*')
+    assert match('https://shop.example.com/checkout')
+    assert match('https://shop.example.com/checkout/pay?step=2')
+    assert not match('https://shop.example.com/checkouts')
+
+def test_host_path_wildcard_ignores_query_unless_pattern_has_one():
+    assert compile_url_pattern('shop.example.com/item/*')('https://shop.example.com/item/42?ref=home')
+    assert not compile_url_pattern('shop.example.com/item/*')('https://other.example.com/item/42')
+    assert compile_url_pattern('/search*?q=*')('https://shop.example.com/search?q=shoes')
+
+def test_index_prefix_covers_bare_prefix():
+    assert url_pattern_prefix('/checkout/*') == (None, '/checkout')
+    assert url_pattern_prefix('shop.example.com/item/*') == ('shop.example.com', '/item')
+    assert url_pattern_prefix('search?q=shoes') == (None, '')
+
+def test_hash_routes_are_kept_but_anchors_ignored():
+    assert normalize_url('https://shop.example.com/#/cart') != normalize_url('https://shop.example.com/#/checkout')
+    assert normalize_url('https://shop.example.com/#!/cart') == 'https://shop.example.com/#!/cart'
+    assert normalize_url('https://shop.example.com/docs#install') == normalize_url('https://shop.example.com/docs')
+
+def test_url_pattern_generalizes_hash_route_ids():
+    assert url_pattern('https://shop.example.com/#/product/42?tab=1') == 'https://shop.example.com/#/product/*'
+    assert url_pattern('https://shop.example.com/docs#install') == 'https://shop.example.com/docs'
+
+def test_navigator_follows_hash_route_change():
+    page = FakePage()
+    page.url = 'https://shop.example.com/#/cart'
+    navigator = Navigator(page, nav_wait_ms=0)
+
+    assert asyncio.run(navigator.navigate('https://shop.example.com/#/cart')) == 'skipped'
+    assert asyncio.run(navigator.navigate('https://shop.example.com/#/checkout')) == 'goto'
+    assert asyncio.run(navigator.navigate('https://shop.example.com/#/checkout')) == 'skipped'